@@ -0,0 +1,98 @@
+"""
+Measures the throughput and peak memory of decoding FIT exports.
+
+    uv run python -m benchmarks.bench_fit --records 50000 --rounds 5
+
+`tempfile` re-creates the original path: the payload is written to
+a named temporary file and read back before it's decoded.
+`buffer` decodes the payload in memory, as `get_exercise` does,
+and `stream` feeds it in download-sized chunks, as `iter_exercise_records` does,
+counting the records instead of keeping them.
+"""
+
+import argparse
+import os
+import struct
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from src.clients.polar.fit import FitDecoder, decode_fit
+
+CHUNK_SIZE = 64 * 1024
+
+
+def build_fit(records: int, start: int = 1_000_000_000) -> bytes:
+    fields = [(253, 4, 0x86), (0, 4, 0x85), (1, 4, 0x85), (2, 2, 0x84)]
+    fields += [(3, 1, 0x02), (4, 1, 0x02), (5, 4, 0x86), (6, 2, 0x84), (7, 2, 0x84)]
+    definition = struct.pack("<BBBHB", 0x40, 0, 0, 20, len(fields)) + b"".join(
+        bytes(field) for field in fields
+    )
+    record = struct.Struct("<BIiiHBBIHH")
+    data = definition + b"".join(
+        record.pack(0, start + i, i, -i, 3000, 140, 90, i * 300, 3000, 250)
+        for i in range(records)
+    )
+    header = struct.pack("<BBHI4sH", 14, 0x20, 2100, len(data), b".FIT", 0)
+    return header + data + b"\x00\x00"
+
+
+def via_tempfile(content: bytes) -> int:
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_file.write(content)
+    try:
+        with open(temp_file.name, "rb") as file:
+            return len(decode_fit(file.read()))
+    finally:
+        os.unlink(temp_file.name)
+
+
+def via_buffer(content: bytes) -> int:
+    return len(decode_fit(content))
+
+
+def via_stream(content: bytes) -> int:
+    decoder = FitDecoder()
+    view = memoryview(content)
+    count = 0
+    for start in range(0, len(view), CHUNK_SIZE):
+        count += len(decoder.feed(view[start : start + CHUNK_SIZE]))
+    return count + len(decoder.feed(b"", final=True))
+
+
+def measure(fn: Callable[[bytes], int], content: bytes, rounds: int) -> tuple:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(content)
+    elapsed = (time.perf_counter() - started) / rounds
+
+    tracemalloc.start()
+    fn(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    content = build_fit(args.records)
+    modes = {"tempfile": via_tempfile, "buffer": via_buffer, "stream": via_stream}
+
+    size = len(content) / 2**20
+    print(f"{args.records} records, {size:.1f} MiB")
+    print(f"{'mode':<12}{'MiB/s':>10}{'records/s':>14}{'peak MiB':>12}")
+    for name, fn in modes.items():
+        elapsed, peak = measure(fn, content, args.rounds)
+        print(
+            f"{name:<12}{size / elapsed:>10.1f}{args.records / elapsed:>14.0f}"
+            f"{peak / 2**20:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compares upstream latency of a fresh client per request with the shared transport.
+
+    uv run python -m benchmarks.bench_http --requests 2000 --concurrency 32
+
+Both modes call a local stub of AccessLink through the Polar OAuth2 app,
+the way `fetch_user` does.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import threading
+import time
+from uuid import uuid4
+
+os.environ.setdefault("polar_oauth__client_id", str(uuid4()))
+os.environ.setdefault("polar_oauth__client_secret", str(uuid4()))
+os.environ.setdefault("polar_server__debug", "False")
+
+import uvicorn  # noqa: E402
+from authlib.integrations.starlette_client import OAuth  # noqa: E402
+
+from src.core.http import SharedTransport, build_timeout, build_transport  # noqa: E402
+from src.core.settings import settings  # noqa: E402
+
+TOKEN = {"access_token": "token", "token_type": "bearer", "expires_at": 4102444800}
+
+
+async def stub(scope, receive, send) -> None:
+    if scope["type"] != "http":
+        return
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": b'{"polar-user-id": 1}'})
+
+
+def serve() -> tuple[uvicorn.Server, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(stub, port=port, log_level="warning", backlog=4096)
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def measure(oauth: OAuth, requests: int, concurrency: int) -> list[float]:
+    client = oauth.create_client("polar")
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def call() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get("/v3/users/1", token=TOKEN)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(call() for _ in range(requests)))
+    return latencies
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    server, base_url = serve()
+    transport = build_transport(settings.oauth)
+    modes = {
+        "client per request": {},
+        "shared transport": {
+            "transport": SharedTransport(transport),
+            "timeout": build_timeout(settings.oauth),
+        },
+    }
+
+    print(f"{'mode':<20}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    try:
+        for mode, client_kwargs in modes.items():
+            oauth = OAuth()
+            oauth.register(
+                name="polar", api_base_url=base_url, client_kwargs=client_kwargs
+            )
+            started = time.perf_counter()
+            latencies = await measure(oauth, args.requests, args.concurrency)
+            elapsed = time.perf_counter() - started
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(
+                f"{mode:<20}{quantiles[49] * 1000:>10.2f}"
+                f"{quantiles[98] * 1000:>10.2f}{args.requests / elapsed:>10.1f}"
+            )
+    finally:
+        await transport.aclose()
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
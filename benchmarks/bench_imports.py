@@ -0,0 +1,48 @@
+"""
+Measures the start-up cost of the client package and the CLI.
+
+    uv run python -m benchmarks.bench_imports --runs 10
+
+Every target runs in a fresh interpreter, so nothing is imported yet.
+The median wall time of the interpreter start-up alone is subtracted.
+Importing `src.cli` is what a shell completion pays on every keystroke.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+TARGETS = {
+    "src.core.settings": ["-c", "import src.core.settings"],
+    "src.clients.polar": ["-c", "import src.clients.polar"],
+    "src.cli": ["-c", "import src.cli"],
+    "polar-cli --help": ["-m", "src.cli", "api", "--help"],
+}
+
+
+def measure(args: list[str], runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], check=True, capture_output=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = measure(["-c", "pass"], args.runs)
+    print(f"interpreter start-up: {baseline * 1e3:.0f} ms")
+    print(f"{'target':<20}{'ms':>8}")
+    for name, target in TARGETS.items():
+        elapsed = measure(target, args.runs) - baseline
+        print(f"{name:<20}{elapsed * 1e3:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
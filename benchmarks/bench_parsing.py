@@ -0,0 +1,95 @@
+"""
+Measures how parsing exercise exports affects the event loop.
+
+    uv run python -m benchmarks.bench_parsing --documents 8 --points 20000
+
+Every mode parses the same GPX documents concurrently, while a heartbeat task
+records the worst delay of the event loop.
+`inline` parses on the event loop, as the client used to,
+`threads` and `processes` hand the documents to an executor.
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+from src.clients.polar.formats import parse_gpx
+
+HEARTBEAT = 0.005
+
+
+def build_gpx(points: int) -> bytes:
+    started = datetime(2023, 1, 1, tzinfo=UTC)
+    trackpoints = "".join(
+        f'<trkpt lat="{60 + i * 1e-5:.6f}" lon="{24 + i * 1e-5:.6f}">'
+        f"<ele>{i % 50}</ele>"
+        f"<time>{(started + timedelta(seconds=i)).isoformat()}</time></trkpt>"
+        for i in range(points)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">'
+        f"<trk><trkseg>{trackpoints}</trkseg></trk></gpx>"
+    ).encode()
+
+
+async def heartbeat(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT)
+        worst = max(worst, time.perf_counter() - started - HEARTBEAT)
+    return worst
+
+
+async def run(documents: list[bytes], executor: Executor | None) -> tuple[float, float]:
+    loop = asyncio.get_running_loop()
+
+    async def parse(content: bytes) -> None:
+        if executor is None:
+            parse_gpx(content)
+        else:
+            await loop.run_in_executor(executor, parse_gpx, content)
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(stop))
+    await asyncio.sleep(HEARTBEAT)
+    started = time.perf_counter()
+    await asyncio.gather(*(parse(content) for content in documents))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return elapsed, await monitor
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    documents = [build_gpx(args.points)] * args.documents
+    modes = {
+        "inline": lambda: None,
+        "threads": lambda: ThreadPoolExecutor(args.workers),
+        "processes": lambda: ProcessPoolExecutor(args.workers),
+    }
+
+    print(f"{'mode':<12}{'total s':>10}{'worst stall ms':>16}")
+    for name, factory in modes.items():
+        executor = factory()
+        try:
+            if executor is not None:
+                # Warm the workers up so start-up isn't measured
+                await run(documents[:1], executor)
+            elapsed, stall = await run(documents, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        print(f"{name:<12}{elapsed:>10.2f}{stall * 1e3:>16.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
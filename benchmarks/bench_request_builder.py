@@ -0,0 +1,123 @@
+"""
+Measures the per-call overhead of building a request for `PolarClient` routes.
+
+    uv run python -m benchmarks.bench_request_builder --number 20000
+
+`legacy` re-creates the original per-call work: signature binding,
+a `string.Template` and a scan of the context fields.
+`compiled` is the route plan built once per route.
+`call` is a whole command call against a transport that answers immediately.
+"""
+
+import argparse
+import asyncio
+import inspect
+import time
+from string import Template
+from typing import Any
+
+import httpx
+
+from src.clients.base.descriptors import EndpointCommand
+from src.clients.base.models import EndpointRequest
+from src.clients.polar.client import PolarClient
+from src.clients.polar.contexts import ExerciseContext, ListExercisesContext
+from src.clients.polar.models import ExerciseQueryParams
+
+EXERCISE = {
+    "polar_user": "123",
+    "start_time": "2023-01-02T12:00:00Z",
+    "start_time_utc_offset": 0,
+    "duration": "PT2H",
+    "distance": 10000,
+    "calories": 600,
+    "device": "Polar Vantage V2",
+    "has_route": False,
+    "has_manual_lap": False,
+    "sport": "CYCLING",
+}
+
+
+class StubTransport:
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        content = [EXERCISE] if url == "/v3/exercises" else EXERCISE
+        return httpx.Response(
+            200, json=content, request=httpx.Request(method, "https://stub" + url)
+        )
+
+
+def legacy_process_request(
+    command: EndpointCommand, instance: PolarClient, *args: Any, **kwargs: Any
+) -> EndpointRequest:
+    bound_args = inspect.signature(command.stub).bind(instance, *args, **kwargs)
+    bound_args.apply_defaults()
+    arguments = bound_args.arguments
+    arguments.pop("self")
+    context = arguments.pop("context")
+    route_info = command._route_info
+
+    path_args = {}
+    path_templ = Template(route_info.path)
+    for field_name, field_spec in type(context).model_fields.items():
+        if field_spec.is_required() or field_spec.annotation in (str, int, float, bool):
+            if (
+                f"{{{field_name}}}" in route_info.path
+                or f"{{{field_name}:" in route_info.path
+            ):
+                path_args[field_name] = getattr(context, field_name)
+    path = route_info.path
+    if path_args:
+        path = path_templ.substitute(**path_args)
+
+    return EndpointRequest(
+        method=route_info.method,
+        url=path,
+        headers=route_info.headers,
+        params=context.params,
+        **arguments,
+    )
+
+
+def per_call(number: int, fn: Any, *args: Any) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        fn(*args)
+    return (time.perf_counter() - started) / number * 1e6
+
+
+async def per_await(number: int, fn: Any, *args: Any) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        await fn(*args)
+    return (time.perf_counter() - started) / number * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    client = PolarClient(StubTransport())
+    routes = {
+        "list_exercises": (
+            client.discover("GET", "/v3/exercises"),
+            client.list_exercises,
+            ListExercisesContext(),
+        ),
+        "get_exercise": (
+            client.discover("GET", "/v3/exercises/{exercise_id:str}"),
+            client.get_exercise,
+            ExerciseContext(exercise_id="abc", params=ExerciseQueryParams(zones=True)),
+        ),
+    }
+
+    print(f"{'route':<16}{'legacy µs':>12}{'compiled µs':>14}{'call µs':>10}")
+    for name, (command, method, context) in routes.items():
+        legacy = per_call(args.number, legacy_process_request, command, client, context)
+        compiled = per_call(args.number, command.process_request, client, context)
+        call = await per_await(args.number, method, context)
+        print(f"{name:<16}{legacy:>12.2f}{compiled:>14.2f}{call:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Measures matching paths against a growing number of routes.
+
+    uv run python -m benchmarks.bench_routing --routes 1000 --number 2000
+
+`scan` checks every route template in turn, with one regex per template,
+`index` walks the segment trie of `RouteIndex`.
+Both resolve a concrete path and complete a prefix.
+"""
+
+import argparse
+import re
+import time
+
+from src.clients.base.fields import PathTemplate
+from src.clients.base.routing import RouteIndex
+
+
+def build_templates(routes: int) -> list[str]:
+    return [
+        f"/v3/resource-{index}/{{item_id:str}}/{{format:str}}"
+        for index in range(routes)
+    ]
+
+
+def compile_template(template: str) -> re.Pattern:
+    return re.compile(
+        PathTemplate.TEMPLATE_PARAM_REGEX.sub(
+            lambda match: f"(?P<{match.group(1)}>[^/]+)", template
+        )
+        + "$"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--routes", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    templates = build_templates(args.routes)
+    patterns = [(template, compile_template(template)) for template in templates]
+    index = RouteIndex[str]()
+    for template in templates:
+        index.add("GET", PathTemplate(template), template)
+
+    last = args.routes - 1
+    path = f"/v3/resource-{last}/abc/gpx"
+    prefix = f"/v3/resource-{last}/"
+
+    def scan() -> None:
+        next(p.match(path).groupdict() for _, p in patterns if p.match(path))
+        [template for template in templates if template.startswith(prefix)]
+
+    def trie() -> None:
+        index.resolve("GET", path)
+        index.complete(prefix)
+
+    print(f"{'mode':<8}{'us per lookup':>16}")
+    for name, lookup in {"scan": scan, "index": trie}.items():
+        started = time.perf_counter()
+        for _ in range(args.number):
+            lookup()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<8}{elapsed / args.number * 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
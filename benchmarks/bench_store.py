@@ -0,0 +1,145 @@
+"""
+Measures `/oauth/token` read throughput while `/oauth/callback` writes run in parallel.
+
+    uv run python -m benchmarks.bench_store --duration 5 --readers 8 --writers 2
+
+Every journal mode runs against a fresh database file.
+The Polar token endpoint is stubbed out, so only the store is measured.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+os.environ.setdefault("polar_oauth__client_id", str(uuid4()))
+os.environ.setdefault("polar_oauth__client_secret", str(uuid4()))
+os.environ.setdefault("polar_server__debug", "False")
+
+import httpx  # noqa: E402
+import respx  # noqa: E402
+from asgi_lifespan import LifespanManager  # noqa: E402
+
+from src import web  # noqa: E402
+from src.core.store import TokenStore  # noqa: E402
+
+
+def issue_token(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        200,
+        json={
+            "access_token": uuid4().hex,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "user_id": 1,
+        },
+    )
+
+
+async def seed(store: TokenStore, size: int) -> list[str]:
+    codes = [uuid4().hex for _ in range(size)]
+    await store.run(
+        lambda conn: conn.executemany(
+            """
+            INSERT INTO tokens (
+                client_id, session_id, code, user_id, access_token, token_type,
+                expires_at
+            ) VALUES ('bench', ?, ?, 1, ?, 'bearer', datetime('now', '+1 hour'))
+            """,
+            [(uuid4().hex, code, uuid4().hex) for code in codes],
+        )
+    )
+    return codes
+
+
+async def read(client: httpx.AsyncClient, codes: list[str], deadline: float) -> int:
+    count = 0
+    while time.perf_counter() < deadline:
+        response = await client.post(
+            "/oauth/token", data={"code": codes[count % len(codes)]}
+        )
+        response.raise_for_status()
+        count += 1
+    return count
+
+
+async def write(client: httpx.AsyncClient, deadline: float) -> int:
+    count = 0
+    while time.perf_counter() < deadline:
+        state = uuid4().hex
+        await client.get(
+            "/oauth/authorize", params={"state": state, "client_id": "bench"}
+        )
+        response = await client.get(
+            "/oauth/callback", params={"code": uuid4().hex, "state": state}
+        )
+        assert response.status_code == 307, response.text
+        count += 1
+    return count
+
+
+async def run(journal_mode: str, args: argparse.Namespace) -> tuple[float, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = web.settings
+        web.settings = settings.model_copy(
+            update={
+                "server": settings.server.model_copy(
+                    update={
+                        "sqlite_path": Path(tmp) / "tokens.db",
+                        "sqlite_journal_mode": journal_mode,
+                        "sqlite_pool_size": args.pool_size,
+                    }
+                )
+            }
+        )
+        try:
+            async with (
+                LifespanManager(web.app),
+                httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=web.app),
+                    base_url="http://testserver",
+                ) as client,
+                respx.mock(assert_all_called=False) as mock,
+            ):
+                mock.post(str(settings.oauth.access_token_url)).mock(
+                    side_effect=issue_token
+                )
+                codes = await seed(web.app.state.store, args.seed)
+                deadline = time.perf_counter() + args.duration
+                reads, writes = await asyncio.gather(
+                    asyncio.gather(
+                        *(read(client, codes, deadline) for _ in range(args.readers))
+                    ),
+                    asyncio.gather(
+                        *(write(client, deadline) for _ in range(args.writers))
+                    ),
+                )
+        finally:
+            web.settings = settings
+
+    return sum(reads) / args.duration, sum(writes) / args.duration
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=10_000)
+    parser.add_argument(
+        "--journal-mode", nargs="+", default=["DELETE", "WAL"], dest="journal_modes"
+    )
+    args = parser.parse_args()
+
+    print(f"{'journal mode':<14}{'token reads/s':>16}{'callbacks/s':>14}")
+    for journal_mode in args.journal_modes:
+        reads, writes = await run(journal_mode, args)
+        print(f"{journal_mode:<14}{reads:>16.1f}{writes:>14.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
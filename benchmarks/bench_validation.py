@@ -0,0 +1,80 @@
+"""
+Measures validating a large exercise list from a raw response body.
+
+    uv run python -m benchmarks.bench_validation --exercises 5000 --rounds 5
+
+`per-item` decodes the body into dicts and validates every item on its own,
+as the client used to, `adapter` validates the bytes straight into
+`list[Exercise]` with the cached adapter the response handlers use.
+Peak memory is traced by a separate, untimed round.
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from src.clients.base.validation import type_adapter
+from src.clients.polar.models import Exercise
+
+
+def build_body(exercises: int) -> bytes:
+    items = [
+        {
+            "id": str(index),
+            "polar_user": "https://www.polaraccesslink.com/v3/users/1",
+            "start_time": "2023-01-01T10:00:00Z",
+            "start_time_utc_offset": 120,
+            "duration": "PT1H2M3S",
+            "distance": 10_000 + index,
+            "calories": 600,
+            "device": "Polar Vantage V2",
+            "has_route": True,
+            "has_manual_lap": False,
+            "sport": "RUNNING",
+            "heart_rate": {"average": 140, "maximum": 170},
+        }
+        for index in range(exercises)
+    ]
+    return json.dumps(items).encode()
+
+
+def per_item(body: bytes) -> list[Exercise]:
+    return [Exercise.model_validate(item) for item in json.loads(body)]
+
+
+def adapter(body: bytes) -> list[Exercise]:
+    return type_adapter(list[Exercise]).validate_json(body)
+
+
+def measure(validate: Callable[[bytes], object], body: bytes, rounds: int):
+    validate(body)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        validate(body)
+    elapsed = (time.perf_counter() - started) / rounds
+
+    tracemalloc.start()
+    validate(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--exercises", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    body = build_body(args.exercises)
+    print(f"{len(body) / 2**20:.1f} MiB, {args.exercises} exercises")
+    print(f"{'mode':<12}{'ms':>10}{'peak MiB':>12}")
+    for name, validate in {"per-item": per_item, "adapter": adapter}.items():
+        elapsed, peak = measure(validate, body, args.rounds)
+        print(f"{name:<12}{elapsed * 1e3:>10.1f}{peak / 2**20:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 import asyncio
 import json
+from collections.abc import Iterable, Iterator
 from functools import wraps
 from pathlib import Path
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated, Any, cast
 
 import typer
-from authlib.integrations.httpx_client import AsyncOAuth2Client
+from pydantic_core import to_json
+from typer.core import TyperGroup
 
-from src.clients import polar
 from src.core.context import (
+    ApiCall,
     PolarContext,
     complete_args,
     complete_path,
@@ -16,65 +18,287 @@ from src.core.context import (
     parse_header,
     parse_path_arg,
     parse_query_param,
+    resolve_path,
 )
-from src.core.settings import settings
+from src.core.export import ExportFormat, export_exercises, open_writer
+from src.core.settings import get_settings
 
-polar_api = typer.Typer()
+if TYPE_CHECKING:
+    from src.clients.base.types import HTTPMeth
+    from src.clients.polar import PolarClient
+
+
+class TokenArgumentGroup(TyperGroup):
+    """Still takes a token file as the first argument, as in `api TOKEN COMMAND`."""
+
+    def parse_args(self, ctx: typer.Context, args: list[str]) -> list[str]:
+        if args and not args[0].startswith("-") and args[0] not in self.commands:
+            args = ["--token", *args]
+        return super().parse_args(ctx, args)
+
+
+polar_api = typer.Typer(cls=TokenArgumentGroup)
 
 
 @polar_api.callback()
-def lifecycle(ctx: typer.Context, token: str):
-    token = json.load(Path(token).open())
+def lifecycle(
+    ctx: typer.Context,
+    token: Annotated[
+        Path | None,
+        typer.Option(
+            help="A token JSON file, used as it is and never refreshed, "
+            "also taken as the first argument"
+        ),
+    ] = None,
+    user: Annotated[
+        int | None,
+        typer.Option(
+            help="A Polar user whose token is shared with the web application",
+        ),
+    ] = None,
+):
+    if ctx.resilient_parsing:
+        # Shell completion needs no client
+        return
+    if (token is None) == (user is None):
+        raise typer.BadParameter("Pass either a --token file or a --user")
 
-    ctx.obj = PolarContext(
-        client=polar.PolarClient(
-            AsyncOAuth2Client(
-                client_id=str(settings.oauth.client_id),
-                client_secret=str(settings.oauth.client_secret),
-                base_url=str(settings.oauth.accesslink_url),
-                token=token,
-            )
+    # The client stack is imported here rather than at the top of the module,
+    # the shell completion imports this module on every keystroke
+    from authlib.integrations.httpx_client import AsyncOAuth2Client
+
+    from src.clients import polar
+    from src.clients.base.caching import ResponseCache
+    from src.core.store import TokenStore
+
+    settings = get_settings()
+
+    client_kwargs: dict[str, Any] = {
+        "client_id": str(settings.oauth.client_id),
+        "client_secret": str(settings.oauth.client_secret),
+        "base_url": str(settings.oauth.accesslink_url),
+    }
+    if token is not None:
+        oauth_client = AsyncOAuth2Client(token=json.load(token.open()), **client_kwargs)
+    else:
+        from src.core.migrations import apply_migrations
+        from src.core.tokens import (
+            ProvidedOAuth2Client,
+            TokenProvider,
+            token_refresher,
+        )
+
+        token_store = TokenStore.from_settings(settings.server).open()
+        ctx.call_on_close(lambda: asyncio.run(token_store.close()))
+        tokens = TokenProvider(
+            token_store,
+            token_refresher(settings.oauth),
+            margin=settings.server.token_refresh_margin,
+            lease=settings.server.token_refresh_lease,
+        )
+
+        async def provide(user_id: int) -> dict[str, Any]:
+            await apply_migrations(token_store)
+            return await tokens.get(user_id)
+
+        try:
+            token_data = asyncio.run(provide(user))
+        except LookupError as error:
+            raise typer.BadParameter(str(error)) from error
+        # A token expiring during a long command is refreshed by the provider,
+        # never by the client on its own
+        oauth_client = ProvidedOAuth2Client(tokens, user, token_data, **client_kwargs)
+
+    response_cache = None
+    if settings.oauth.cache_path is not None:
+        store = TokenStore(settings.oauth.cache_path, pool_size=1).open()
+        ctx.call_on_close(lambda: asyncio.run(store.close()))
+        response_cache = ResponseCache(
+            store,
+            ttl=settings.oauth.cache_ttl,
+            route_ttls=dict.fromkeys(polar.PolarClient.IMMUTABLE_ROUTES),
+            max_size=settings.oauth.cache_max_size,
         )
+
+    ctx.obj = PolarContext(
+        client=polar.PolarClient(oauth_client, response_cache=response_cache)
     )
 
 
+def _dump(value: Any) -> str:
+    # Exports such as a parsed GPX document have no JSON form
+    return to_json(value, fallback=str).decode()
+
+
+async def _run_batch(
+    client: "PolarClient", lines: Iterable[str], concurrency: int
+) -> bool:
+    def calls() -> Iterator[ApiCall | ValueError]:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield ApiCall.parse(line)
+            except ValueError as error:
+                yield error
+
+    async def run(call: ApiCall | ValueError) -> Any:
+        if isinstance(call, ValueError):
+            raise call
+        return await call.run(client)
+
+    ok = True
+    # Every call shares the connections of one client
+    async with client.transport:
+        results = client.fetch_many(run, calls(), concurrency=concurrency)
+        async for result in results:
+            ok = ok and result.ok
+            line: dict[str, Any] = {"index": result.index}
+            if isinstance(result.context, ApiCall):
+                line.update(method=result.context.method, path=result.context.path)
+            if result.ok:
+                line["result"] = result.result
+            else:
+                line["error"] = str(result.error)
+            typer.echo(_dump(line))
+    return ok
+
+
 @polar_api.command()
 @lambda f: wraps(f)(lambda *a, **kw: asyncio.run(f(*a, **kw)))
 async def call(
     ctx: typer.Context,
     action: Annotated[
-        str,
-        typer.Argument(..., help="API action to call", autocompletion=complete_path),
-    ],
+        str | None,
+        typer.Argument(
+            help="A route template or a concrete path, e.g. /v3/exercises/abc",
+            autocompletion=complete_path,
+        ),
+    ] = None,
+    method: Annotated[
+        str, typer.Option("--method", "-X", help="The HTTP method of the route")
+    ] = "GET",
     args: Annotated[
-        list[tuple[str, str]] | None,
+        list[str] | None,
         typer.Option(
-            "arg",
-            parser=parse_path_arg,
-            help="Path arguments parameters for the request.",
+            "--arg",
+            help="A path argument of the route template, as NAME=VALUE.",
             autocompletion=complete_args,
         ),
     ] = None,
     params: Annotated[
-        list[tuple[str, str]] | None,
+        list[str] | None,
         typer.Option(
-            "param",
-            parser=parse_query_param,
-            help="Pass query parameters for the request",
+            "--param",
+            help="A query parameter of the request, as NAME=VALUE.",
             autocompletion=complete_query_param,
         ),
     ] = None,
     headers: Annotated[
-        list[tuple[str, str]] | None,
+        list[str] | None,
+        typer.Option("--header", help="A header of the request, as NAME=VALUE."),
+    ] = None,
+    batch: Annotated[
+        typer.FileText | None,
         typer.Option(
-            "header",
-            parser=parse_header,
-            help="Pass headers for the request",
+            help="A file of calls, one JSON object per line, or - for stdin. "
+            'E.g. {"path": "/v3/exercises/abc", "params": {"zones": true}}',
         ),
     ] = None,
+    concurrency: Annotated[
+        int, typer.Option(min=1, help="The number of batch calls in flight")
+    ] = 8,
 ):
-    # client = cast(PolarContext, ctx.obj).client
-    typer.echo("Run `polar-cli api call`")
+    """Calls a route of the Polar API and prints the result as JSON."""
+    client = cast(PolarContext, ctx.obj).client
+    if batch is not None:
+        # Read line by line, so calls start while the input is still streaming
+        lines = iter(batch.readline, "")
+        if not await _run_batch(client, lines, concurrency):
+            raise typer.Exit(code=1)
+        return
+
+    if action is None:
+        raise typer.BadParameter("Pass an action or a --batch of calls")
+    try:
+        api_call = ApiCall(
+            method=cast("HTTPMeth", method.upper()),
+            path=resolve_path(action, dict(map(parse_path_arg, args or []))),
+            params=dict(map(parse_query_param, params or [])),
+            headers=dict(map(parse_header, headers or [])),
+        )
+    except KeyError as error:
+        raise typer.BadParameter(str(error.args[0])) from error
+
+    async with client.transport:
+        result = await api_call.run(client)
+    typer.echo(_dump(result))
+
+
+@polar_api.command()
+@lambda f: wraps(f)(lambda *a, **kw: asyncio.run(f(*a, **kw)))
+async def export(
+    ctx: typer.Context,
+    output: Annotated[
+        Path,
+        typer.Argument(
+            help="The file to write, or the directory of Parquet files",
+        ),
+    ],
+    export_format: Annotated[
+        ExportFormat | None,
+        typer.Option(
+            "--format",
+            help="The output format, by default guessed from the output suffix",
+        ),
+    ] = None,
+    samples: Annotated[
+        bool, typer.Option(help="Export the sample series, one column per type")
+    ] = False,
+    zones: Annotated[bool, typer.Option(help="Fetch the heart rate zones")] = False,
+    route: Annotated[bool, typer.Option(help="Fetch the GPS routes")] = False,
+    row_group_size: Annotated[
+        int, typer.Option(min=1, help="The number of exercises written at once")
+    ] = 500,
+    resume: Annotated[
+        bool,
+        typer.Option(help="Continue an export after its last written exercise"),
+    ] = False,
+):
+    """Streams the exercise history of the user to NDJSON, CSV or Parquet."""
+    from src.clients.polar.contexts import ListExercisesContext
+    from src.clients.polar.models import ExerciseQueryParams
+
+    if export_format is None:
+        try:
+            export_format = ExportFormat.from_path(output)
+        except ValueError as error:
+            raise typer.BadParameter(str(error)) from error
+    if output.exists() and not resume:
+        raise typer.BadParameter(f"{output} exists, pass --resume to continue it")
+
+    try:
+        writer = open_writer(output, export_format, samples)
+    except RuntimeError as error:
+        raise typer.BadParameter(str(error), param_hint="--format") from error
+
+    client = cast(PolarContext, ctx.obj).client
+    context = ListExercisesContext(
+        params=ExerciseQueryParams(samples=samples, zones=zones, route=route)
+    )
+    async with client.transport:
+        report = await export_exercises(
+            client.iter_exercises(context),
+            writer,
+            samples=samples,
+            row_group_size=row_group_size,
+            resume=resume,
+        )
+    typer.echo(
+        f"Exported {report.written} exercises in {report.row_groups} row groups, "
+        f"skipped {report.skipped} and dropped {report.dropped} without an ID",
+        err=True,
+    )
 
 
 app = typer.Typer(name="polar-cli")
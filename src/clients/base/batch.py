@@ -0,0 +1,76 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class BatchResult[ContextT, ResultT]:
+    """The outcome of one call of a batch: either a result or an error."""
+
+    index: int
+    context: ContextT
+    result: ResultT | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def gather_bounded[ContextT, ResultT](
+    call: Callable[[ContextT], Awaitable[ResultT]],
+    contexts: Iterable[ContextT],
+    *,
+    concurrency: int = 8,
+    ordered: bool = False,
+) -> AsyncIterator[BatchResult[ContextT, ResultT]]:
+    """
+    Runs `call` for every context with at most `concurrency` calls in flight.
+    Results are yielded in completion order, or in input order if `ordered`.
+    A failed call is yielded with its error and never cancels the rest of the batch.
+    Contexts are pulled lazily, so the batch may be an unbounded iterable.
+    """
+    if concurrency <= 0:
+        raise ValueError("The concurrency limit must be positive")
+
+    async def run(index: int, context: ContextT) -> BatchResult[ContextT, ResultT]:
+        try:
+            return BatchResult(index, context, result=await call(context))
+        except Exception as error:
+            return BatchResult(index, context, error=error)
+
+    inputs = enumerate(contexts)
+    pending: set[asyncio.Task[BatchResult[ContextT, ResultT]]] = set()
+    # Ordered results wait here for their predecessors and occupy the window
+    buffered: dict[int, BatchResult[ContextT, ResultT]] = {}
+    next_index = 0
+
+    def refill() -> None:
+        while len(pending) + len(buffered) < concurrency:
+            item = next(inputs, None)
+            if item is None:
+                return
+            pending.add(asyncio.create_task(run(*item)))
+
+    try:
+        refill()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+
+            results = sorted((task.result() for task in done), key=lambda r: r.index)
+            if ordered:
+                buffered.update((result.index, result) for result in results)
+                results = []
+                while next_index in buffered:
+                    results.append(buffered.pop(next_index))
+                    next_index += 1
+
+            # Keep the window full while the consumer handles the results
+            refill()
+            for result in results:
+                yield result
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import httpx
+
+from .models import EndpointRequest
+from .types import RouteKey
+
+if TYPE_CHECKING:
+    from src.core.store import TokenStore
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        url TEXT NOT NULL,
+        status INTEGER NOT NULL,
+        headers TEXT NOT NULL,
+        content BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        stored_at REAL NOT NULL,
+        expires_at REAL,
+        accessed_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)",
+)
+
+# The cached body is stored decoded, so these no longer describe it
+_HOP_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    url: str
+    status: int
+    headers: list[tuple[str, str]]
+    content: bytes
+    etag: str | None
+    last_modified: str | None
+    expires_at: float | None
+
+    def is_fresh(self, now: float) -> bool:
+        return self.expires_at is None or now < self.expires_at
+
+    def validators(self) -> dict[str, str]:
+        """The headers of a conditional request revalidating the response."""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self) -> httpx.Response:
+        return httpx.Response(
+            self.status,
+            headers=self.headers,
+            content=self.content,
+            request=httpx.Request("GET", self.url),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class ResponseCacheStats:
+    hits: int
+    misses: int
+    revalidations: int
+
+
+class ResponseCache:
+    """
+    An on-disk cache of successful GET responses, kept in a SQLite store.
+    Entries are keyed by the principal, the route key, the path arguments
+    and the query parameters of a request, and expire after a TTL.
+    A stale entry is revalidated with its ETag or Last-Modified date,
+    if the server sent any, and the least recently used entries are evicted
+    once the cached bodies outgrow `max_size` bytes.
+    """
+
+    def __init__(
+        self,
+        store: "TokenStore",
+        *,
+        ttl: float | None = 3600.0,
+        route_ttls: Mapping[RouteKey, float | None] | None = None,
+        max_size: int = 256 * 2**20,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if max_size <= 0:
+            raise ValueError("The cache size must be positive")
+
+        self.store = store
+        # None keeps an entry fresh until it's evicted
+        self.ttl = ttl
+        self.route_ttls = dict(route_ttls or {})
+        self.max_size = max_size
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._prepared = False
+
+    @staticmethod
+    def key(principal: str, request: EndpointRequest) -> str:
+        params = (
+            request.params.model_dump(
+                mode="json", exclude_none=True, exclude_unset=True
+            )
+            if request.params
+            else {}
+        )
+        route = request.route or (request.method, request.url)
+        payload = [principal, *route, request.path_args, params]
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    async def _prepare(self) -> None:
+        if self._prepared:
+            return
+
+        def create(conn: sqlite3.Connection) -> None:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+        # Both statements are idempotent, racing callers are harmless
+        await self.store.run(create)
+        self._prepared = True
+
+    async def get(self, key: str) -> CachedResponse | None:
+        await self._prepare()
+
+        def lookup(conn: sqlite3.Connection) -> sqlite3.Row | None:
+            row = conn.execute(
+                "SELECT url, status, headers, content, etag, last_modified, "
+                "expires_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    (self.clock(), key),
+                )
+            return row
+
+        row = await self.store.run(lookup)
+        if row is None:
+            self.misses += 1
+            return None
+
+        entry = CachedResponse(
+            url=row["url"],
+            status=row["status"],
+            headers=[tuple(header) for header in json.loads(row["headers"])],
+            content=row["content"],
+            etag=row["etag"],
+            last_modified=row["last_modified"],
+            expires_at=row["expires_at"],
+        )
+        if entry.is_fresh(self.clock()):
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def _expires_at(self, request: EndpointRequest, now: float) -> float | None:
+        ttl = self.ttl
+        if request.route is not None and request.route in self.route_ttls:
+            ttl = self.route_ttls[request.route]
+        return None if ttl is None else now + ttl
+
+    @staticmethod
+    def cacheable(response: httpx.Response) -> bool:
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        return response.status_code == 200 and "no-store" not in cache_control
+
+    async def set(
+        self, key: str, request: EndpointRequest, response: httpx.Response
+    ) -> None:
+        if not self.cacheable(response):
+            return
+
+        await self._prepare()
+        now = self.clock()
+        content = response.content
+        headers = [
+            (name, value)
+            for name, value in response.headers.items()
+            if name.lower() not in _HOP_HEADERS
+        ]
+        await self.store.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, url, status, headers, content, size, etag, last_modified, "
+            "stored_at, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                str(response.request.url),
+                response.status_code,
+                json.dumps(headers),
+                content,
+                len(content),
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                now,
+                self._expires_at(request, now),
+                now,
+            ),
+        )
+        await self.evict()
+
+    async def revalidated(
+        self, key: str, request: EndpointRequest, response: httpx.Response
+    ) -> None:
+        """Renews an entry after the server answered its revalidation with a 304."""
+        self.revalidations += 1
+        now = self.clock()
+        await self.store.execute(
+            "UPDATE responses SET expires_at = ?, accessed_at = ?, "
+            "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+            "WHERE key = ?",
+            (
+                self._expires_at(request, now),
+                now,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                key,
+            ),
+        )
+
+    async def evict(self) -> int:
+        """Evicts the least recently used entries beyond the size limit."""
+
+        def evict(conn: sqlite3.Connection) -> int:
+            (total,) = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            excess = total - self.max_size
+            if excess <= 0:
+                return 0
+
+            # The oldest entries whose sizes add up to the excess
+            return conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, size, SUM(size) OVER (
+                            ORDER BY accessed_at, key ROWS UNBOUNDED PRECEDING
+                        ) AS freed
+                        FROM responses
+                    )
+                    WHERE freed - size < ?
+                )
+                """,
+                (excess,),
+            ).rowcount
+
+        return await self.store.run(evict)
+
+    async def clear(self) -> None:
+        await self._prepare()
+        await self.store.execute("DELETE FROM responses")
+
+    def stats(self) -> ResponseCacheStats:
+        return ResponseCacheStats(
+            hits=self.hits, misses=self.misses, revalidations=self.revalidations
+        )
@@ -1,35 +1,213 @@
+import asyncio
+import hashlib
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from contextlib import AbstractAsyncContextManager
+from typing import Any
 
 import httpx
 import pydantic
 from authlib.integrations.httpx_client import AsyncOAuth2Client
 
-from .descriptors import EndpointCommand
+from .batch import BatchResult, gather_bounded
+from .caching import ResponseCache
+from .coalescing import RequestCoalescer
 from .fields import PathTemplate
 from .models import EndpointRequest
+from .streaming import iter_json_array
+from .throttling import RateLimiter, RetryPolicy
 from .traits import Discoverable, Transportable
 from .types import HTTPMeth
+from .validation import type_adapter
 
 
 class AsyncClient(Discoverable, Transportable[AsyncOAuth2Client], ABC):
+    def __init__(
+        self,
+        transport: AsyncOAuth2Client,
+        *,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = RetryPolicy(),
+        response_cache: ResponseCache | None = None,
+        coalescer: RequestCoalescer | None = None,
+    ) -> None:
+        super().__init__(transport)
+        # Clients sharing a quota share the limiter
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.response_cache = response_cache
+        # Short-lived clients share in-flight requests through a common coalescer
+        self.coalescer = coalescer if coalescer is not None else RequestCoalescer()
+
+    @property
+    def principal(self) -> str:
+        """Identifies on whose behalf requests are sent, e.g. to partition caches."""
+        token = getattr(self.transport, "token", None) or {}
+        access_token = token.get("access_token")
+        if not access_token:
+            return ""
+        return hashlib.sha256(access_token.encode()).hexdigest()
+
     @abstractmethod
     async def send(self, request: EndpointRequest) -> httpx.Response:
         raise NotImplementedError
 
+    @abstractmethod
+    def stream(
+        self, request: EndpointRequest
+    ) -> AbstractAsyncContextManager[httpx.Response]:
+        """Sends the request without reading the response body up front."""
+        raise NotImplementedError
+
+    def _retry_delay(
+        self,
+        request: EndpointRequest,
+        attempt: int,
+        response: httpx.Response | None = None,
+        error: Exception | None = None,
+    ) -> float | None:
+        if self.retry_policy is None:
+            return None
+
+        delay = self.retry_policy.delay(request.method, attempt, response, error)
+        if delay is not None and self.rate_limiter is not None:
+            if response is not None and response.status_code == 429:
+                # The quota is shared: every caller has to back off
+                self.rate_limiter.defer(delay)
+        return delay
+
+    async def dispatch(self, request: EndpointRequest) -> httpx.Response:
+        """
+        Serves a GET request from the response cache if possible,
+        otherwise sends it and caches a successful response.
+        Identical GETs in flight at once share one response.
+        """
+        if request.method != "GET":
+            return await self._dispatch(request)
+
+        key = ResponseCache.key(self.principal, request)
+        return await self.coalescer.run(
+            key, lambda: self._dispatch_cached(key, request)
+        )
+
+    async def _dispatch_cached(
+        self, key: str, request: EndpointRequest
+    ) -> httpx.Response:
+        cache = self.response_cache
+        if cache is None:
+            return await self._dispatch(request)
+
+        cached = await cache.get(key)
+        if cached is not None:
+            if cached.is_fresh(cache.clock()):
+                return cached.to_response()
+            if validators := cached.validators():
+                headers = httpx.Headers(request.headers)
+                headers.update(validators)
+                request = request.model_copy(update={"headers": headers})
+
+        response = await self._dispatch(request)
+        if cached is not None and response.status_code == 304:
+            await cache.revalidated(key, request, response)
+            return cached.to_response()
+        await cache.set(key, request, response)
+        return response
+
+    async def _dispatch(self, request: EndpointRequest) -> httpx.Response:
+        """Sends a request through the rate limiter and the retry policy."""
+        attempt = 1
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            try:
+                response = await self.send(request)
+            except httpx.TransportError as error:
+                delay = self._retry_delay(request, attempt, error=error)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(request, attempt, response=response)
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
     async def __call__(
+        self,
+        method: HTTPMeth,
+        path: str,
+        *,
+        params: pydantic.BaseModel | Mapping[str, Any] | None = None,
+        headers: Mapping[str, str] | None = None,
+    ) -> Any:
+        """Dynamic dispatch for the client, e.g. `client("GET", "/v3/exercises/abc")`.
+
+        The path parameters are taken from the concrete path
+        and validated into the context of the matched route.
+        """
+        match = self.resolve(method, path)
+        context_type = match.command._plan.context_type
+        if context_type is None:
+            raise TypeError(f"Route {match.template} takes no request context")
+
+        context = context_type(**match.params, params=params, headers=headers)
+        return await match.command(self, context)
+
+    async def iter_bytes(
         self,
         method: HTTPMeth,
         path: PathTemplate,
+        *args: Any,
+        **kwargs: Any,
+    ) -> AsyncIterator[bytes]:
+        """
+        Streams the body of a route in chunks,
+        which are read only as fast as the consumer iterates.
+        """
+        request = self.discover(method, path).process_request(self, *args, **kwargs)
+        attempt = 1
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            async with self.stream(request) as response:
+                # A throttled or failed stream is retried before its body is read
+                delay = self._retry_delay(request, attempt, response=response)
+                if delay is None:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        yield chunk
+                    return
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def iter_items[ItemT](
+        self,
+        method: HTTPMeth,
+        path: PathTemplate,
+        item_type: type[ItemT],
+        *args: Any,
+        **kwargs: Any,
+    ) -> AsyncIterator[ItemT]:
+        """
+        Streams the JSON array returned by a route,
+        validating and yielding each item as soon as it arrives.
+        """
+        adapter = type_adapter(item_type)
+        chunks = self.iter_bytes(method, path, *args, **kwargs)
+        async for item in iter_json_array(chunks):
+            yield adapter.validate_python(item)
+
+    def fetch_many[ContextT, ResultT](
+        self,
+        call: Callable[[ContextT], Awaitable[ResultT]],
+        contexts: Iterable[ContextT],
         *,
-        params: pydantic.BaseModel,
-        headers: httpx.Headers,
-        **kwargs,
-    ) -> EndpointCommand:
-        """Dynamic dispatch for the client."""
-        try:
-            # The registry now holds the descriptor instance directly
-            descriptor: EndpointCommand = self.registry[(method, path)]
-            # Call the descriptor, passing the client instance
-            return descriptor(self, **kwargs, query_model=params, headers=headers)
-        except KeyError:
-            raise ValueError(f"No route found for {method} {path}")
+        concurrency: int = 8,
+        ordered: bool = False,
+    ) -> AsyncIterator[BatchResult[ContextT, ResultT]]:
+        """
+        Calls a route of the client for many contexts concurrently,
+        e.g. `client.fetch_many(client.get_exercise, contexts)`.
+        See `gather_bounded` for the ordering and error semantics.
+        """
+        return gather_bounded(call, contexts, concurrency=concurrency, ordered=ordered)
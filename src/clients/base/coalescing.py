@@ -0,0 +1,61 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True, slots=True)
+class CoalescerStats:
+    calls: int
+    # Callers served by a call already in flight
+    coalesced: int
+    in_flight: int
+
+
+@dataclass(slots=True)
+class _Call:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class RequestCoalescer:
+    """
+    Shares one in-flight call between every caller of the same key,
+    e.g. a burst of identical GETs makes a single upstream request.
+    Nothing is kept once the call completes, so later callers make a new one.
+    A caller giving up doesn't cancel the call for the others,
+    it's cancelled only once all of its callers are gone.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: dict[Hashable, _Call] = {}
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._in_flight.get(key) is call:
+            del self._in_flight[key]
+
+    async def run[T](self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._in_flight.get(key)
+        if call is None:
+            self.calls += 1
+            task: asyncio.Task[Any] = asyncio.ensure_future(fn())
+            call = self._in_flight[key] = _Call(task)
+            task.add_done_callback(lambda _, call=call: self._forget(key, call))
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                call.task.cancel()
+                self._forget(key, call)
+
+    def stats(self) -> CoalescerStats:
+        return CoalescerStats(
+            calls=self.calls, coalesced=self.coalesced, in_flight=len(self._in_flight)
+        )
@@ -1,6 +1,8 @@
 import httpx
 from pydantic import BaseModel, ConfigDict
 
+from .validation import type_adapter
+
 
 class Context(BaseModel):
     pass
@@ -18,3 +20,8 @@ class ResponseContext(BaseModel):
     response: httpx.Response
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def validate_json[ResponseT](self, response_type: type[ResponseT]) -> ResponseT:
+        """Validates the raw body straight into `response_type`,
+        without decoding it into Python objects first."""
+        return type_adapter(response_type).validate_json(self.response.content)
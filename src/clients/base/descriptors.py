@@ -1,16 +1,138 @@
 import inspect
 from abc import ABC
-from collections import OrderedDict
-from collections.abc import Awaitable, Callable
-from functools import wraps
-from string import Template
-from typing import Any
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from dataclasses import dataclass
+from functools import cached_property, wraps
+from types import MethodType
+from typing import Any, Self
+from urllib.parse import quote
+
+import httpx
+import pydantic
 
 from .contexts import RequestContext, ResponseContext
+from .fields import PathTemplate
 from .models import EndpointRequest, RouteMeta
 from .protocols import AsyncClientProtocol
 
 
+@dataclass(frozen=True, slots=True)
+class RoutePlan:
+    """
+    Everything about a route which doesn't change between calls,
+    compiled once on the first use of the route.
+    """
+
+    signature: inspect.Signature
+    # The stub parameters after `self`, in declaration order
+    parameters: tuple[str, ...]
+    defaults: Mapping[str, Any]
+    # Whether the stub signature is too dynamic for the fast binding path
+    dynamic: bool
+    context_type: type[RequestContext] | None
+    slots: tuple[str, ...]
+    # A `str.format` pattern of the route path, e.g. "/v3/exercises/{exercise_id}"
+    pattern: str
+
+    @classmethod
+    def compile(cls, route_info: RouteMeta, stub: Callable) -> Self:
+        signature = inspect.signature(stub)
+        parameters = tuple(signature.parameters)[1:]
+        dynamic = any(
+            param.kind is not inspect.Parameter.POSITIONAL_OR_KEYWORD
+            for param in signature.parameters.values()
+        )
+
+        context_param = signature.parameters.get("context")
+        context_type = None
+        if context_param is not None and (
+            inspect.isclass(context_param.annotation)
+            and issubclass(context_param.annotation, pydantic.BaseModel)
+        ):
+            context_type = context_param.annotation
+
+        slots = tuple(
+            match.group(1)
+            for match in PathTemplate.TEMPLATE_PARAM_REGEX.finditer(route_info.path)
+        )
+        if context_type is not None:
+            missing = set(slots) - set(context_type.model_fields)
+            if missing:
+                raise TypeError(
+                    f"{context_type.__name__} has no fields for the path parameters "
+                    f"{sorted(missing)} of route: {route_info.path}"
+                )
+
+        return cls(
+            signature=signature,
+            parameters=parameters,
+            defaults={
+                name: param.default
+                for name, param in signature.parameters.items()
+                if param.default is not inspect.Parameter.empty
+            },
+            dynamic=dynamic,
+            context_type=context_type,
+            slots=slots,
+            pattern=PathTemplate.TEMPLATE_PARAM_REGEX.sub(
+                lambda match: f"{{{match.group(1)}}}", route_info.path
+            ),
+        )
+
+    def bind(
+        self, instance: AsyncClientProtocol, args: tuple, kwargs: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Binds call arguments to the stub parameters, applying the defaults."""
+        if self.dynamic:
+            bound_args = self.signature.bind(instance, *args, **kwargs)
+            bound_args.apply_defaults()
+            arguments = bound_args.arguments
+            arguments.pop("self")
+            return arguments
+
+        if len(args) > len(self.parameters):
+            raise TypeError(
+                f"Expected at most {len(self.parameters)} positional arguments, "
+                f"got {len(args)}"
+            )
+        arguments = dict(zip(self.parameters, args))
+        for name, value in kwargs.items():
+            if name in arguments:
+                raise TypeError(f"Multiple values for argument '{name}'")
+            if name not in self.signature.parameters or name == "self":
+                raise TypeError(f"Unexpected keyword argument '{name}'")
+            arguments[name] = value
+
+        if len(arguments) < len(self.parameters):
+            for name in self.parameters:
+                if name in arguments:
+                    continue
+                if name not in self.defaults:
+                    raise TypeError(f"Missing required argument '{name}'")
+                arguments[name] = self.defaults[name]
+        return arguments
+
+    def path_args(self, context: RequestContext) -> dict[str, str]:
+        values = {}
+        for name in self.slots:
+            value = getattr(context, name, None)
+            if value is None:
+                raise TypeError(
+                    f"Missing required path parameter '{name}' for route: "
+                    f"{self.pattern}"
+                )
+            values[name] = str(value)
+        return values
+
+    def format_path(self, path_args: Mapping[str, str]) -> str:
+        if not self.slots:
+            return self.pattern
+
+        return self.pattern.format_map(
+            {name: quote(value, safe="") for name, value in path_args.items()}
+        )
+
+
 class EndpointCommand[ReturnType](ABC):
     """
     A descriptor which builds a request command.
@@ -26,6 +148,11 @@ class EndpointCommand[ReturnType](ABC):
         self._original_handler = response_handler
         wraps(stub)(self)
 
+    @cached_property
+    def _plan(self) -> RoutePlan:
+        # Inspecting the stub is deferred, so importing a client stays cheap
+        return RoutePlan.compile(self._route_info, self.stub)
+
     def __get__(
         self,
         instance: AsyncClientProtocol,
@@ -37,55 +164,35 @@ class EndpointCommand[ReturnType](ABC):
         if instance is None:
             return self
 
-        # Return a wrapper that passes the instance to __call__
-        @wraps(self.stub)
-        def wrapper(*args: Any, **kwargs: Any) -> Any:
-            return self(instance, *args, **kwargs)
+        # A bound method passes the instance to __call__
+        return MethodType(self, instance)
 
-        return wrapper
-
-    def build_request(self, arguments: OrderedDict) -> EndpointRequest:
+    def build_request(self, arguments: dict[str, Any]) -> EndpointRequest:
         context: RequestContext = arguments.pop("context")
         route_info = self._route_info
 
-        # process path arguments
-        path_args = {}
-        path_templ = Template(route_info.path)
-        for field_name, field_spec in context.model_fields.items():
-            if field_spec.is_required() or field_spec.annotation in (
-                str,
-                int,
-                float,
-                bool,
-            ):
-                if (
-                    f"{{{field_name}}}" in route_info.path
-                    or f"{{{field_name}:" in route_info.path
-                ):
-                    path_args[field_name] = getattr(context, field_name)
-
-        path = route_info.path
-        if path_args:
-            try:
-                path = path_templ.substitute(**path_args)
-            except KeyError as e:
-                raise TypeError(
-                    f"Missing required path parameter {e} for route: {route_info.path}"
-                )
-
         # Process query parameters
         params = route_info.params
         complement = context.params
         if params and complement:
-            params.model_copy(update=complement)
+            params = params.model_copy(update=complement.model_dump(exclude_unset=True))
         elif complement:
             params = complement
 
+        # The headers of the context win over those of the route
+        headers = route_info.headers
+        if context.headers:
+            headers = httpx.Headers(headers)
+            headers.update(context.headers)
+
+        path_args = self._plan.path_args(context)
         request = EndpointRequest(
             method=route_info.method,
-            url=path,
-            headers=route_info.headers,
+            url=self._plan.format_path(path_args),
+            headers=headers,
             params=params,
+            route=(route_info.method, route_info.path),
+            path_args=path_args,
             **arguments,
         )
         return request
@@ -94,10 +201,7 @@ class EndpointCommand[ReturnType](ABC):
         self, instance: AsyncClientProtocol, *args: Any, **kwargs: Any
     ) -> EndpointRequest:
         """Decorator to process the request and return the processed request."""
-        bound_args = inspect.signature(self.stub).bind(instance, *args, **kwargs)
-        bound_args.apply_defaults()
-        call_args = bound_args.arguments
-        call_args.pop("self")
+        call_args = self._plan.bind(instance, args, kwargs)
         request = self.build_request(call_args)
         return request
 
@@ -105,8 +209,48 @@ class EndpointCommand[ReturnType](ABC):
         self, instance: AsyncClientProtocol, *args: Any, **kwargs: Any
     ) -> ReturnType:
         request = self.process_request(instance, *args, **kwargs)
-        response = await instance.send(request)
+        response = await instance.dispatch(request)
         response.raise_for_status()
         return await self._original_handler(
             instance, ResponseContext(response=response)
         )
+
+
+class OverloadedCommand:
+    """
+    A descriptor which dispatches a call to the overload
+    whose route context type matches the passed context.
+    """
+
+    def __init__(self, commands: Sequence[EndpointCommand]):
+        self.commands = tuple(commands)
+        wraps(self.commands[-1].stub)(self)
+
+    def __get__(
+        self,
+        instance: AsyncClientProtocol,
+        owner: type[AsyncClientProtocol],
+    ) -> Callable[..., Awaitable[Any]]:
+        if instance is None:
+            return self
+
+        return MethodType(self, instance)
+
+    def select(self, context: Any) -> EndpointCommand:
+        # An exact match wins over a subclass match
+        for command in self.commands:
+            if type(context) is command._plan.context_type:
+                return command
+        for command in self.commands:
+            context_type = command._plan.context_type
+            if context_type is not None and isinstance(context, context_type):
+                return command
+        raise TypeError(
+            f"No overload of '{self.__name__}' accepts {type(context).__name__}"
+        )
+
+    async def __call__(
+        self, instance: AsyncClientProtocol, *args: Any, **kwargs: Any
+    ) -> Any:
+        context = kwargs["context"] if "context" in kwargs else next(iter(args), None)
+        return await self.select(context)(instance, *args, **kwargs)
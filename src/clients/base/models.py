@@ -1,22 +1,26 @@
 from collections.abc import Callable
-from typing import Annotated
+from dataclasses import dataclass
 
 import httpx
 import pydantic
 
 from .fields import PathTemplate
-from .types import HTTPMeth
+from .types import HTTPMeth, RouteKey
 
 
-class RouteMeta[ResponseT](pydantic.BaseModel):
+@dataclass(frozen=True, slots=True)
+class RouteMeta[ResponseT]:
     """A route metadata container for an endpoint command"""
 
+    # A dataclass rather than a model: parametrizing a generic model
+    # creates a model class per route, which dominated the import time
     method: HTTPMeth
-    path: Annotated[str, PathTemplate]
+    path: str
     params: pydantic.BaseModel | None = None
     headers: httpx.Headers | None = None
 
-    model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "path", PathTemplate.validate_template(self.path))
 
     def build_command(self, stub: Callable, member: Callable):
         from .descriptors import EndpointCommand
@@ -29,5 +33,8 @@ class EndpointRequest(pydantic.BaseModel):
     url: str
     params: pydantic.BaseModel | None = None
     headers: httpx.Headers | None = None
+    # The registry key of the route the request was built for
+    route: RouteKey | None = None
+    path_args: dict[str, str] = {}
 
     model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
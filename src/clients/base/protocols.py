@@ -15,3 +15,4 @@ class Routable(Protocol):
 
 class AsyncClientProtocol(Protocol):
     async def send(self, request: EndpointRequest) -> httpx.Response: ...
+    async def dispatch(self, request: EndpointRequest) -> httpx.Response: ...
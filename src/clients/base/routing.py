@@ -0,0 +1,155 @@
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import unquote
+from uuid import UUID
+
+from .fields import PathTemplate
+from .types import HTTPMeth
+
+# Converts a path segment to the type of its parameter, or raises ValueError
+CONVERTERS: dict[str, Callable[[str], Any]] = {"str": str, "int": int, "uuid": UUID}
+
+
+@dataclass(frozen=True, slots=True)
+class RouteMatch[CommandT]:
+    template: PathTemplate
+    command: CommandT
+    # The typed values of the path parameters
+    params: dict[str, Any]
+
+
+@dataclass(slots=True)
+class _Param:
+    name: str
+    # The segment of the template, e.g. `{exercise_id:str}`
+    segment: str
+    convert: Callable[[str], Any]
+    node: "_Node"
+
+    def accepts(self, segment: str) -> bool:
+        if segment == self.segment:
+            return True
+        try:
+            self.convert(segment)
+        except ValueError:
+            return False
+        return True
+
+
+@dataclass(slots=True)
+class _Node:
+    literals: dict[str, "_Node"] = field(default_factory=dict)
+    # Tried in registration order, after the literals
+    params: list[_Param] = field(default_factory=list)
+    routes: dict[HTTPMeth, tuple[PathTemplate, Any]] = field(default_factory=dict)
+
+
+def _segments(path: str) -> list[str]:
+    return path.strip("/").split("/") if path.strip("/") else []
+
+
+class RouteIndex[CommandT]:
+    """
+    A trie of route templates, one level per path segment.
+    A segment is either a literal or a whole template parameter,
+    e.g. `{exercise_id:str}`, which matches any segment its type accepts.
+    Literals win over parameters, so `/v3/users/me` resolves before
+    `/v3/users/{user_id:int}` would be tried.
+    """
+
+    def __init__(self) -> None:
+        self._root = _Node()
+
+    def add(self, method: HTTPMeth, template: PathTemplate, command: CommandT) -> None:
+        node = self._root
+        for segment in _segments(template):
+            match = PathTemplate.TEMPLATE_PARAM_REGEX.fullmatch(segment)
+            if match is None:
+                if "{" in segment:
+                    raise ValueError(
+                        f"A parameter must span a whole segment: {template}"
+                    )
+                node = node.literals.setdefault(segment, _Node())
+                continue
+
+            name, type_hint = match.group(1), match.group(2) or "str"
+            param = next((p for p in node.params if p.name == name), None)
+            if param is None:
+                param = _Param(name, segment, CONVERTERS[type_hint], _Node())
+                node.params.append(param)
+            node = param.node
+        node.routes[method] = (template, command)
+
+    def resolve(self, method: HTTPMeth, path: str) -> RouteMatch[CommandT] | None:
+        """
+        Finds the route of a concrete path, e.g. `/v3/exercises/abc/gpx`.
+        The segments are percent-decoded once split, the request quotes them again.
+        """
+        segments = [unquote(segment) for segment in _segments(path.partition("?")[0])]
+
+        def walk(node: _Node, index: int, params: dict[str, Any]):
+            if index == len(segments):
+                route = node.routes.get(method)
+                return None if route is None else (route, params)
+
+            segment = segments[index]
+            if segment in node.literals:
+                found = walk(node.literals[segment], index + 1, params)
+                if found:
+                    return found
+            for param in node.params:
+                try:
+                    value = param.convert(segment)
+                except ValueError:
+                    continue
+                found = walk(param.node, index + 1, {**params, param.name: value})
+                if found:
+                    return found
+            return None
+
+        found = walk(self._root, 0, {})
+        if not found:
+            return None
+        (template, command), params = found
+        return RouteMatch(template, command, params)
+
+    def _templates(self, node: _Node) -> Iterator[PathTemplate]:
+        yield from {template for template, _ in node.routes.values()}
+        for child in node.literals.values():
+            yield from self._templates(child)
+        for param in node.params:
+            yield from self._templates(param.node)
+
+    def complete(self, prefix: str) -> list[str]:
+        """
+        The routes extending a partially typed path.
+        The typed segments are kept, even concrete parameter values,
+        and the rest of each route is completed from its template.
+        """
+        typed = prefix.lstrip("/").split("/")
+        *complete, partial = typed
+
+        nodes = [self._root]
+        for segment in complete:
+            following = []
+            for node in nodes:
+                if segment in node.literals:
+                    following.append(node.literals[segment])
+                following.extend(
+                    param.node for param in node.params if param.accepts(segment)
+                )
+            nodes = following
+
+        completions = []
+        for node in nodes:
+            for template in self._templates(node):
+                rest = _segments(template)[len(complete) :]
+                if not rest:
+                    continue
+                if rest[0].startswith(partial):
+                    completions.append("/" + "/".join([*complete, *rest]))
+                elif PathTemplate.TEMPLATE_PARAM_REGEX.fullmatch(rest[0]):
+                    # A parameter value is being typed
+                    completions.append("/" + "/".join([*complete, partial, *rest[1:]]))
+        return sorted(set(completions))
@@ -0,0 +1,152 @@
+import codecs
+import json
+import re
+from collections.abc import AsyncIterable, AsyncIterator
+from enum import Enum, auto
+from typing import Any
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# What a scan of a value stops at, within a string and outside of one.
+# At the top level a scalar also ends at a delimiter.
+_STRING_STOPS = re.compile(r'["\\]')
+_NESTED_STOPS = re.compile(r'["\[\]{}]')
+_TOP_LEVEL_STOPS = re.compile(r'["\[\]{},\s]')
+
+
+class _State(Enum):
+    START = auto()
+    FIRST = auto()
+    VALUE = auto()
+    SEPARATOR = auto()
+    END = auto()
+
+
+class JSONArrayParser:
+    """
+    An incremental parser of a top-level JSON array.
+    Each element is returned as soon as it is complete,
+    and only the pending element is buffered.
+    The end of an element is found by scanning each chunk once,
+    tracking the strings and the nesting depth, so it's decoded only once
+    however many chunks it spans.
+    """
+
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._state = _State.START
+        # The chunks of the pending element, None between elements
+        self._parts: list[str] | None = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def _scan(self, text: str, position: int) -> int | None:
+        """The end of the pending element in `text`, or None if it goes on."""
+        while position < len(text):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                    position += 1
+                    continue
+                match = _STRING_STOPS.search(text, position)
+                if match is None:
+                    return None
+                position = match.end()
+                if match.group() == "\\":
+                    self._escaped = True
+                    continue
+                self._in_string = False
+                if not self._depth:
+                    return position
+                continue
+
+            stops = _NESTED_STOPS if self._depth else _TOP_LEVEL_STOPS
+            match = stops.search(text, position)
+            if match is None:
+                return None
+            position = match.start()
+            match text[position]:
+                case '"':
+                    self._in_string = True
+                case "[" | "{":
+                    self._depth += 1
+                case "]" | "}" if self._depth:
+                    self._depth -= 1
+                    if not self._depth:
+                        return position + 1
+                case _:
+                    # A scalar followed by a delimiter, e.g. "-2" + ".5" + ","
+                    return position
+            position += 1
+        return None
+
+    def _decode(self) -> Any:
+        parts, self._parts = self._parts or [], None
+        self._state = _State.SEPARATOR
+        return self._decoder.decode("".join(parts))
+
+    def feed(self, text: str, final: bool = False) -> list[Any]:
+        position = 0
+        items = []
+        while True:
+            if self._parts is not None:
+                end = self._scan(text, position)
+                if end is None:
+                    self._parts.append(text[position:])
+                    break
+                self._parts.append(text[position:end])
+                items.append(self._decode())
+                position = end
+
+            position = _WHITESPACE.match(text, position).end()
+            if position == len(text):
+                break
+
+            match self._state:
+                case _State.START:
+                    if text[position] != "[":
+                        raise ValueError("Expected a JSON array")
+                    self._state = _State.FIRST
+                    position += 1
+                case _State.FIRST if text[position] == "]":
+                    self._state = _State.END
+                    position += 1
+                case _State.FIRST | _State.VALUE:
+                    self._parts = []
+                    self._depth = 0
+                    self._in_string = self._escaped = False
+                case _State.SEPARATOR:
+                    match text[position]:
+                        case ",":
+                            self._state = _State.VALUE
+                        case "]":
+                            self._state = _State.END
+                        case char:
+                            raise ValueError(f"Unexpected '{char}' in a JSON array")
+                    position += 1
+                case _State.END:
+                    raise ValueError("Unexpected data after the JSON array")
+
+        if final:
+            if self._parts is not None:
+                # Only a scalar ends with the document, e.g. "[1, 2"
+                if self._depth or self._in_string:
+                    raise ValueError("The JSON array is incomplete")
+                items.append(self._decode())
+            if self._state is not _State.END:
+                raise ValueError("The JSON array is incomplete")
+        return items
+
+
+async def iter_json_array(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    """
+    Yields the elements of a JSON array from a stream of byte chunks.
+    The next chunk is pulled only once the consumer asks for more elements.
+    """
+    parser = JSONArrayParser()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in chunks:
+        for item in parser.feed(decoder.decode(chunk)):
+            yield item
+    for item in parser.feed(decoder.decode(b"", final=True), final=True):
+        yield item
@@ -0,0 +1,140 @@
+import asyncio
+import math
+import random
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import Protocol, Self
+
+import httpx
+
+
+class RateLimiter(Protocol):
+    async def acquire(self) -> None:
+        """Waits until the caller may send one request."""
+        ...
+
+    def defer(self, delay: float) -> None:
+        """Holds every caller back for `delay` seconds, e.g. after a 429."""
+        ...
+
+
+class TokenBucket:
+    """
+    A token bucket rate limiter meant to be shared by every client
+    and every concurrent caller drawing on the same quota.
+    Callers are served in arrival order.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("The rate must be positive")
+
+        self.rate = rate
+        self.capacity = max(capacity if capacity is not None else rate, 1.0)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._deferred_until = -math.inf
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_quota(cls, requests: int, period: float) -> Self:
+        """A bucket which lets `requests` through per `period` seconds."""
+        return cls(rate=requests / period, capacity=requests)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = self.clock()
+                if now < self._deferred_until:
+                    await asyncio.sleep(self._deferred_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def defer(self, delay: float) -> None:
+        self._deferred_until = max(self._deferred_until, self.clock() + delay)
+
+
+def parse_retry_after(response: httpx.Response) -> float | None:
+    """Reads the `Retry-After` header, given in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(UTC)).total_seconds(), 0.0)
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """
+    Retries throttled and failed requests with jittered exponential backoff.
+    Non-idempotent requests are retried only after a 429,
+    which means the request was rejected before being processed.
+    """
+
+    max_attempts: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    # A longer Retry-After than this gives up instead of stalling the caller
+    max_retry_after: float = 120.0
+    retry_statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+    idempotent_methods: frozenset[str] = frozenset(
+        {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+    )
+
+    def delay(
+        self,
+        method: str,
+        attempt: int,
+        response: httpx.Response | None = None,
+        error: Exception | None = None,
+    ) -> float | None:
+        """
+        Returns the seconds to wait before the next attempt,
+        or None if the outcome of `attempt` is final.
+        """
+        if attempt >= self.max_attempts:
+            return None
+
+        if response is not None:
+            if response.status_code not in self.retry_statuses:
+                return None
+            if response.status_code != 429 and method not in self.idempotent_methods:
+                return None
+            retry_after = parse_retry_after(response)
+            if retry_after is not None:
+                return retry_after if retry_after <= self.max_retry_after else None
+        elif not (
+            isinstance(error, httpx.TransportError)
+            and method in self.idempotent_methods
+        ):
+            return None
+
+        # Full jitter spreads out the retries of concurrent callers
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
@@ -3,10 +3,11 @@ from abc import ABC
 from collections.abc import Callable
 from typing import ClassVar, cast, get_overloads
 
-from .descriptors import EndpointCommand
+from .descriptors import EndpointCommand, OverloadedCommand
 from .fields import PathTemplate
 from .models import RouteMeta
 from .protocols import Routable
+from .routing import RouteIndex, RouteMatch
 from .types import HTTPMeth, RouteKey
 
 
@@ -19,12 +20,15 @@ class Transportable[ClientT](ABC):
 
 class Discoverable(ABC):
     registry: ClassVar[dict[RouteKey, EndpointCommand]] = {}
+    # The registered routes by path segment, to match concrete paths
+    routes: ClassVar[RouteIndex[EndpointCommand]] = RouteIndex()
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
 
-        for name, member in inspect.getmembers(cls):
-            if not (callable(member) and inspect.iscoroutinefunction(member)):
+        # Inherited endpoints are registered by the class which defines them
+        for name, member in list(vars(cls).items()):
+            if not inspect.iscoroutinefunction(member):
                 continue
 
             overloads: list[Routable] = cast(list[Routable], get_overloads(member))
@@ -34,6 +38,7 @@ class Discoverable(ABC):
             # --- We found an endpoint ---
             # 'member' is the *real implementation* (e.g., def list_exercises(self...))
 
+            commands: list[EndpointCommand] = []
             for stub in overloads:
                 try:
                     route_info: RouteMeta = stub._route_info
@@ -50,19 +55,34 @@ class Discoverable(ABC):
                         f"Previous: {endpoint_name}, New: {stub_name}"
                     )
 
-                # Create a descriptor for each stub and replace the original method
-                # The last one will win, but they all point to the same implementation
+                # Create a descriptor for each stub,
+                # they all point to the same implementation
                 descriptor = route_info.build_command(cast(Callable, stub), member)
-                setattr(cls, name, descriptor)
+                commands.append(descriptor)
 
                 # Register the route for dynamic calls
                 cls.registry[route_key] = descriptor
+                cls.routes.add(route_info.method, route_info.path, descriptor)
+
+            # Replace the original method with a dispatcher over its overloads
+            if len(commands) == 1:
+                setattr(cls, name, commands[0])
+            elif commands:
+                setattr(cls, name, OverloadedCommand(commands))
 
     def find(self, method: HTTPMeth, path: PathTemplate) -> RouteMeta:
         return self.registry[(method, path)]._route_info
 
-    def discover(self, method: HTTPMeth, path: PathTemplate) -> EndpointCommand:
+    def resolve(self, method: HTTPMeth, path: str) -> RouteMatch[EndpointCommand]:
+        """Matches a concrete path, e.g. `/v3/exercises/abc`, to its route."""
+        match = self.routes.resolve(method, path)
+        if match is None:
+            raise ValueError(f"Route {(method, path)} not found")
+        return match
+
+    def discover(self, method: HTTPMeth, path: PathTemplate | str) -> EndpointCommand:
+        """Finds the command of a route template or of a concrete path."""
         route_key = (method, path)
-        if route_key not in self.registry:
-            raise ValueError(f"Route {route_key} not found")
-        return self.registry[route_key]
+        if route_key in self.registry:
+            return self.registry[route_key]
+        return self.resolve(method, path).command
@@ -0,0 +1,14 @@
+from functools import cache
+from typing import Any
+
+import pydantic
+
+
+@cache
+def type_adapter(tp: Any) -> pydantic.TypeAdapter:
+    """
+    The adapter of a response type, built once per type.
+    Building an adapter compiles its validator, which costs more
+    than validating a typical response.
+    """
+    return pydantic.TypeAdapter(tp)
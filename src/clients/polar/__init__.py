@@ -7,7 +7,9 @@ from .models import (
     HeartRateZone,
     NightlyRecharge,
     TrainingLoad,
+    Transaction,
 )
+from .samples import RouteSeries, SampleSeries, SampleType
 
 __all__ = [
     "BearerAuth",
@@ -18,4 +20,8 @@ __all__ = [
     "HeartRateZone",
     "ActivitySummary",
     "NightlyRecharge",
+    "Transaction",
+    "SampleSeries",
+    "SampleType",
+    "RouteSeries",
 ]
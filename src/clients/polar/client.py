@@ -1,35 +1,102 @@
-import tempfile
-from typing import cast, overload
+import asyncio
+from collections.abc import AsyncIterator, Iterable
+from concurrent.futures import Executor
+from contextlib import AbstractAsyncContextManager
+from typing import TYPE_CHECKING, ClassVar, overload
 
 import httpx
-from gpxpy import parse
-from gpxpy.gpx import GPX
-from tcxreader.tcxreader import TCXExercise, TCXReader
+from authlib.integrations.httpx_client import AsyncOAuth2Client
 
+from src.clients.base.batch import BatchResult
+from src.clients.base.caching import ResponseCache
 from src.clients.base.client import AsyncClient
+from src.clients.base.coalescing import RequestCoalescer
 from src.clients.base.contexts import ResponseContext
 from src.clients.base.decorators import route
 from src.clients.base.models import EndpointRequest, RouteMeta
+from src.clients.base.throttling import RateLimiter, RetryPolicy
+from src.clients.base.types import RouteKey
 
-from .contexts import ExerciseContext, ExerciseFormatContext, ListExercisesContext
-from .models import Exercise
+from .contexts import (
+    ExerciseContext,
+    ExerciseFormatContext,
+    ListExercisesContext,
+    TransactionContext,
+    TransactionItemContext,
+    TransactionsContext,
+)
+from .fit import FitDecoder, FitRecord
+from .formats import PARSERS
+from .models import Exercise, Transaction
+
+if TYPE_CHECKING:
+    from gpxpy.gpx import GPX
+    from tcxreader.tcxreader import TCXExercise
 
 
 class PolarClient(AsyncClient):
-    def __init__(self, transport):
-        super().__init__(transport)
+    # An exercise never changes once it's uploaded, so it can be cached for good
+    IMMUTABLE_ROUTES: ClassVar[frozenset[RouteKey]] = frozenset(
+        {
+            ("GET", "/v3/exercises/{exercise_id:str}"),
+            ("GET", "/v3/exercises/{exercise_id:str}/{format:str}"),
+        }
+    )
 
-    async def send(self, request: EndpointRequest) -> httpx.Response:
+    def __init__(
+        self,
+        transport: AsyncOAuth2Client,
+        *,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = RetryPolicy(),
+        parser_executor: Executor | None = None,
+        response_cache: ResponseCache | None = None,
+        coalescer: RequestCoalescer | None = None,
+    ):
+        super().__init__(
+            transport,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            response_cache=response_cache,
+            coalescer=coalescer,
+        )
+        # GPX/TCX/FIT documents are parsed here, off the event loop.
+        # None stands for the loop's default thread pool,
+        # a process pool lets parsing scale across cores.
+        self.parser_executor = parser_executor
+
+    @property
+    def principal(self) -> str:
+        # The Polar user stays the same when the access token is refreshed
+        token = getattr(self.transport, "token", None) or {}
+        if user_id := token.get("x_user_id"):
+            return str(user_id)
+        return super().principal
+
+    @staticmethod
+    def _query_params(request: EndpointRequest) -> dict:
         params = {}
         if request.params:
             params.update(
                 request.params.model_dump(exclude_none=True, exclude_unset=True)
             )
+        return params
 
+    async def send(self, request: EndpointRequest) -> httpx.Response:
         return await self.transport.request(
             request.method,
             request.url,
-            params=params,
+            params=self._query_params(request),
+            headers=request.headers,
+        )
+
+    def stream(
+        self, request: EndpointRequest
+    ) -> AbstractAsyncContextManager[httpx.Response]:
+        return self.transport.stream(
+            request.method,
+            request.url,
+            params=self._query_params(request),
             headers=request.headers,
         )
 
@@ -56,9 +123,15 @@ class PolarClient(AsyncClient):
         Returns:
             List[Exercise]: A list of Exercise models.
         """
-        response = context.response
-        json_response = cast(list[dict], response.json())
-        return [Exercise.model_validate(item) for item in json_response]
+        return context.validate_json(list[Exercise])
+
+    def iter_exercises(self, context: ListExercisesContext) -> AsyncIterator[Exercise]:
+        """Streams the exercises of the authenticated user one at a time.
+
+        Unlike `list_exercises`, the response is parsed incrementally,
+        so long histories are processed in constant memory.
+        """
+        return self.iter_items("GET", "/v3/exercises", Exercise, context)
 
     @overload
     @route(
@@ -76,7 +149,7 @@ class PolarClient(AsyncClient):
 
     @overload
     @route(
-        RouteMeta[GPX | TCXExercise](
+        RouteMeta["GPX | TCXExercise | list[FitRecord]"](
             method="GET",
             path="/v3/exercises/{exercise_id:str}/{format:str}",
             headers=httpx.Headers(
@@ -88,32 +161,156 @@ class PolarClient(AsyncClient):
     )
     async def get_exercise(
         self, context: ExerciseFormatContext
-    ) -> GPX | TCXExercise: ...
+    ) -> "GPX | TCXExercise | list[FitRecord]": ...
 
     async def get_exercise(
         self, context: ResponseContext
-    ) -> Exercise | GPX | TCXExercise:
+    ) -> "Exercise | GPX | TCXExercise | list[FitRecord]":
         """Fetches a specific exercise by ID for the authenticated user.
 
         Args:
             exercise_id (str): The ID of the exercise to fetch.
             format (str, optional): The format of the response
-                ('gpx', 'tcx'). Defaults to 'json'.
+                ('gpx', 'tcx', 'fit'). Defaults to 'json'.
         Returns:
-            Exercise | GPX | TCXExercise:
-                An Exercise model or GPX data depending on the requested format.
+            Exercise | GPX | TCXExercise | list[FitRecord]:
+                An Exercise model or the parsed export of the requested format.
         """
         response = context.response
-        match response.headers["Content-Type"]:
+        content_type = response.headers.get("Content-Type", "unknown")
+        match content_type.partition(";")[0].strip():
             case "application/json":
-                return Exercise.model_validate(response.json())
-            case "application/gpx+xml" | "application/vnd.garmin.tcx+xml":
-                return parse(response.text)
-            case "application/octet-stream":  # Fit format
-                with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                    temp_file.write(response.content)
-                    temp_file_path = temp_file.name
-                    return TCXReader().read(temp_file_path)
+                return context.validate_json(Exercise)
+            case media_type if media_type in PARSERS:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self.parser_executor, PARSERS[media_type], response.content
+                )
             case _:
-                content_type = response.headers.get("Content-Type", "unknown")
                 raise ValueError(f"Unsupported response content type: {content_type}")
+
+    async def iter_exercise_records(
+        self, context: ExerciseContext
+    ) -> AsyncIterator[FitRecord]:
+        """Streams the samples of an exercise from its FIT export.
+
+        The export is decoded while it downloads, one chunk at a time,
+        so it's never held in memory or on disk as a whole.
+        """
+        decoder = FitDecoder()
+        chunks = self.iter_bytes(
+            "GET",
+            "/v3/exercises/{exercise_id:str}/{format:str}",
+            ExerciseFormatContext(
+                exercise_id=context.exercise_id, format="fit", params=context.params
+            ),
+        )
+        async for chunk in chunks:
+            for record in decoder.feed(chunk):
+                yield record
+        for record in decoder.feed(b"", final=True):
+            yield record
+
+    def get_exercises(
+        self,
+        contexts: Iterable[ExerciseContext | ExerciseFormatContext],
+        *,
+        concurrency: int = 8,
+        ordered: bool = False,
+    ) -> AsyncIterator[
+        BatchResult[
+            ExerciseContext | ExerciseFormatContext,
+            "Exercise | GPX | TCXExercise | list[FitRecord]",
+        ]
+    ]:
+        """Fetches many exercises concurrently, collecting per-exercise errors.
+
+        Args:
+            contexts: The exercises to fetch, in any mix of formats.
+            concurrency: The maximum number of requests in flight.
+            ordered: Whether to yield results in input order
+                instead of completion order.
+        """
+        return self.fetch_many(
+            self.get_exercise, contexts, concurrency=concurrency, ordered=ordered
+        )
+
+    @overload
+    @route(
+        RouteMeta[Transaction | None](
+            method="POST",
+            path="/v3/users/{user_id:int}/{transactions:str}",
+            headers=httpx.Headers({"Accept": "application/json"}),
+        )
+    )
+    async def create_transaction(
+        self, context: TransactionsContext
+    ) -> Transaction | None:
+        """see: https://www.polar.com/accesslink-api/#create-transaction"""
+
+    async def create_transaction(self, context: ResponseContext) -> Transaction | None:
+        """Opens a transaction of the data which is new since the last commit.
+
+        Returns:
+            Transaction | None: The transaction, or None if there's no new data.
+        """
+        response = context.response
+        if response.status_code == 204:
+            return None
+        return context.validate_json(Transaction)
+
+    @overload
+    @route(
+        RouteMeta[list[str]](
+            method="GET",
+            path="/v3/users/{user_id:int}/{transactions:str}/{transaction_id:int}",
+            headers=httpx.Headers({"Accept": "application/json"}),
+        )
+    )
+    async def list_transaction(self, context: TransactionContext) -> list[str]:
+        """see: https://www.polar.com/accesslink-api/#list-exercises"""
+
+    async def list_transaction(self, context: ResponseContext) -> list[str]:
+        """Lists the URLs of the items within a transaction.
+
+        Returns:
+            list[str]: The item URLs, e.g. of `get_transaction_item`.
+        """
+        response = context.response
+        if response.status_code == 204:
+            return []
+        # The key depends on the kind, e.g. "exercises" or "activity-log"
+        items = context.validate_json(dict[str, list[str]])
+        return next(iter(items.values()), [])
+
+    @overload
+    @route(
+        RouteMeta[dict](
+            method="GET",
+            path=(
+                "/v3/users/{user_id:int}/{transactions:str}/{transaction_id:int}"
+                "/{resource:str}/{item_id:str}"
+            ),
+            headers=httpx.Headers({"Accept": "application/json"}),
+        )
+    )
+    async def get_transaction_item(self, context: TransactionItemContext) -> dict:
+        """see: https://www.polar.com/accesslink-api/#get-exercise-summary"""
+
+    async def get_transaction_item(self, context: ResponseContext) -> dict:
+        """Fetches a single item of a transaction as it was sent."""
+        return context.validate_json(dict)
+
+    @overload
+    @route(
+        RouteMeta[None](
+            method="PUT",
+            path="/v3/users/{user_id:int}/{transactions:str}/{transaction_id:int}",
+        )
+    )
+    async def commit_transaction(self, context: TransactionContext) -> None:
+        """see: https://www.polar.com/accesslink-api/#commit-transaction"""
+
+    async def commit_transaction(self, context: ResponseContext) -> None:
+        """Commits a transaction, its items won't be part of the next one."""
+        return None
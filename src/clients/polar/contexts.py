@@ -18,6 +18,31 @@ class ExerciseContext(RequestContext[ExerciseQueryParams]):
 
 class ExerciseFormatContext(RequestContext[ExerciseQueryParams]):
     exercise_id: str = Field(..., description="The ID of the exercise")
-    format: Literal["gpx", "tcx"] = Field(
+    format: Literal["gpx", "tcx", "fit"] = Field(
         ..., description="The format of the exercise data"
     )
+
+
+TransactionKind = Literal[
+    "exercise-transactions",
+    "activity-transactions",
+    "physical-information-transactions",
+]
+
+
+class TransactionsContext(RequestContext[None]):
+    user_id: int = Field(..., description="The Polar ID of the user")
+    transactions: TransactionKind = Field(
+        ..., description="The kind of data the transactions carry"
+    )
+
+
+class TransactionContext(TransactionsContext):
+    transaction_id: int = Field(..., description="The ID of the transaction")
+
+
+class TransactionItemContext(TransactionContext):
+    resource: Literal["exercises", "activities", "physical-informations"] = Field(
+        ..., description="The collection of the item within the transaction"
+    )
+    item_id: str = Field(..., description="The ID of the item")
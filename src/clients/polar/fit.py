@@ -0,0 +1,279 @@
+"""
+A decoder of the samples in FIT files, the binary export of exercises.
+
+Only the record messages, which carry the per-second samples, are decoded;
+every other message is skipped without being unpacked.
+see: https://developer.garmin.com/fit/protocol/
+"""
+
+import struct
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from enum import Enum, auto
+from typing import Any
+
+# 1989-12-31T00:00:00Z, the FIT epoch, as a unix timestamp
+FIT_EPOCH = 631065600
+
+RECORD_MESSAGE = 20
+TIMESTAMP_FIELD = 253
+
+_HEADER = struct.Struct("<BBHI4s")
+_INVALID_TIMESTAMP = 0xFFFFFFFF
+
+# Base type -> (struct format, invalid value)
+_BASE_TYPES: dict[int, tuple[str, Any]] = {
+    0x00: ("B", 0xFF),
+    0x01: ("b", 0x7F),
+    0x02: ("B", 0xFF),
+    0x83: ("h", 0x7FFF),
+    0x84: ("H", 0xFFFF),
+    0x85: ("i", 0x7FFFFFFF),
+    0x86: ("I", 0xFFFFFFFF),
+    0x0A: ("B", 0x00),
+    0x8B: ("H", 0x0000),
+    0x8C: ("I", 0x00000000),
+    0x0D: ("B", 0xFF),
+    0x8E: ("q", 0x7FFFFFFFFFFFFFFF),
+    0x8F: ("Q", 0xFFFFFFFFFFFFFFFF),
+    0x90: ("Q", 0x0000000000000000),
+}
+
+_SEMICIRCLES = 2**31 / 180
+# Record field number -> (FitRecord slot, scale, offset),
+# the value is `raw / scale - offset`
+_RECORD_FIELDS: dict[int, tuple[int, float, float]] = {
+    0: (1, _SEMICIRCLES, 0),  # position_lat
+    1: (2, _SEMICIRCLES, 0),  # position_long
+    2: (3, 5, 500),  # altitude
+    3: (4, 1, 0),  # heart_rate
+    4: (5, 1, 0),  # cadence
+    5: (6, 100, 0),  # distance
+    6: (7, 1000, 0),  # speed
+    7: (8, 1, 0),  # power
+    13: (9, 1, 0),  # temperature
+    73: (7, 1000, 0),  # enhanced_speed
+    78: (3, 5, 500),  # enhanced_altitude
+}
+# The enhanced fields supersede their 16-bit counterparts
+_ENHANCED_FIELDS = frozenset({73, 78})
+
+
+@dataclass(slots=True)
+class FitRecord:
+    """A single sample of an exercise, in SI units and degrees."""
+
+    timestamp: datetime | None = None
+    latitude: float | None = None
+    longitude: float | None = None
+    altitude: float | None = None
+    heart_rate: int | None = None
+    cadence: int | None = None
+    distance: float | None = None
+    speed: float | None = None
+    power: int | None = None
+    temperature: int | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class _Definition:
+    global_number: int
+    # Unpacks only the fields of interest and skips over the rest
+    layout: struct.Struct
+    timestamp: int | None
+    # (position in the unpacked values, FitRecord slot, scale, offset, invalid)
+    fields: tuple[tuple[int, int, float, float, Any], ...]
+
+    @classmethod
+    def compile(
+        cls,
+        global_number: int,
+        big_endian: bool,
+        fields: list[tuple[int, int, int]],
+        developer_size: int,
+    ) -> "_Definition":
+        layout = [">" if big_endian else "<"]
+        timestamp = None
+        accessors = []
+        position = 0
+        for number, size, base_type in fields:
+            base_format, invalid = _BASE_TYPES.get(base_type, ("", None))
+            wanted = number == TIMESTAMP_FIELD or (
+                global_number == RECORD_MESSAGE and number in _RECORD_FIELDS
+            )
+            # Arrays, strings and unknown types are never wanted
+            if not wanted or not base_format or struct.calcsize(base_format) != size:
+                layout.append(f"{size}x")
+                continue
+
+            layout.append(base_format)
+            if number == TIMESTAMP_FIELD:
+                timestamp = position
+            else:
+                accessors.append((number, (position, *_RECORD_FIELDS[number], invalid)))
+            position += 1
+        layout.append(f"{developer_size}x")
+
+        accessors.sort(key=lambda accessor: accessor[0] in _ENHANCED_FIELDS)
+        return cls(
+            global_number=global_number,
+            layout=struct.Struct("".join(layout)),
+            timestamp=timestamp,
+            fields=tuple(accessor for _, accessor in accessors),
+        )
+
+
+class _State(Enum):
+    HEADER = auto()
+    RECORDS = auto()
+    CRC = auto()
+
+
+class FitDecoder:
+    """
+    An incremental decoder of FIT files, which may be chained.
+    Each record is returned as soon as its message is complete,
+    and only the incomplete tail of the data is buffered,
+    so a download is decoded in memory bounded by its chunk size.
+    The checksums are not verified.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = b""
+        self._state = _State.HEADER
+        self._remaining = 0
+        self._definitions: dict[int, _Definition] = {}
+        self._timestamp = 0
+        self._files = 0
+
+    def _record(
+        self, definition: _Definition, values: tuple, timestamp: int | None
+    ) -> FitRecord:
+        row: list[Any] = [None] * 10
+        if timestamp is not None:
+            row[0] = datetime.fromtimestamp(timestamp + FIT_EPOCH, UTC)
+        for position, slot, scale, offset, invalid in definition.fields:
+            raw = values[position]
+            if raw == invalid:
+                continue
+            row[slot] = raw if scale == 1 and not offset else raw / scale - offset
+        return FitRecord(*row)
+
+    def feed(self, data: bytes | memoryview, final: bool = False) -> list[FitRecord]:
+        buffer = self._buffer + data if self._buffer else data
+        size = len(buffer)
+        position = 0
+        records = []
+        while position < size:
+            available = size - position
+
+            if self._state is _State.HEADER:
+                header_size = buffer[position]
+                if available < max(header_size, _HEADER.size):
+                    break
+                _, _, _, data_size, signature = _HEADER.unpack_from(buffer, position)
+                if header_size < _HEADER.size or signature != b".FIT":
+                    raise ValueError("Expected a FIT file")
+                self._files += 1
+                self._definitions.clear()
+                self._remaining = data_size
+                self._state = _State.RECORDS if data_size else _State.CRC
+                position += header_size
+                continue
+
+            if self._state is _State.CRC:
+                if available < 2:
+                    break
+                self._state = _State.HEADER
+                position += 2
+                continue
+
+            header = buffer[position]
+            if header & 0x80:  # A data message with a compressed timestamp
+                definition = self._definitions.get((header >> 5) & 0x03)
+            elif header & 0x40:  # A definition message
+                if available < 6:
+                    break
+                fields_count = buffer[position + 5]
+                length = 6 + 3 * fields_count
+                developer_count = 0
+                if header & 0x20:
+                    if available < length + 1:
+                        break
+                    developer_count = buffer[position + length]
+                    length += 1 + 3 * developer_count
+                if available < length:
+                    break
+
+                big_endian = buffer[position + 2] == 1
+                global_number = int.from_bytes(
+                    buffer[position + 3 : position + 5],
+                    "big" if big_endian else "little",
+                )
+                fields_start = position + 6
+                fields = [
+                    tuple(buffer[offset : offset + 3])
+                    for offset in range(
+                        fields_start, fields_start + 3 * fields_count, 3
+                    )
+                ]
+                developer_start = fields_start + 3 * fields_count + 1
+                developer_size = sum(
+                    buffer[offset + 1]
+                    for offset in range(
+                        developer_start, developer_start + 3 * developer_count, 3
+                    )
+                )
+                self._definitions[header & 0x0F] = _Definition.compile(
+                    global_number, big_endian, fields, developer_size
+                )
+                position = self._consume(position, length)
+                continue
+            else:
+                definition = self._definitions.get(header & 0x0F)
+
+            if definition is None:
+                raise ValueError("A FIT data message precedes its definition")
+            length = 1 + definition.layout.size
+            if available < length:
+                break
+
+            values = definition.layout.unpack_from(buffer, position + 1)
+            timestamp = None
+            if definition.timestamp is not None:
+                timestamp = values[definition.timestamp]
+                if timestamp == _INVALID_TIMESTAMP:
+                    timestamp = None
+                else:
+                    self._timestamp = timestamp
+            if header & 0x80:
+                offset = header & 0x1F
+                timestamp = (self._timestamp & ~0x1F) + offset
+                if offset < self._timestamp & 0x1F:
+                    timestamp += 0x20
+                self._timestamp = timestamp
+
+            if definition.global_number == RECORD_MESSAGE:
+                records.append(self._record(definition, values, timestamp))
+            position = self._consume(position, length)
+
+        self._buffer = bytes(buffer[position:])
+        if final:
+            if self._buffer or self._state is not _State.HEADER:
+                raise ValueError("The FIT file is incomplete")
+            if not self._files:
+                raise ValueError("Expected a FIT file")
+        return records
+
+    def _consume(self, position: int, length: int) -> int:
+        if length > self._remaining:
+            raise ValueError("A FIT message overruns the file")
+        self._remaining -= length
+        if not self._remaining:
+            self._state = _State.CRC
+        return position + length
+
+
+def decode_fit(content: bytes | memoryview) -> list[FitRecord]:
+    """Decodes the samples of a whole FIT file held in memory."""
+    return FitDecoder().feed(content, final=True)
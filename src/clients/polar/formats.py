@@ -0,0 +1,43 @@
+"""
+Parsers of the exercise export formats.
+
+The parsers are CPU-bound, so the client runs them in an executor.
+They are plain module-level functions of the raw response body,
+which keeps them picklable for a process pool.
+The GPX and TCX libraries are imported on first use,
+most callers never parse either format.
+"""
+
+import io
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from .fit import FitRecord, decode_fit
+
+if TYPE_CHECKING:
+    from gpxpy.gpx import GPX
+    from tcxreader.tcxreader import TCXExercise
+
+
+def parse_gpx(content: bytes) -> "GPX":
+    from gpxpy import parse
+
+    return parse(content.decode("utf-8"))
+
+
+def parse_tcx(content: bytes) -> "TCXExercise":
+    from tcxreader.tcxreader import TCXReader
+
+    # The reader accepts anything `ElementTree.parse` does, a file object included
+    return TCXReader().read(io.BytesIO(content))
+
+
+def parse_fit(content: bytes) -> list[FitRecord]:
+    return decode_fit(content)
+
+
+PARSERS: dict[str, Callable[[bytes], Any]] = {
+    "application/gpx+xml": parse_gpx,
+    "application/vnd.garmin.tcx+xml": parse_tcx,
+    "application/octet-stream": parse_fit,
+}
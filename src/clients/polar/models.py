@@ -8,6 +8,8 @@ from pydantic import (
     field_validator,
 )
 
+from .samples import RouteSeries, SampleSeries, SampleType
+
 
 class DateModel(ABC, BaseModel):
     date: Annotated[
@@ -76,6 +78,7 @@ class ExerciseQueryParams(BaseModel):
 class Exercise(BaseModel):
     """Represents a single exercise data set."""
 
+    id: str | None = Field(None, description="The ID of the exercise.")
     polar_user: str = Field(..., description="The ID of the Polar user.")
     start_time: datetime.datetime = Field(
         ..., description="Start time of the exercise in ISO 8601 format."
@@ -104,6 +107,10 @@ class Exercise(BaseModel):
     heart_rate: HeartRate | None = Field(
         None, description="Heart rate data for the exercise."
     )
+    samples: list[SampleSeries] | None = Field(
+        None, description="Sample series of the exercise, one per sample type."
+    )
+    route: RouteSeries | None = Field(None, description="GPS route of the exercise.")
 
     @field_validator("start_time", mode="before")
     def parse_start_time(cls, value):
@@ -112,6 +119,36 @@ class Exercise(BaseModel):
             return datetime.datetime.fromisoformat(value)
         return value
 
+    def series(self, sample_type: SampleType) -> SampleSeries | None:
+        """Returns the samples of a type, if they were recorded and requested."""
+        for series in self.samples or ():
+            if series.sample_type is sample_type:
+                return series
+        return None
+
+    def zone_time(self) -> dict[int, float]:
+        """Computes the seconds spent in each heart rate zone, keyed by zone index."""
+        heart_rate = self.series(SampleType.HEART_RATE)
+        if heart_rate is None or self.heart_rate is None or not self.heart_rate.zones:
+            return {}
+        return heart_rate.time_in_ranges(
+            {
+                zone.index: (zone.min_heart_rate, zone.max_heart_rate)
+                for zone in self.heart_rate.zones
+            }
+        )
+
+
+class Transaction(BaseModel):
+    """Represents a transaction of data that is new since the last commit."""
+
+    transaction_id: int = Field(
+        ..., alias="transaction-id", description="The ID of the transaction."
+    )
+    resource_uri: str = Field(
+        ..., alias="resource-uri", description="The URI of the transaction."
+    )
+
 
 class ActivitySummary(DateModel):
     """Represents a user's activity summary for a single day."""
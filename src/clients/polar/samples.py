@@ -0,0 +1,358 @@
+"""
+Columnar containers of exercise samples and routes.
+
+Each series keeps its values in typed arrays, 8 bytes per value,
+instead of a Python object per sample. The objects of single samples
+are created only when they're accessed, and the aggregates run over the arrays.
+Missing values are stored as NaN.
+"""
+
+import math
+import re
+from array import array
+from bisect import bisect_right
+from collections.abc import Hashable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from enum import IntEnum
+from itertools import accumulate
+from typing import Any, Self, overload
+
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import core_schema
+
+_DURATION = re.compile(
+    r"P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?"
+    r"(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?"
+)
+
+
+class SampleType(IntEnum):
+    """see: https://www.polar.com/accesslink-api/#exercise-sample-types"""
+
+    HEART_RATE = 0
+    SPEED = 1
+    CADENCE = 2
+    ALTITUDE = 3
+    POWER = 4
+    POWER_PEDALING_INDEX = 5
+    POWER_LEFT_RIGHT_BALANCE = 6
+    AIR_PRESSURE = 7
+    RUNNING_CADENCE = 8
+    TEMPERATURE = 9
+    DISTANCE = 10
+    RR_INTERVAL = 11
+
+
+@dataclass(frozen=True, slots=True)
+class Sample:
+    offset: float = 0.0
+    value: float | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class RoutePoint:
+    offset: float = 0.0
+    latitude: float = 0.0
+    longitude: float = 0.0
+    altitude: float | None = None
+    satellites: int | None = None
+
+
+def _parse_value(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        # Gaps in the recording, e.g. "NULL" or an empty value
+        return math.nan
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return ""
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _parse_offset(value: Any, origin: datetime | None) -> tuple[float, datetime | None]:
+    """Reads the offset of a route point from the start of the exercise."""
+    if isinstance(value, int | float):
+        return float(value), origin
+    if match := _DURATION.fullmatch(value):
+        parts = {name: float(part or 0) for name, part in match.groupdict().items()}
+        seconds = parts["seconds"] + 60 * (
+            parts["minutes"] + 60 * (parts["hours"] + 24 * parts["days"])
+        )
+        return seconds, origin
+    if value.count(":") == 2 and "T" not in value:
+        hours, minutes, seconds = value.split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds), origin
+
+    moment = datetime.fromisoformat(value)
+    origin = origin or moment
+    return (moment - origin).total_seconds(), origin
+
+
+class SampleSeries(Sequence[Sample]):
+    """
+    The samples of one type recorded at a fixed rate during an exercise.
+    A slice of the series is a series of its own, with offsets starting at zero.
+    """
+
+    __slots__ = ("sample_type", "recording_rate", "values")
+
+    def __init__(
+        self,
+        sample_type: SampleType,
+        recording_rate: float,
+        values: array,
+    ) -> None:
+        self.sample_type = sample_type
+        # Seconds between samples
+        self.recording_rate = recording_rate
+        self.values = values
+
+    @classmethod
+    def parse(cls, sample_type: int, recording_rate: float, data: str) -> Self:
+        """Reads the comma separated values of an AccessLink sample."""
+        items = data.split(",") if data else []
+        try:
+            values = array("d", map(float, items))
+        except ValueError:
+            values = array("d", map(_parse_value, items))
+        return cls(SampleType(sample_type), recording_rate, values)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @overload
+    def __getitem__(self, index: int) -> Sample: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "SampleSeries": ...
+
+    def __getitem__(self, index: int | slice) -> "Sample | SampleSeries":
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                raise ValueError("A sample series can't be sliced with a step")
+            return type(self)(self.sample_type, self.recording_rate, self.values[index])
+
+        value = self.values[index]
+        if index < 0:
+            index += len(self.values)
+        return Sample(
+            offset=index * self.recording_rate,
+            value=None if math.isnan(value) else value,
+        )
+
+    def __iter__(self) -> Iterator[Sample]:
+        rate = self.recording_rate
+        for index, value in enumerate(self.values):
+            yield Sample(index * rate, None if math.isnan(value) else value)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SampleSeries):
+            return NotImplemented
+        return (
+            self.sample_type == other.sample_type
+            and self.recording_rate == other.recording_rate
+            and self.values.tobytes() == other.values.tobytes()
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}({self.sample_type.name}, "
+            f"recording_rate={self.recording_rate}, samples={len(self.values)})"
+        )
+
+    def mean(self) -> float | None:
+        valid = [value for value in self.values if not math.isnan(value)]
+        return math.fsum(valid) / len(valid) if valid else None
+
+    def rolling_mean(self, window: float) -> array:
+        """
+        The trailing mean of every sample over `window` seconds.
+        The running sums make it linear in the number of samples.
+        """
+        size = max(1, round(window / self.recording_rate)) if self.recording_rate else 1
+        # NaN is the only value which isn't equal to itself
+        sums = [0.0, *accumulate(0.0 if v != v else v for v in self.values)]
+        counts = [0, *accumulate(v == v for v in self.values)]
+
+        means = array("d", bytes(8 * len(self.values)))
+        for end in range(1, len(sums)):
+            start = max(0, end - size)
+            count = counts[end] - counts[start]
+            means[end - 1] = (sums[end] - sums[start]) / count if count else math.nan
+        return means
+
+    def time_in_ranges[K: Hashable](
+        self, ranges: Mapping[K, tuple[float, float]]
+    ) -> dict[K, float]:
+        """
+        The seconds spent within each inclusive (lower, upper) range of values,
+        e.g. the heart rate zones. A value on the boundary of two ranges
+        counts towards the higher one.
+        """
+        bounds = sorted(
+            ((lower, upper, key) for key, (lower, upper) in ranges.items()),
+            key=lambda bound: bound[0],
+        )
+        lowers = [lower for lower, _, _ in bounds]
+        counts = [0] * len(bounds)
+        for value in self.values:
+            position = bisect_right(lowers, value) - 1
+            if position >= 0 and value <= bounds[position][1]:
+                counts[position] += 1
+        return {
+            key: count * self.recording_rate
+            for (_, _, key), count in zip(bounds, counts)
+        }
+
+    @classmethod
+    def _validate(cls, value: Any) -> Self:
+        if isinstance(value, cls):
+            return value
+        if not isinstance(value, Mapping):
+            raise ValueError("A sample series must be an object")
+
+        sample_type = value.get("sample-type", value.get("sample_type"))
+        recording_rate = value.get("recording-rate", value.get("recording_rate"))
+        data = value.get("data", "")
+        if sample_type is None or recording_rate is None:
+            raise ValueError("A sample series needs a sample type and recording rate")
+        if isinstance(data, str):
+            return cls.parse(int(sample_type), float(recording_rate), data)
+        values = array(
+            "d", (math.nan if item is None else float(item) for item in data)
+        )
+        return cls(SampleType(int(sample_type)), float(recording_rate), values)
+
+    def _serialize(self) -> dict[str, Any]:
+        return {
+            "recording-rate": self.recording_rate,
+            "sample-type": str(self.sample_type.value),
+            "data": ",".join(map(_format_value, self.values)),
+        }
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls._serialize
+            ),
+        )
+
+
+class RouteSeries(Sequence[RoutePoint]):
+    """The GPS route of an exercise, one array per coordinate."""
+
+    __slots__ = ("offsets", "latitudes", "longitudes", "altitudes", "satellites")
+
+    def __init__(
+        self,
+        offsets: array,
+        latitudes: array,
+        longitudes: array,
+        altitudes: array,
+        satellites: array,
+    ) -> None:
+        self.offsets = offsets
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.altitudes = altitudes
+        # -1 stands for an unknown number of satellites
+        self.satellites = satellites
+
+    @classmethod
+    def parse(cls, points: Sequence[Mapping[str, Any]]) -> Self:
+        """Reads the route points of an AccessLink exercise."""
+        series = cls(array("d"), array("d"), array("d"), array("d"), array("i"))
+        origin = None
+        for point in points:
+            offset, origin = _parse_offset(point.get("time", 0.0), origin)
+            altitude = point.get("altitude")
+            satellites = point.get("satellites")
+            series.offsets.append(offset)
+            series.latitudes.append(float(point["latitude"]))
+            series.longitudes.append(float(point["longitude"]))
+            series.altitudes.append(math.nan if altitude is None else float(altitude))
+            series.satellites.append(-1 if satellites is None else int(satellites))
+        return series
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> RoutePoint:
+        altitude = self.altitudes[index]
+        satellites = self.satellites[index]
+        return RoutePoint(
+            offset=self.offsets[index],
+            latitude=self.latitudes[index],
+            longitude=self.longitudes[index],
+            altitude=None if math.isnan(altitude) else altitude,
+            satellites=None if satellites < 0 else satellites,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, RouteSeries):
+            return NotImplemented
+        return all(
+            getattr(self, name).tobytes() == getattr(other, name).tobytes()
+            for name in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(points={len(self.offsets)})"
+
+    def distance(self) -> float:
+        """The length of the route in meters, along great circles."""
+        latitudes = [math.radians(value) for value in self.latitudes]
+        longitudes = [math.radians(value) for value in self.longitudes]
+        total = 0.0
+        for index in range(1, len(latitudes)):
+            lat1, lat2 = latitudes[index - 1], latitudes[index]
+            half_chord = (
+                math.sin((lat2 - lat1) / 2) ** 2
+                + math.cos(lat1)
+                * math.cos(lat2)
+                * math.sin((longitudes[index] - longitudes[index - 1]) / 2) ** 2
+            )
+            total += 2 * 6371008.8 * math.asin(min(1.0, math.sqrt(half_chord)))
+        return total
+
+    @classmethod
+    def _validate(cls, value: Any) -> Self:
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, str | bytes) or not isinstance(value, Sequence):
+            raise ValueError("A route must be a list of points")
+        try:
+            return cls.parse(value)
+        except (KeyError, TypeError) as error:
+            raise ValueError(f"Invalid route point: {error}") from error
+
+    def _serialize(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "time": point.offset,
+                "latitude": point.latitude,
+                "longitude": point.longitude,
+                "altitude": point.altitude,
+                "satellites": point.satellites,
+            }
+            for point in self
+        ]
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls._serialize
+            ),
+        )
@@ -1,44 +1,93 @@
-from collections.abc import Generator
-from dataclasses import dataclass
-from typing import cast
+import json
+import re
+from collections.abc import Generator, Mapping
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+from urllib.parse import quote
 
 import typer
 
-from src.clients import polar
+if TYPE_CHECKING:
+    from src.clients.base.types import HTTPMeth
+    from src.clients.polar import PolarClient
 
 
 @dataclass
 class PolarContext:
-    client: polar.PolarClient
-
-
-def parse_path_arg(arg: str) -> tuple[str, str]:
-    key, value = arg.split("=")
-    return key, value
-
-
-def parse_query_param(arg: str) -> tuple[str, str]:
-    key, value = arg.split("=")
+    client: "PolarClient"
+
+
+@dataclass(frozen=True, slots=True)
+class ApiCall:
+    """A call of `polar-cli api call`, typed in or read from a batch line."""
+
+    method: "HTTPMeth"
+    path: str
+    params: dict[str, Any] = field(default_factory=dict)
+    headers: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, line: str) -> "ApiCall":
+        """Parses a batch line, e.g. `{"path": "/v3/exercises/{exercise_id}",
+        "args": {"exercise_id": "abc"}, "params": {"zones": true}}`."""
+        try:
+            call = json.loads(line)
+            return cls(
+                method=call.get("method", "GET").upper(),
+                path=resolve_path(call["path"], call.get("args", {})),
+                params=dict(call.get("params", {})),
+                headers=dict(call.get("headers", {})),
+            )
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            raise ValueError(f"Invalid call: {line.strip()!r}") from error
+
+    async def run(self, client: "PolarClient") -> Any:
+        return await client(
+            self.method,
+            self.path,
+            params=self.params or None,
+            headers=self.headers or None,
+        )
+
+
+def resolve_path(path: str, args: Mapping[str, str]) -> str:
+    """Fills the parameters of a route template, a concrete path is left as is."""
+    from src.clients.base.fields import PathTemplate
+
+    def substitute(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in args:
+            raise KeyError(f"Missing the path argument '{name}'")
+        return quote(str(args[name]), safe="")
+
+    return PathTemplate.TEMPLATE_PARAM_REGEX.sub(substitute, path)
+
+
+def parse_pair(arg: str) -> tuple[str, str]:
+    key, separator, value = arg.partition("=")
+    if not separator or not key:
+        raise typer.BadParameter(f"Expected KEY=VALUE, got {arg!r}")
     return key, value
 
 
-def parse_header(arg: str) -> tuple[str, str]:
-    key, value = arg.split("=")
-    return key, value
+parse_path_arg = parse_query_param = parse_header = parse_pair
 
 
 def complete_path(ctx: typer.Context, path: str) -> Generator[str]:
-    client = cast(PolarContext, ctx.obj).client
-    for _, path in client.registry.keys():
-        if path.startswith(path):
-            yield path
-    yield path
+    # The callback setting up the client doesn't run during completion
+    from src.clients.polar import PolarClient
+
+    yield from PolarClient.routes.complete(path)
 
 
 def complete_args(ctx: typer.Context, arg: str) -> Generator[str]:
-    # client = cast(PolarContext, ctx.obj).client
+    from src.clients.base.fields import PathTemplate
 
-    yield arg
+    # The parameters of the route template typed as the action
+    action = ctx.params.get("action") or ""
+    for match in PathTemplate.TEMPLATE_PARAM_REGEX.finditer(action):
+        if match.group(1).startswith(arg):
+            yield f"{match.group(1)}="
 
 
 def complete_query_param(ctx: typer.Context, query: str) -> Generator[str]:
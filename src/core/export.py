@@ -0,0 +1,373 @@
+"""
+Streaming exports of the exercise history.
+
+Exercises are flattened into rows and written in row groups as they arrive,
+so an export of any length runs in the memory of one group.
+An interrupted export resumes after the last exercise it wrote,
+so exercises without an ID, which it couldn't resume after, are left out.
+Parquet needs `pyarrow`, installed with the `parquet` extra.
+"""
+
+import csv
+import io
+import json
+import logging
+import math
+import os
+from collections.abc import AsyncIterable
+from dataclasses import dataclass
+from enum import StrEnum
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Protocol
+
+if TYPE_CHECKING:
+    from src.clients.polar.models import Exercise
+
+logger = logging.getLogger(__name__)
+
+COLUMNS: tuple[str, ...] = (
+    "id",
+    "polar_user",
+    "start_time",
+    "start_time_utc_offset",
+    "duration",
+    "distance",
+    "calories",
+    "device",
+    "sport",
+    "has_route",
+    "has_manual_lap",
+    "training_load",
+    "recovery_time",
+    "heart_rate_average",
+    "heart_rate_maximum",
+)
+
+
+@cache
+def sample_columns() -> tuple[str, ...]:
+    """One list of values and one recording rate per sample type."""
+    # Imported here, the CLI imports this module on every completion
+    from src.clients.polar.samples import SampleType
+
+    return tuple(
+        column
+        for sample_type in SampleType
+        for column in (
+            f"samples_{sample_type.name.lower()}",
+            f"samples_{sample_type.name.lower()}_rate",
+        )
+    )
+
+
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+    @classmethod
+    def from_path(cls, path: Path) -> "ExportFormat":
+        match path.suffix.lower():
+            case ".ndjson" | ".jsonl":
+                return cls.NDJSON
+            case ".csv":
+                return cls.CSV
+            case ".parquet":
+                return cls.PARQUET
+            case suffix:
+                raise ValueError(f"Unknown export format of the suffix '{suffix}'")
+
+
+@dataclass(frozen=True, slots=True)
+class ExportReport:
+    written: int = 0
+    # Exercises up to the last one of a resumed export
+    skipped: int = 0
+    # Exercises without an ID
+    dropped: int = 0
+    row_groups: int = 0
+
+
+def exercise_row(exercise: "Exercise", samples: bool = False) -> dict[str, Any]:
+    training_load = exercise.training_load
+    heart_rate = exercise.heart_rate
+    row: dict[str, Any] = {
+        "id": exercise.id,
+        "polar_user": exercise.polar_user,
+        "start_time": exercise.start_time.isoformat(),
+        "start_time_utc_offset": exercise.start_time_utc_offset,
+        "duration": exercise.duration,
+        "distance": exercise.distance,
+        "calories": exercise.calories,
+        "device": exercise.device,
+        "sport": exercise.sport,
+        "has_route": exercise.has_route,
+        "has_manual_lap": exercise.has_manual_lap,
+        "training_load": training_load and training_load.training_load,
+        "recovery_time": training_load and training_load.recovery_time,
+        "heart_rate_average": heart_rate and heart_rate.average,
+        "heart_rate_maximum": heart_rate and heart_rate.maximum,
+    }
+    if samples:
+        row.update(dict.fromkeys(sample_columns()))
+        for series in exercise.samples or ():
+            name = f"samples_{series.sample_type.name.lower()}"
+            row[name] = [
+                None if math.isnan(value) else value for value in series.values
+            ]
+            row[f"{name}_rate"] = series.recording_rate
+    return row
+
+
+def _rfind_newline(file: BinaryIO, end: int, chunk_size: int = 2**16) -> int:
+    """The offset of the last newline before `end`, or -1."""
+    position = end
+    while position > 0:
+        start = max(0, position - chunk_size)
+        file.seek(start)
+        index = file.read(position - start).rfind(b"\n")
+        if index >= 0:
+            return start + index
+        position = start
+    return -1
+
+
+def _last_line(path: Path) -> bytes | None:
+    """
+    Reads the last complete line of a file without reading the whole file.
+    A partial line, left by an interrupted export, is cut off.
+    """
+    with path.open("r+b") as file:
+        end = file.seek(0, os.SEEK_END)
+        newline = _rfind_newline(file, end)
+        if newline + 1 != end:
+            file.truncate(newline + 1)
+        if newline < 0:
+            return None
+        start = _rfind_newline(file, newline) + 1
+        file.seek(start)
+        return file.read(newline - start)
+
+
+class ExportWriter(Protocol):
+    def last_id(self) -> str | None:
+        """The ID of the last exercise written by a previous export, if any."""
+        ...
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        """Writes one row group."""
+        ...
+
+    def close(self) -> None: ...
+
+
+class NDJSONWriter:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: io.TextIOWrapper | None = None
+
+    def last_id(self) -> str | None:
+        if not self.path.exists():
+            return None
+        line = _last_line(self.path)
+        return None if line is None else json.loads(line)["id"]
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        if self._file is None:
+            self._file = self.path.open("a", encoding="utf-8")
+        self._file.write(
+            "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+        )
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class CSVWriter:
+    """Writes a row per exercise, the sample lists are encoded as JSON arrays."""
+
+    def __init__(self, path: Path, columns: tuple[str, ...]) -> None:
+        self.path = path
+        self.columns = columns
+        self._file: io.TextIOWrapper | None = None
+        self._writer: Any = None
+
+    def last_id(self) -> str | None:
+        if not self.path.exists():
+            return None
+        line = _last_line(self.path)
+        if line is None:
+            return None
+        with self.path.open(encoding="utf-8", newline="") as file:
+            header = next(csv.reader(file), None)
+        row = next(csv.reader([line.decode("utf-8")]))
+        if header is None or row == header:
+            return None
+        return row[header.index("id")] or None
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        if self._file is None:
+            empty = not self.path.exists() or self.path.stat().st_size == 0
+            self._file = self.path.open("a", encoding="utf-8", newline="")
+            self._writer = csv.DictWriter(
+                self._file, self.columns, extrasaction="ignore", lineterminator="\n"
+            )
+            if empty:
+                self._writer.writeheader()
+        self._writer.writerows(
+            {
+                key: json.dumps(value) if isinstance(value, list) else value
+                for key, value in row.items()
+            }
+            for row in rows
+        )
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class ParquetWriter:
+    """
+    Writes a directory of Parquet files, one per export run,
+    each row group of a run being a row group of its file.
+    A Parquet file can't be appended to, so a resumed export adds a file.
+    """
+
+    def __init__(self, path: Path, samples: bool) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise RuntimeError(
+                "Exporting to Parquet requires pyarrow, install the 'parquet' extra: "
+                "pip install 'polar-oauth-app[parquet]'"
+            ) from error
+
+        self.path = path
+        self._pa = pa
+        self._pq = pq
+        fields = [
+            pa.field("id", pa.string()),
+            pa.field("polar_user", pa.string()),
+            pa.field("start_time", pa.string()),
+            pa.field("start_time_utc_offset", pa.int32()),
+            pa.field("duration", pa.string()),
+            pa.field("distance", pa.float64()),
+            pa.field("calories", pa.int32()),
+            pa.field("device", pa.string()),
+            pa.field("sport", pa.string()),
+            pa.field("has_route", pa.bool_()),
+            pa.field("has_manual_lap", pa.bool_()),
+            pa.field("training_load", pa.float64()),
+            pa.field("recovery_time", pa.int64()),
+            pa.field("heart_rate_average", pa.int32()),
+            pa.field("heart_rate_maximum", pa.int32()),
+        ]
+        if samples:
+            # The columns pair up, e.g. `samples_heart_rate` and its rate,
+            # a suffix can't tell them apart
+            columns = sample_columns()
+            for values, rate in zip(columns[::2], columns[1::2]):
+                fields.append(pa.field(values, pa.list_(pa.float64())))
+                fields.append(pa.field(rate, pa.float64()))
+        self.schema = pa.schema(fields)
+        self._writer: Any = None
+
+    def _parts(self) -> list[Path]:
+        return sorted(self.path.glob("part-*.parquet"))
+
+    def last_id(self) -> str | None:
+        for part in reversed(self._parts()):
+            try:
+                ids = self._pq.read_table(part, columns=["id"]).column("id")
+            except self._pa.ArrowInvalid:
+                # Its footer was never written, so none of its rows are readable
+                logger.warning("Removing the unreadable export file %s", part)
+                part.unlink()
+                continue
+            if len(ids):
+                return ids[-1].as_py()
+        return None
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        if self._writer is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            part = self.path / f"part-{len(self._parts()):05d}.parquet"
+            self._writer = self._pq.ParquetWriter(part, self.schema)
+        table = self._pa.Table.from_pylist(rows, schema=self.schema)
+        self._writer.write_table(table, row_group_size=len(rows))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_writer(path: Path, export_format: ExportFormat, samples: bool) -> ExportWriter:
+    match export_format:
+        case ExportFormat.NDJSON:
+            return NDJSONWriter(path)
+        case ExportFormat.CSV:
+            return CSVWriter(path, COLUMNS + sample_columns() if samples else COLUMNS)
+        case ExportFormat.PARQUET:
+            return ParquetWriter(path, samples)
+
+
+async def export_exercises(
+    exercises: AsyncIterable["Exercise"],
+    writer: ExportWriter,
+    *,
+    samples: bool = False,
+    row_group_size: int = 500,
+    resume: bool = False,
+) -> ExportReport:
+    """
+    Writes the exercises in row groups of `row_group_size`.
+    A resumed export skips the exercises up to the last one already written,
+    the listing is expected in the same order as before.
+    Exercises without an ID are dropped, a resumed export couldn't find them.
+    """
+    if row_group_size <= 0:
+        raise ValueError("The row group size must be positive")
+
+    after = writer.last_id() if resume else None
+    written = skipped = dropped = row_groups = 0
+    rows: list[dict[str, Any]] = []
+    try:
+        async for exercise in exercises:
+            if after is not None:
+                skipped += 1
+                if exercise.id == after:
+                    after = None
+                continue
+            if exercise.id is None:
+                dropped += 1
+                continue
+
+            rows.append(exercise_row(exercise, samples))
+            if len(rows) == row_group_size:
+                writer.write(rows)
+                written += len(rows)
+                row_groups += 1
+                rows = []
+        if rows:
+            writer.write(rows)
+            written += len(rows)
+            row_groups += 1
+    finally:
+        writer.close()
+
+    if after is not None:
+        logger.warning(
+            "The last exported exercise %s is no longer listed, nothing was added",
+            after,
+        )
+    if dropped:
+        logger.warning("Dropped %d exercises without an ID", dropped)
+    return ExportReport(
+        written=written, skipped=skipped, dropped=dropped, row_groups=row_groups
+    )
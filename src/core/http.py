@@ -0,0 +1,39 @@
+from typing import TYPE_CHECKING
+
+import httpx
+
+if TYPE_CHECKING:
+    from src.core.settings import PolarOauthSettings
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """
+    Lends a long-lived transport to short-lived clients.
+    Closing a client leaves the shared connection pool open:
+    the pool is closed by its owner.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def build_transport(settings: "PolarOauthSettings") -> httpx.AsyncHTTPTransport:
+    """Builds the keep-alive connection pool shared by all Polar upstream calls."""
+    return httpx.AsyncHTTPTransport(
+        http2=settings.http2,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+    )
+
+
+def build_timeout(settings: "PolarOauthSettings") -> httpx.Timeout:
+    return httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout)
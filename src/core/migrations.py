@@ -1,8 +1,12 @@
 import sqlite3
 
+from src.core.store import TokenStore
 
-async def apply_migrations(db: sqlite3.Connection):
-    db.execute(
+# Each step upgrades the schema by one `PRAGMA user_version`.
+# Steps are append-only: a shipped step must never be edited.
+MIGRATIONS: tuple[tuple[str, ...], ...] = (
+    # 1: authorization sessions and the tokens issued for them
+    (
         """
         CREATE TABLE IF NOT EXISTS tokens (
             id INTEGER PRIMARY KEY,
@@ -16,9 +20,196 @@ async def apply_migrations(db: sqlite3.Connection):
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    """,
-    )
+        """,
+    ),
+    # 2: indexes for the OAuth lookups and the registered users
+    (
+        # Keep the latest row of a session before enforcing its uniqueness
+        """
+        DELETE FROM tokens
+        WHERE id NOT IN (SELECT max(id) FROM tokens GROUP BY session_id)
+        """,
+        "CREATE UNIQUE INDEX ux_tokens_session_id ON tokens (session_id)",
+        """
+        CREATE UNIQUE INDEX ux_tokens_code ON tokens (code)
+        WHERE code IS NOT NULL
+        """,
+        # Covers the bearer token principal lookup
+        """
+        CREATE INDEX ix_tokens_access_token
+        ON tokens (access_token, token_type, client_id, user_id, expires_at)
+        WHERE access_token IS NOT NULL
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            client_id TEXT NOT NULL,
+            member_id INTEGER NOT NULL,
+            polar_user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (client_id, member_id)
+        )
+        """,
+    ),
+    # 3: indexes for sweeping abandoned sessions and expired tokens
+    (
+        """
+        CREATE INDEX ix_tokens_abandoned ON tokens (created_at)
+        WHERE access_token IS NULL
+        """,
+        """
+        CREATE INDEX ix_tokens_expiry ON tokens (unixepoch(expires_at))
+        WHERE expires_at IS NOT NULL
+        """,
+    ),
+    # 4: incremental sync of AccessLink transactions
+    (
+        """
+        CREATE TABLE IF NOT EXISTS sync_transactions (
+            id INTEGER PRIMARY KEY,
+            polar_user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            transaction_id INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'open'
+                CHECK (state IN ('open', 'committed', 'expired')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (polar_user_id, kind, transaction_id)
+        )
+        """,
+        # At most one transaction of a kind is in progress per user
+        """
+        CREATE UNIQUE INDEX ux_sync_transactions_open
+        ON sync_transactions (polar_user_id, kind)
+        WHERE state = 'open'
+        """,
+        # The items of the transactions in progress
+        """
+        CREATE TABLE IF NOT EXISTS sync_items (
+            transaction_ref INTEGER NOT NULL,
+            item_id TEXT NOT NULL,
+            url TEXT NOT NULL,
+            PRIMARY KEY (transaction_ref, item_id)
+        ) WITHOUT ROWID
+        """,
+        # The synced items as they were sent
+        """
+        CREATE TABLE IF NOT EXISTS sync_records (
+            polar_user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (polar_user_id, kind, item_id)
+        ) WITHOUT ROWID
+        """,
+    ),
+    # 5: the queue of webhook events and the token lookup of their users
+    (
+        """
+        CREATE TABLE IF NOT EXISTS webhook_events (
+            id INTEGER PRIMARY KEY,
+            dedup_key TEXT NOT NULL UNIQUE,
+            event TEXT NOT NULL,
+            polar_user_id INTEGER,
+            entity_id TEXT,
+            url TEXT,
+            payload TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending'
+                CHECK (state IN ('pending', 'processing', 'done', 'failed')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE INDEX ix_webhook_events_available ON webhook_events (available_at)
+        WHERE state IN ('pending', 'processing')
+        """,
+        """
+        CREATE INDEX ix_tokens_user_id ON tokens (user_id, updated_at)
+        WHERE access_token IS NOT NULL
+        """,
+    ),
+    # 6: the sync status of every user, to sync the stalest users first
+    (
+        """
+        CREATE TABLE IF NOT EXISTS sync_users (
+            polar_user_id INTEGER PRIMARY KEY,
+            synced_at TIMESTAMP,
+            attempted_at TIMESTAMP,
+            last_error TEXT
+        )
+        """,
+    ),
+    # 7: refreshable tokens, and the lease of the process refreshing one
+    (
+        "ALTER TABLE tokens ADD COLUMN refresh_token TEXT",
+        "ALTER TABLE tokens ADD COLUMN refresh_lease REAL",
+    ),
+    # 8: the profiles of registered users, served locally
+    (
+        "ALTER TABLE users ADD COLUMN profile TEXT",
+        "ALTER TABLE users ADD COLUMN refreshed_at REAL",
+    ),
+)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: int = len(MIGRATIONS)) -> int:
+    """
+    Applies the pending migration steps up to `target` one transaction at a time.
+    The version is re-read under the write lock,
+    so concurrent processes never apply the same step twice.
+    Returns the resulting schema version.
+    """
+    if not 0 <= target <= len(MIGRATIONS):
+        raise ValueError(f"Unknown schema version: {target}")
+
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = schema_version(conn)
+            if version >= target:
+                conn.execute("COMMIT")
+                return version
+
+            for statement in MIGRATIONS[version]:
+                conn.execute(statement)
+            # PRAGMA does not accept bound parameters
+            conn.execute(f"PRAGMA user_version = {version + 1:d}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+async def apply_migrations(db: TokenStore) -> int:
+    return await db.run(migrate)
+
+
+def _revert(conn: sqlite3.Connection) -> None:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DROP TABLE IF EXISTS sync_users")
+        conn.execute("DROP TABLE IF EXISTS webhook_events")
+        conn.execute("DROP TABLE IF EXISTS sync_records")
+        conn.execute("DROP TABLE IF EXISTS sync_items")
+        conn.execute("DROP TABLE IF EXISTS sync_transactions")
+        conn.execute("DROP TABLE IF EXISTS users")
+        conn.execute("DROP TABLE IF EXISTS tokens")
+        conn.execute("PRAGMA user_version = 0")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
 
 
-async def revert_migrations(db: sqlite3.Connection):
-    db.execute("DROP TABLE IF EXISTS tokens")
+async def revert_migrations(db: TokenStore):
+    await db.run(_revert)
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+
+from src.clients.base.batch import gather_bounded
+from src.clients.polar.client import PolarClient
+from src.core.store import TokenStore
+from src.core.sync import SyncEngine, SyncReport
+from src.core.tokens import Token, TokenProvider
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class SyncJob:
+    polar_user_id: int
+    synced_at: str | None
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleReport:
+    users: int = 0
+    synced: int = 0
+    failed: int = 0
+    # Users without a valid token, or who weren't reached in the window
+    deferred: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class SchedulerStats:
+    runs: int
+    last_report: ScheduleReport | None
+
+
+class SyncScheduler:
+    """
+    Periodically syncs every user holding a token, the least recently synced
+    first. Up to `concurrency` users are synced at once, each one with up to
+    `user_concurrency` requests in flight, so a run scales with the limits
+    rather than with processes. Users are started only within `window` seconds
+    of a run, the rest keep their place at the front of the next one.
+    Tokens are taken from the provider, so an expired one is refreshed first.
+    A user whose token can't be refreshed, and expires within `expiry_margin`
+    seconds, is left alone.
+    """
+
+    def __init__(
+        self,
+        store: TokenStore,
+        tokens: TokenProvider,
+        client_factory: Callable[[SyncJob, Token], PolarClient],
+        *,
+        interval: float,
+        window: float,
+        concurrency: int,
+        user_concurrency: int,
+        expiry_margin: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        self.tokens = tokens
+        # Clients are short-lived, they should borrow a shared transport
+        self.client_factory = client_factory
+        self.interval = interval
+        self.window = window
+        self.concurrency = concurrency
+        self.user_concurrency = user_concurrency
+        self.expiry_margin = expiry_margin
+        self.clock = clock
+        self.runs = 0
+        self.last_report: ScheduleReport | None = None
+        self._task: asyncio.Task | None = None
+
+    async def jobs(self) -> list[SyncJob]:
+        """Every user holding a token, the least recently synced first."""
+        rows = await self.store.fetchall(
+            """
+            SELECT t.user_id AS polar_user_id, s.synced_at
+            FROM (
+                SELECT DISTINCT user_id FROM tokens WHERE access_token IS NOT NULL
+            ) AS t
+            LEFT JOIN sync_users AS s ON s.polar_user_id = t.user_id
+            ORDER BY s.synced_at IS NOT NULL, s.synced_at, t.user_id
+            """
+        )
+        return [SyncJob(**row) for row in rows]
+
+    async def _sync(self, job: SyncJob) -> list[SyncReport] | None:
+        try:
+            token = await self.tokens.get(job.polar_user_id)
+        except LookupError:
+            # Deferred until the user authorizes again
+            return None
+        expires_at = token.get("expires_at")
+        if (
+            "refresh_token" not in token
+            and expires_at is not None
+            and expires_at <= self.tokens.clock() + self.expiry_margin
+        ):
+            return None
+
+        client = self.client_factory(job, token)
+        async with client.transport:
+            engine = SyncEngine(self.store, client, concurrency=self.user_concurrency)
+            return await engine.sync(job.polar_user_id)
+
+    async def _record(self, job: SyncJob, error: str | None) -> None:
+        await self.store.execute(
+            """
+            INSERT INTO sync_users (polar_user_id, synced_at, attempted_at, last_error)
+            VALUES (?, IIF(? IS NULL, CURRENT_TIMESTAMP, NULL), CURRENT_TIMESTAMP, ?)
+            ON CONFLICT (polar_user_id) DO UPDATE SET
+                synced_at = COALESCE(excluded.synced_at, synced_at),
+                attempted_at = excluded.attempted_at,
+                last_error = excluded.last_error
+            """,
+            (job.polar_user_id, error, error),
+        )
+
+    async def run(self) -> ScheduleReport:
+        deadline = self.clock() + self.window
+        jobs = await self.jobs()
+
+        def admitted() -> Iterator[SyncJob]:
+            # Pulled lazily: a user is admitted once a slot frees up
+            for job in jobs:
+                if self.clock() >= deadline:
+                    return
+                yield job
+
+        synced = failed = 0
+        results = gather_bounded(self._sync, admitted(), concurrency=self.concurrency)
+        async for result in results:
+            job = result.context
+            if result.ok and result.result is None:
+                continue
+            if result.ok and not any(report.failed for report in result.result):
+                synced += 1
+                await self._record(job, None)
+                continue
+
+            failed += 1
+            error = (
+                repr(result.error)
+                if result.error is not None
+                else "Some items weren't fetched"
+            )
+            logger.warning("Failed to sync user %s: %s", job.polar_user_id, error)
+            await self._record(job, error)
+
+        report = ScheduleReport(
+            users=len(jobs),
+            synced=synced,
+            failed=failed,
+            deferred=len(jobs) - synced - failed,
+        )
+        self.runs += 1
+        self.last_report = report
+        return report
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                report = await self.run()
+            except Exception:
+                logger.exception("Failed to sync the users")
+            else:
+                logger.info(
+                    "Synced %d of %d users, %d failed and %d deferred",
+                    report.synced,
+                    report.users,
+                    report.failed,
+                    report.deferred,
+                )
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="sync-scheduler")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> SchedulerStats:
+        return SchedulerStats(runs=self.runs, last_report=self.last_report)
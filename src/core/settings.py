@@ -1,6 +1,8 @@
+from functools import cache
 from pathlib import Path
+from typing import Any, Literal
 
-from pydantic import UUID4, Field, HttpUrl
+from pydantic import UUID4, Field, HttpUrl, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -25,6 +27,43 @@ class PolarOauthSettings(BaseSettings):
         default=HttpUrl("https://www.polaraccesslink.com"),
         description="The URL to access the Polar Access Link API",
     )
+    http2: bool = Field(
+        default=False,
+        description="Whether to negotiate HTTP/2 with Polar; requires the h2 package",
+    )
+    http_max_connections: int = Field(
+        default=100, gt=0, description="The maximum number of upstream connections"
+    )
+    http_max_keepalive_connections: int = Field(
+        default=20, ge=0, description="The number of idle upstream connections kept"
+    )
+    http_keepalive_expiry: float = Field(
+        default=30.0, ge=0, description="Seconds an idle upstream connection is kept"
+    )
+    http_timeout: float = Field(
+        default=10.0, gt=0, description="Seconds to wait for an upstream response"
+    )
+    http_connect_timeout: float = Field(
+        default=5.0, gt=0, description="Seconds to wait for an upstream connection"
+    )
+    webhook_secret: SecretStr | None = Field(
+        default=None,
+        description="The key Polar signs webhooks with; unset rejects all webhooks",
+    )
+    cache_path: Path | None = Field(
+        default=None,
+        description="The SQLite file caching API responses; unset disables the cache",
+    )
+    cache_ttl: float | None = Field(
+        default=3600.0,
+        ge=0,
+        description="Seconds a cached response is fresh; unset keeps it until evicted",
+    )
+    cache_max_size: int = Field(
+        default=256 * 2**20,
+        gt=0,
+        description="The size limit of cached bodies in bytes",
+    )
 
     model_config = SettingsConfigDict(env_prefix="oauth")
 
@@ -36,6 +75,127 @@ class ServerSettings(BaseSettings):
     sqlite_path: Path | str = Field(
         default=":memory:", description="The path to the SQLite database file"
     )
+    sqlite_pool_size: int = Field(
+        default=4,
+        gt=0,
+        description="The number of pooled SQLite connections and executor threads",
+    )
+    sqlite_journal_mode: Literal[
+        "WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"
+    ] = Field(
+        default="WAL",
+        description="The SQLite journal mode; WAL lets readers run alongside a writer",
+    )
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = Field(
+        default="NORMAL", description="How often SQLite syncs the database to disk"
+    )
+    sqlite_mmap_size: int = Field(
+        default=256 * 1024 * 1024,
+        ge=0,
+        description="The number of bytes of the database file to memory-map",
+    )
+    sqlite_cache_size: int = Field(
+        default=-16_000,
+        description="The page cache size: pages if positive, KiB if negative",
+    )
+    sqlite_temp_store: Literal["DEFAULT", "FILE", "MEMORY"] = Field(
+        default="MEMORY", description="Where SQLite keeps temporary tables and indices"
+    )
+    sqlite_statement_cache_size: int = Field(
+        default=128,
+        ge=0,
+        description="The number of prepared statements cached per connection",
+    )
+    sqlite_busy_timeout: float = Field(
+        default=5.0,
+        ge=0,
+        description="Seconds a connection waits for a lock before failing",
+    )
+    token_cache_size: int = Field(
+        default=1024, gt=0, description="The number of bearer tokens kept in memory"
+    )
+    token_cache_ttl: float = Field(
+        default=300.0,
+        gt=0,
+        description="The maximum number of seconds a bearer token stays cached",
+    )
+    sweeper_interval: float = Field(
+        default=300.0, gt=0, description="Seconds between sweeps of the token store"
+    )
+    sweeper_batch_size: int = Field(
+        default=500, gt=0, description="The number of rows deleted per transaction"
+    )
+    session_ttl: float = Field(
+        default=3600.0,
+        ge=0,
+        description="Seconds an authorization session waits for its callback",
+    )
+    expired_token_ttl: float = Field(
+        default=0.0,
+        ge=0,
+        description="Seconds an expired token is kept before it is deleted",
+    )
+    webhook_workers: int = Field(
+        default=2, gt=0, description="The number of workers draining the webhook queue"
+    )
+    webhook_batch_size: int = Field(
+        default=20, gt=0, description="The number of webhook events claimed at once"
+    )
+    webhook_poll_interval: float = Field(
+        default=5.0, gt=0, description="Seconds an idle worker waits between polls"
+    )
+    webhook_lease: float = Field(
+        default=60.0,
+        gt=0,
+        description="Seconds a claimed webhook event is hidden from other workers",
+    )
+    webhook_retry_backoff: float = Field(
+        default=30.0, ge=0, description="Seconds before the first webhook retry"
+    )
+    webhook_max_attempts: int = Field(
+        default=5, gt=0, description="The number of attempts at a webhook event"
+    )
+    sync_interval: float = Field(
+        default=0.0,
+        ge=0,
+        description="Seconds between syncs of all users, 0 disables the scheduler",
+    )
+    sync_window: float = Field(
+        default=3600.0,
+        gt=0,
+        description="Seconds a sync run may start users in, the rest wait",
+    )
+    sync_concurrency: int = Field(
+        default=16, gt=0, description="The number of users synced at once"
+    )
+    sync_user_concurrency: int = Field(
+        default=4, gt=0, description="The number of requests in flight per user"
+    )
+    sync_expiry_margin: float = Field(
+        default=300.0,
+        ge=0,
+        description="Seconds before its expiry a token is no longer synced",
+    )
+    token_refresh_margin: float = Field(
+        default=300.0,
+        ge=0,
+        description="Seconds before its expiry a token is refreshed",
+    )
+    token_refresh_lease: float = Field(
+        default=30.0,
+        gt=0,
+        description="Seconds a process may take to refresh a token for the others",
+    )
+    user_profile_ttl: float = Field(
+        default=3600.0,
+        ge=0,
+        description="Seconds a user profile is served before it's refreshed",
+    )
+    user_profile_max_stale: float = Field(
+        default=86400.0,
+        ge=0,
+        description="Seconds a stale user profile is served while it is refreshed",
+    )
     model_config = SettingsConfigDict(env_prefix="server")
 
 
@@ -55,4 +215,14 @@ class ApplicationSettings(BaseSettings):
     )
 
 
-settings = ApplicationSettings()
+@cache
+def get_settings() -> ApplicationSettings:
+    """Reads the settings on first use, so importing this module is cheap."""
+    return ApplicationSettings()
+
+
+def __getattr__(name: str) -> Any:
+    # `from src.core.settings import settings` keeps working
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,127 @@
+import asyncio
+import queue
+import sqlite3
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Self
+
+if TYPE_CHECKING:
+    from src.core.settings import ServerSettings
+
+type Parameters = Sequence[Any] | Mapping[str, Any]
+type Pragmas = Mapping[str, str | int]
+
+
+class TokenStore:
+    """
+    A bounded pool of SQLite connections driven by a dedicated thread executor.
+    Every statement runs on one of the executor threads,
+    so awaiting the store never blocks the event loop on disk I/O.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        pool_size: int = 4,
+        *,
+        pragmas: Pragmas | None = None,
+        statement_cache_size: int = 128,
+        busy_timeout: float = 5.0,
+    ) -> None:
+        self.path = path
+        # An in-memory database lives and dies with its connection,
+        # so every caller has to share the same one.
+        self.pool_size = 1 if str(path) == ":memory:" else pool_size
+        self.pragmas = dict(pragmas or {})
+        self.statement_cache_size = statement_cache_size
+        self.busy_timeout = busy_timeout
+        self._connections: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+        self._executor: ThreadPoolExecutor | None = None
+
+    @classmethod
+    def from_settings(cls, settings: "ServerSettings") -> Self:
+        return cls(
+            settings.sqlite_path,
+            pool_size=settings.sqlite_pool_size,
+            pragmas={
+                # The journal mode goes first: it can't change inside a transaction
+                "journal_mode": settings.sqlite_journal_mode,
+                "synchronous": settings.sqlite_synchronous,
+                "mmap_size": settings.sqlite_mmap_size,
+                "cache_size": settings.sqlite_cache_size,
+                "temp_store": settings.sqlite_temp_store,
+            },
+            statement_cache_size=settings.sqlite_statement_cache_size,
+            busy_timeout=settings.sqlite_busy_timeout,
+        )
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            cached_statements=self.statement_cache_size,
+            autocommit=True,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            # PRAGMA does not accept bound parameters
+            conn.execute(f"PRAGMA {name} = {value}").fetchall()
+        return conn
+
+    def open(self) -> Self:
+        if self._executor is not None:
+            raise RuntimeError("The token store is already open")
+
+        for _ in range(self.pool_size):
+            self._connections.put(self.connect())
+        # One worker per connection: a worker never waits for a free connection
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.pool_size, thread_name_prefix="token-store"
+        )
+        return self
+
+    async def close(self) -> None:
+        if self._executor is None:
+            return
+
+        executor, self._executor = self._executor, None
+        await asyncio.to_thread(executor.shutdown, wait=True)
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+    async def __aenter__(self) -> Self:
+        return self.open()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    def _checkout[T](self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        conn = self._connections.get()
+        try:
+            return fn(conn)
+        finally:
+            self._connections.put(conn)
+
+    async def run[T](self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Runs `fn` with a pooled connection on the store executor."""
+        if self._executor is None:
+            raise RuntimeError("The token store is closed")
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._checkout, fn)
+
+    async def execute(self, sql: str, parameters: Parameters = ()) -> int:
+        """Executes a statement and returns the number of affected rows."""
+        return await self.run(lambda conn: conn.execute(sql, parameters).rowcount)
+
+    async def fetchone(
+        self, sql: str, parameters: Parameters = ()
+    ) -> sqlite3.Row | None:
+        return await self.run(lambda conn: conn.execute(sql, parameters).fetchone())
+
+    async def fetchall(
+        self, sql: str, parameters: Parameters = ()
+    ) -> list[sqlite3.Row]:
+        return await self.run(lambda conn: conn.execute(sql, parameters).fetchall())
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from src.core.store import TokenStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class SweepReport:
+    sessions: int = 0
+    tokens: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.sessions + self.tokens
+
+
+@dataclass(frozen=True, slots=True)
+class SweeperStats:
+    runs: int
+    reclaimed: int
+    last_report: SweepReport | None
+
+
+class SessionSweeper:
+    """
+    Periodically deletes authorization sessions whose callback never arrived
+    and tokens past their expiry which can't be refreshed.
+    Rows are deleted in small batches, each one in its own transaction,
+    so the store is never locked for long.
+    """
+
+    def __init__(
+        self,
+        store: TokenStore,
+        *,
+        interval: float,
+        batch_size: int,
+        session_ttl: float,
+        expired_token_ttl: float,
+    ) -> None:
+        self.store = store
+        self.interval = interval
+        self.batch_size = batch_size
+        self.session_ttl = session_ttl
+        self.expired_token_ttl = expired_token_ttl
+        self.runs = 0
+        self.reclaimed = 0
+        self.last_report: SweepReport | None = None
+        self._task: asyncio.Task | None = None
+
+    async def _delete_batches(self, sql: str, *parameters: object) -> int:
+        total = 0
+        while True:
+            deleted = await self.store.execute(sql, (*parameters, self.batch_size))
+            total += deleted
+            if deleted < self.batch_size:
+                return total
+
+    async def sweep(self) -> SweepReport:
+        sessions = await self._delete_batches(
+            """
+            DELETE FROM tokens WHERE id IN (
+                SELECT id FROM tokens
+                WHERE access_token IS NULL AND created_at < datetime('now', ?)
+                LIMIT ?
+            )
+            """,
+            f"-{self.session_ttl} seconds",
+        )
+        tokens = await self._delete_batches(
+            """
+            DELETE FROM tokens WHERE id IN (
+                SELECT id FROM tokens
+                WHERE
+                    expires_at IS NOT NULL
+                    AND unixepoch(expires_at) < unixepoch('now') - ?
+                    -- A refreshable token outlives its access token
+                    AND refresh_token IS NULL
+                LIMIT ?
+            )
+            """,
+            self.expired_token_ttl,
+        )
+
+        report = SweepReport(sessions=sessions, tokens=tokens)
+        self.runs += 1
+        self.reclaimed += report.total
+        self.last_report = report
+        return report
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                report = await self.sweep()
+            except Exception:
+                logger.exception("Failed to sweep the token store")
+            else:
+                if report.total:
+                    logger.info(
+                        "Reclaimed %d abandoned sessions and %d expired tokens",
+                        report.sessions,
+                        report.tokens,
+                    )
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="session-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> SweeperStats:
+        return SweeperStats(
+            runs=self.runs, reclaimed=self.reclaimed, last_report=self.last_report
+        )
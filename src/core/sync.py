@@ -0,0 +1,256 @@
+import json
+import logging
+import sqlite3
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import get_args
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.clients.polar.client import PolarClient
+from src.clients.polar.contexts import (
+    TransactionContext,
+    TransactionItemContext,
+    TransactionKind,
+    TransactionsContext,
+)
+from src.core.store import TokenStore
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_KINDS: tuple[TransactionKind, ...] = get_args(TransactionKind)
+
+
+@dataclass(frozen=True, slots=True)
+class SyncReport:
+    kind: TransactionKind
+    transaction_id: int | None = None
+    fetched: int = 0
+    failed: int = 0
+    committed: bool = False
+
+
+class SyncEngine:
+    """
+    Downloads the data which is new since the last sync through AccessLink
+    transactions. The items of a transaction are fetched concurrently
+    and each one is stored as soon as it arrives, so an interrupted sync
+    resumes where it stopped. A transaction is committed only once
+    all of its items are stored, otherwise it's left open for the next run.
+    """
+
+    def __init__(
+        self, store: TokenStore, client: PolarClient, *, concurrency: int = 8
+    ) -> None:
+        self.store = store
+        self.client = client
+        self.concurrency = concurrency
+
+    async def sync(
+        self,
+        polar_user_id: int,
+        kinds: Iterable[TransactionKind] = TRANSACTION_KINDS,
+    ) -> list[SyncReport]:
+        return [await self.sync_kind(polar_user_id, kind) for kind in kinds]
+
+    async def _resume(self, polar_user_id: int, kind: TransactionKind) -> int | None:
+        row = await self.store.fetchone(
+            """
+            SELECT transaction_id FROM sync_transactions
+            WHERE polar_user_id = ? AND kind = ? AND state = 'open'
+            """,
+            (polar_user_id, kind),
+        )
+        return None if row is None else row["transaction_id"]
+
+    async def _set_state(
+        self, polar_user_id: int, kind: TransactionKind, transaction_id: int, state: str
+    ) -> None:
+        def update(conn: sqlite3.Connection) -> None:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                ref = conn.execute(
+                    """
+                    UPDATE sync_transactions
+                    SET state = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE polar_user_id = ? AND kind = ? AND transaction_id = ?
+                    RETURNING id
+                    """,
+                    (state, polar_user_id, kind, transaction_id),
+                ).fetchone()
+                if ref is not None:
+                    # The items are needed only while the transaction is open
+                    conn.execute(
+                        "DELETE FROM sync_items WHERE transaction_ref = ?", (ref[0],)
+                    )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+        await self.store.run(update)
+
+    async def _record_items(
+        self,
+        polar_user_id: int,
+        kind: TransactionKind,
+        transaction_id: int,
+        urls: list[str],
+    ) -> None:
+        def record(conn: sqlite3.Connection) -> None:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                (ref,) = conn.execute(
+                    """
+                    INSERT INTO sync_transactions (polar_user_id, kind, transaction_id)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (polar_user_id, kind, transaction_id)
+                    DO UPDATE SET state = 'open', updated_at = CURRENT_TIMESTAMP
+                    RETURNING id
+                    """,
+                    (polar_user_id, kind, transaction_id),
+                ).fetchone()
+                conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO sync_items (transaction_ref, item_id, url)
+                    VALUES (?, ?, ?)
+                    """,
+                    [(ref, urlsplit(url).path.rsplit("/", 1)[-1], url) for url in urls],
+                )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+        await self.store.run(record)
+
+    async def _pending(
+        self, polar_user_id: int, kind: TransactionKind, transaction_id: int
+    ) -> list[TransactionItemContext]:
+        # Items stored by an interrupted run, or by an expired transaction,
+        # are never fetched again
+        rows = await self.store.fetchall(
+            """
+            SELECT i.url FROM sync_items AS i
+            JOIN sync_transactions AS t ON t.id = i.transaction_ref
+            WHERE t.polar_user_id = ? AND t.kind = ? AND t.transaction_id = ?
+            AND NOT EXISTS (
+                SELECT 1 FROM sync_records AS r
+                WHERE r.polar_user_id = t.polar_user_id
+                AND r.kind = t.kind AND r.item_id = i.item_id
+            )
+            """,
+            (polar_user_id, kind, transaction_id),
+        )
+        contexts = []
+        for row in rows:
+            resource, item_id = urlsplit(row["url"]).path.rsplit("/", 2)[-2:]
+            contexts.append(
+                TransactionItemContext(
+                    user_id=polar_user_id,
+                    transactions=kind,
+                    transaction_id=transaction_id,
+                    resource=resource,
+                    item_id=item_id,
+                )
+            )
+        return contexts
+
+    async def _list(self, context: TransactionContext) -> list[str] | None:
+        """Lists a transaction, or returns None if it has expired upstream."""
+        try:
+            return await self.client.list_transaction(context)
+        except httpx.HTTPStatusError as error:
+            if error.response.status_code == 404:
+                return None
+            raise
+
+    async def sync_kind(self, polar_user_id: int, kind: TransactionKind) -> SyncReport:
+        transaction_id = await self._resume(polar_user_id, kind)
+        urls = None
+        if transaction_id is not None:
+            urls = await self._list(
+                TransactionContext(
+                    user_id=polar_user_id,
+                    transactions=kind,
+                    transaction_id=transaction_id,
+                )
+            )
+            if urls is None:
+                # An uncommitted transaction expires after a while,
+                # its items are part of the next one
+                logger.info("Transaction %s of %s expired", transaction_id, kind)
+                await self._set_state(polar_user_id, kind, transaction_id, "expired")
+
+        if urls is None:
+            transaction = await self.client.create_transaction(
+                TransactionsContext(user_id=polar_user_id, transactions=kind)
+            )
+            if transaction is None:
+                return SyncReport(kind)
+            transaction_id = transaction.transaction_id
+            urls = await self.client.list_transaction(
+                TransactionContext(
+                    user_id=polar_user_id,
+                    transactions=kind,
+                    transaction_id=transaction_id,
+                )
+            )
+
+        await self._record_items(polar_user_id, kind, transaction_id, urls)
+        contexts = await self._pending(polar_user_id, kind, transaction_id)
+
+        fetched = failed = 0
+        results = self.client.fetch_many(
+            self.client.get_transaction_item, contexts, concurrency=self.concurrency
+        )
+        async for result in results:
+            if not result.ok:
+                failed += 1
+                logger.warning(
+                    "Failed to fetch %s/%s of transaction %s: %s",
+                    result.context.resource,
+                    result.context.item_id,
+                    transaction_id,
+                    result.error,
+                )
+                continue
+
+            await self.store.execute(
+                """
+                INSERT INTO sync_records (polar_user_id, kind, item_id, payload)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (polar_user_id, kind, item_id)
+                DO UPDATE SET payload = excluded.payload, synced_at = CURRENT_TIMESTAMP
+                """,
+                (
+                    polar_user_id,
+                    kind,
+                    result.context.item_id,
+                    json.dumps(result.result),
+                ),
+            )
+            fetched += 1
+
+        if failed:
+            return SyncReport(kind, transaction_id, fetched, failed)
+
+        try:
+            await self.client.commit_transaction(
+                TransactionContext(
+                    user_id=polar_user_id,
+                    transactions=kind,
+                    transaction_id=transaction_id,
+                )
+            )
+        except httpx.HTTPStatusError as error:
+            if error.response.status_code != 404:
+                raise
+            # The stored items are skipped when they show up in the next one
+            logger.info("Transaction %s of %s expired", transaction_id, kind)
+            await self._set_state(polar_user_id, kind, transaction_id, "expired")
+            return SyncReport(kind, transaction_id, fetched, failed)
+
+        await self._set_state(polar_user_id, kind, transaction_id, "committed")
+        return SyncReport(kind, transaction_id, fetched, failed, committed=True)
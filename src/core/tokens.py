@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import time
+import weakref
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any
+
+from authlib.integrations.httpx_client import AsyncOAuth2Client
+
+from src.core.store import TokenStore
+
+if TYPE_CHECKING:
+    import httpx
+
+    from src.core.settings import PolarOauthSettings
+
+logger = logging.getLogger(__name__)
+
+type Token = dict[str, Any]
+type Refresh = Callable[[Token], Awaitable[Token]]
+
+
+def token_refresher(
+    settings: "PolarOauthSettings", transport: "httpx.AsyncBaseTransport | None" = None
+) -> Refresh:
+    """Refreshes tokens at the token endpoint, on a shared pool if one is given."""
+
+    async def refresh(token: Token) -> Token:
+        from src.core.http import SharedTransport, build_timeout
+
+        async with AsyncOAuth2Client(
+            client_id=str(settings.client_id),
+            client_secret=str(settings.client_secret),
+            token=token,
+            transport=None if transport is None else SharedTransport(transport),
+            timeout=build_timeout(settings),
+        ) as client:
+            return dict(
+                await client.refresh_token(
+                    str(settings.access_token_url),
+                    refresh_token=token["refresh_token"],
+                )
+            )
+
+    return refresh
+
+
+@dataclass(frozen=True, slots=True)
+class TokenStats:
+    refreshed: int
+    failed: int
+
+
+class TokenProvider:
+    """
+    Hands out the latest valid token of a user from the token store,
+    refreshing it once it's within `margin` seconds of its expiry.
+    A refresh is single-flight: tasks of a process queue on a lock per user,
+    and processes sharing the store take a lease on the token row,
+    so the token endpoint sees one refresh of a token however many ask for it.
+    A refreshed token is written back to the store for everyone else.
+    """
+
+    def __init__(
+        self,
+        store: TokenStore,
+        refresh: Refresh | None,
+        *,
+        margin: float,
+        lease: float,
+        poll_interval: float = 0.1,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        # Without a refresh, tokens are handed out until they expire
+        self.refresh = refresh
+        self.margin = margin
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.refreshed = 0
+        self.failed = 0
+        self._locks: weakref.WeakValueDictionary[int, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+
+    async def _latest(self, user_id: int) -> Token:
+        row = await self.store.fetchone(
+            """
+            SELECT
+                id,
+                user_id,
+                access_token,
+                token_type,
+                refresh_token,
+                unixepoch(expires_at) AS expires_at,
+                refresh_lease
+            FROM tokens
+            WHERE user_id = ? AND access_token IS NOT NULL
+            ORDER BY updated_at DESC, id DESC
+            LIMIT 1
+            """,
+            (user_id,),
+        )
+        if row is None:
+            raise LookupError(f"No token of the Polar user {user_id}")
+        return dict(row)
+
+    def _expires_within(self, token: Token, seconds: float) -> bool:
+        expires_at = token["expires_at"]
+        return expires_at is not None and expires_at <= self.clock() + seconds
+
+    @staticmethod
+    def _public(row: Token) -> Token:
+        return {
+            key: row[key]
+            for key in (
+                "user_id",
+                "access_token",
+                "token_type",
+                "refresh_token",
+                "expires_at",
+            )
+            if row[key] is not None
+        }
+
+    async def _acquire_lease(self, row: Token) -> bool:
+        now = self.clock()
+        # The token must be the one read, not one another process has just issued
+        return (
+            await self.store.execute(
+                """
+                UPDATE tokens SET refresh_lease = ?
+                WHERE
+                    id = ?
+                    AND access_token = ?
+                    AND (refresh_lease IS NULL OR refresh_lease <= ?)
+                """,
+                (now + self.lease, row["id"], row["access_token"], now),
+            )
+            > 0
+        )
+
+    async def _release_lease(self, row: Token) -> None:
+        await self.store.execute(
+            "UPDATE tokens SET refresh_lease = NULL WHERE id = ?", (row["id"],)
+        )
+
+    async def get(self, user_id: int) -> Token:
+        """
+        The token of a user, refreshed ahead of its expiry.
+        Raises LookupError if the user has no token, or only an expired one
+        which can't be refreshed.
+        """
+        row = await self._latest(user_id)
+        if not self._expires_within(row, self.margin):
+            return self._public(row)
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            while True:
+                # Re-read: the token may have been refreshed while waiting
+                row = await self._latest(user_id)
+                if not self._expires_within(row, self.margin):
+                    return self._public(row)
+                expired = self._expires_within(row, 0.0)
+                if self.refresh is None or not row["refresh_token"]:
+                    if expired:
+                        raise LookupError(f"The token of the user {user_id} expired")
+                    return self._public(row)
+                if await self._acquire_lease(row):
+                    break
+                if not expired:
+                    # Another process is refreshing it, the token is still good
+                    return self._public(row)
+                await asyncio.sleep(self.poll_interval)
+
+            try:
+                token = await self.refresh(self._public(row))
+            except Exception:
+                self.failed += 1
+                await self._release_lease(row)
+                if expired:
+                    raise
+                logger.warning(
+                    "Failed to refresh the token of the user %s", user_id, exc_info=True
+                )
+                return self._public(row)
+
+            self.refreshed += 1
+            await self.save(token, refresh_token=row["refresh_token"])
+            return self._public(await self._latest(user_id))
+
+    async def save(
+        self,
+        token: Token,
+        refresh_token: str | None = None,
+        access_token: str | None = None,
+    ) -> None:
+        """
+        Writes a refreshed token back over the one it replaces,
+        found by its refresh token or its access token.
+        The signature is the `update_token` hook of the authlib clients.
+        """
+        expires_at = token.get("expires_at")
+        if expires_at is None and token.get("expires_in") is not None:
+            expires_at = self.clock() + float(token["expires_in"])
+        updated = await self.store.execute(
+            """
+            UPDATE tokens
+            SET
+                access_token = ?,
+                token_type = ?,
+                refresh_token = COALESCE(?, refresh_token),
+                expires_at = ?,
+                refresh_lease = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE refresh_token = ? OR access_token = ?
+            """,
+            (
+                token["access_token"],
+                token.get("token_type", "bearer").lower(),
+                token.get("refresh_token"),
+                None
+                if expires_at is None
+                else datetime.fromtimestamp(expires_at, UTC).isoformat(sep=" "),
+                refresh_token or token.get("refresh_token"),
+                access_token,
+            ),
+        )
+        if not updated:
+            logger.warning("The refreshed token replaces no stored token")
+
+    def stats(self) -> TokenStats:
+        return TokenStats(refreshed=self.refreshed, failed=self.failed)
+
+
+class ProvidedOAuth2Client(AsyncOAuth2Client):
+    """
+    A client acting for a user of a token provider.
+    Its token is never refreshed at the token endpoint by the client itself,
+    a token about to expire is replaced with the one the provider hands out,
+    so every refresh takes the lock and the lease of the provider.
+    """
+
+    def __init__(
+        self, tokens: TokenProvider, user_id: int, token: Token, **kwargs: Any
+    ) -> None:
+        super().__init__(token=token, **kwargs)
+        self.tokens = tokens
+        self.user_id = user_id
+
+    async def ensure_active_token(self, token: Token) -> None:
+        if self.token.is_expired(leeway=self.leeway):
+            self.token = await self.tokens.get(self.user_id)
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from src.core.models import UserModel
+from src.core.store import TokenStore
+
+logger = logging.getLogger(__name__)
+
+# A registered user is keyed by the OAuth client and the member ID
+type UserKey = tuple[str, int]
+
+
+@dataclass(frozen=True, slots=True)
+class ProfileStats:
+    hits: int
+    # Served while being refreshed in the background
+    stale: int
+    misses: int
+    refreshed: int
+    failed: int
+
+
+class UserProfiles:
+    """
+    The profiles of registered users, kept in the `users` table
+    and served from it rather than from AccessLink.
+    A profile older than `ttl` seconds is still served,
+    and refreshed in the background, one refresh per user at a time.
+    A profile older than `max_stale` seconds is refreshed before it's served.
+    """
+
+    def __init__(
+        self,
+        store: TokenStore,
+        *,
+        ttl: float,
+        max_stale: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.clock = clock
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.refreshed = 0
+        self.failed = 0
+        self._refreshing: dict[UserKey, asyncio.Task] = {}
+
+    async def save(self, key: UserKey, user: UserModel) -> None:
+        client_id, member_id = key
+        await self.store.execute(
+            """
+            INSERT INTO users
+                (client_id, member_id, polar_user_id, profile, refreshed_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (client_id, member_id) DO UPDATE SET
+                polar_user_id = excluded.polar_user_id,
+                profile = excluded.profile,
+                refreshed_at = excluded.refreshed_at,
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            (
+                client_id,
+                member_id,
+                user.polar_user_id,
+                user.model_dump_json(by_alias=True),
+                self.clock(),
+            ),
+        )
+
+    async def forget(self, key: UserKey) -> None:
+        client_id, member_id = key
+        if task := self._refreshing.pop(key, None):
+            task.cancel()
+        await self.store.execute(
+            "DELETE FROM users WHERE client_id = ? AND member_id = ?",
+            (client_id, member_id),
+        )
+
+    async def _refresh(
+        self, key: UserKey, fetch: Callable[[], Awaitable[UserModel]]
+    ) -> UserModel:
+        user = await fetch()
+        await self.save(key, user)
+        self.refreshed += 1
+        return user
+
+    async def _revalidate(
+        self, key: UserKey, fetch: Callable[[], Awaitable[UserModel]]
+    ) -> None:
+        try:
+            await self._refresh(key, fetch)
+        except Exception:
+            self.failed += 1
+            logger.warning("Failed to refresh the profile of %s", key, exc_info=True)
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get(
+        self, key: UserKey, fetch: Callable[[], Awaitable[UserModel]]
+    ) -> UserModel:
+        """
+        The stored profile of a user.
+        `fetch` retrieves it from AccessLink when it's missing or due a refresh.
+        """
+        client_id, member_id = key
+        row = await self.store.fetchone(
+            """
+            SELECT profile, refreshed_at FROM users
+            WHERE client_id = ? AND member_id = ? AND profile IS NOT NULL
+            """,
+            (client_id, member_id),
+        )
+        age = None if row is None else self.clock() - row["refreshed_at"]
+        if age is None or age > self.max_stale:
+            self.misses += 1
+            return await self._refresh(key, fetch)
+
+        if age > self.ttl:
+            self.stale += 1
+            if key not in self._refreshing:
+                self._refreshing[key] = asyncio.create_task(
+                    self._revalidate(key, fetch), name=f"user-profile-{member_id}"
+                )
+        else:
+            self.hits += 1
+        return UserModel.model_validate_json(row["profile"], by_alias=True)
+
+    async def stop(self) -> None:
+        tasks, self._refreshing = list(self._refreshing.values()), {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> ProfileStats:
+        return ProfileStats(
+            hits=self.hits,
+            stale=self.stale,
+            misses=self.misses,
+            refreshed=self.refreshed,
+            failed=self.failed,
+        )
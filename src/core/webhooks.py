@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from src.core.store import TokenStore
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "Polar-Webhook-Signature"
+
+
+def verify_signature(body: bytes, signature: str | None, secret: str) -> bool:
+    """Checks the HMAC-SHA256 signature Polar computes over the request body."""
+    if not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+@dataclass(frozen=True, slots=True)
+class WebhookEvent:
+    id: int
+    event: str
+    polar_user_id: int | None
+    entity_id: str | None
+    url: str | None
+    attempts: int
+
+
+@dataclass(frozen=True, slots=True)
+class WebhookStats:
+    processed: int
+    retried: int
+    failed: int
+
+
+class WebhookQueue:
+    """
+    A durable queue of webhook events in the token store.
+    An event is claimed with a lease: should its worker die,
+    the event becomes available again once the lease runs out.
+    """
+
+    def __init__(self, store: TokenStore, clock: Callable[[], float] = time.time):
+        self.store = store
+        self.clock = clock
+
+    @staticmethod
+    def dedup_key(payload: Mapping[str, Any]) -> str:
+        # A redelivered event names the same entity of the same user
+        subject = payload.get("entity_id") or payload.get("date") or payload.get("url")
+        if subject is None:
+            subject = payload.get("timestamp")
+        return f"{payload.get('event')}:{payload.get('user_id')}:{subject}"
+
+    async def enqueue(self, payload: Mapping[str, Any]) -> bool:
+        """Stores an event unless it was seen before. Returns whether it's new."""
+        inserted = await self.store.execute(
+            """
+            INSERT INTO webhook_events
+                (dedup_key, event, polar_user_id, entity_id, url, payload, available_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (dedup_key) DO NOTHING
+            """,
+            (
+                self.dedup_key(payload),
+                payload.get("event"),
+                payload.get("user_id"),
+                payload.get("entity_id"),
+                payload.get("url"),
+                json.dumps(payload),
+                self.clock(),
+            ),
+        )
+        return inserted > 0
+
+    async def claim(self, limit: int, lease: float) -> list[WebhookEvent]:
+        now = self.clock()
+        rows = await self.store.fetchall(
+            """
+            UPDATE webhook_events
+            SET
+                state = 'processing',
+                attempts = attempts + 1,
+                available_at = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT id FROM webhook_events
+                WHERE state IN ('pending', 'processing') AND available_at <= ?
+                ORDER BY available_at, id
+                LIMIT ?
+            )
+            RETURNING id, event, polar_user_id, entity_id, url, attempts
+            """,
+            (now + lease, now, limit),
+        )
+        return [WebhookEvent(**row) for row in rows]
+
+    async def complete(self, ids: list[int]) -> None:
+        if not ids:
+            return
+        await self.store.execute(
+            f"""
+            UPDATE webhook_events
+            SET state = 'done', last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({", ".join("?" * len(ids))})
+            """,
+            ids,
+        )
+
+    async def retry(self, event: WebhookEvent, error: str, delay: float | None) -> None:
+        """Makes an event available again after `delay`, or fails it for good."""
+        await self.store.execute(
+            """
+            UPDATE webhook_events
+            SET
+                state = ?,
+                available_at = ?,
+                last_error = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (
+                "failed" if delay is None else "pending",
+                self.clock() + (delay or 0.0),
+                error,
+                event.id,
+            ),
+        )
+
+
+class WebhookWorkers:
+    """
+    A pool of workers draining the webhook queue in batches.
+    The events of a batch are handled concurrently and completed together.
+    A failed event is retried with exponential backoff up to `max_attempts`.
+    Idle workers poll the queue, and are woken up early by `notify`.
+    """
+
+    def __init__(
+        self,
+        queue: WebhookQueue,
+        handler: Callable[[WebhookEvent], Awaitable[None]],
+        *,
+        workers: int,
+        batch_size: int,
+        poll_interval: float,
+        lease: float,
+        backoff: float,
+        max_attempts: int,
+    ) -> None:
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.backoff = backoff
+        self.max_attempts = max_attempts
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    async def _handle(self, event: WebhookEvent) -> bool:
+        try:
+            await self.handler(event)
+        except Exception as error:
+            delay = None
+            if event.attempts < self.max_attempts:
+                delay = self.backoff * 2 ** (event.attempts - 1)
+            logger.warning(
+                "Failed to handle webhook event %s (attempt %d): %s",
+                event.id,
+                event.attempts,
+                error,
+            )
+            await self.queue.retry(event, repr(error), delay)
+            # Counted once recorded, the stats never run ahead of the queue
+            if delay is None:
+                self.failed += 1
+            else:
+                self.retried += 1
+            return False
+        return True
+
+    async def drain(self) -> int:
+        """Handles one batch of available events. Returns the size of the batch."""
+        events = await self.queue.claim(self.batch_size, self.lease)
+        if not events:
+            return 0
+
+        handled = await asyncio.gather(*(self._handle(event) for event in events))
+        done = [event.id for event, ok in zip(events, handled) if ok]
+        await self.queue.complete(done)
+        self.processed += len(done)
+        return len(events)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                drained = await self.drain()
+            except Exception:
+                logger.exception("Failed to drain the webhook queue")
+                drained = 0
+            if drained:
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run(), name=f"webhook-worker-{index}")
+                for index in range(self.workers)
+            ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> WebhookStats:
+        return WebhookStats(
+            processed=self.processed, retried=self.retried, failed=self.failed
+        )
@@ -1,14 +1,17 @@
-import sqlite3
+import json
 from contextlib import asynccontextmanager
+from functools import partial
 from http import HTTPStatus
 from operator import itemgetter
-from typing import Annotated, cast
+from typing import Annotated, Any, cast
 
+from authlib.integrations.httpx_client import AsyncOAuth2Client
 from authlib.integrations.starlette_client import OAuth, StarletteOAuth2App
 from fastapi import (
     APIRouter,
     Depends,
     FastAPI,
+    Header,
     Query,
     Request,
 )
@@ -17,9 +20,31 @@ from fastapi.openapi.models import OAuthFlowAuthorizationCode, OAuthFlows
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2
 
+from src.clients.base.coalescing import RequestCoalescer
+from src.clients.polar.client import PolarClient
+from src.clients.polar.contexts import ExerciseContext
+from src.core.cache import TTLCache
+from src.core.http import SharedTransport, build_timeout, build_transport
 from src.core.migrations import apply_migrations
 from src.core.models import OAuth2TokenModel, TokenModel, UserModel
+from src.core.scheduler import SyncJob, SyncScheduler
 from src.core.settings import ApplicationSettings, settings
+from src.core.store import TokenStore
+from src.core.sweeper import SessionSweeper
+from src.core.tokens import (
+    ProvidedOAuth2Client,
+    Token,
+    TokenProvider,
+    token_refresher,
+)
+from src.core.users import UserKey, UserProfiles
+from src.core.webhooks import (
+    SIGNATURE_HEADER,
+    WebhookEvent,
+    WebhookQueue,
+    WebhookWorkers,
+    verify_signature,
+)
 
 oauth2_flow = OAuthFlows(
     authorizationCode=OAuthFlowAuthorizationCode(
@@ -34,9 +59,81 @@ oauth2_scheme = OAuth2(
     scheme_name="Polar OAuth2",
 )
 
+# A bearer token is keyed by its lowercased type and value
+type TokenKey = tuple[str, str]
+type TokenRecord = dict[str, Any]
+
+
+def user_key(token_data: TokenRecord) -> UserKey:
+    return token_data["client_id"], token_data["user_id"]
+
+
+def authorization_header(token_data: TokenRecord) -> str:
+    return f"{token_data['token_type'].capitalize()} {token_data['access_token']}"
+
+
+def upstream_client_kwargs(app: FastAPI) -> dict[str, Any]:
+    settings: ApplicationSettings = app.state.settings
+    return {
+        "client_id": str(settings.oauth.client_id),
+        "client_secret": str(settings.oauth.client_secret),
+        "base_url": str(settings.oauth.accesslink_url),
+        "transport": SharedTransport(app.state.transport),
+        "timeout": build_timeout(settings.oauth),
+    }
+
+
+def upstream_client(app: FastAPI, token_data: TokenRecord) -> AsyncOAuth2Client:
+    """Builds a client acting for the owner of a token on the shared pool."""
+    return AsyncOAuth2Client(
+        token={
+            "access_token": token_data["access_token"],
+            "token_type": token_data["token_type"],
+        },
+        **upstream_client_kwargs(app),
+    )
+
+
+def sync_client(app: FastAPI, job: SyncJob, token: Token) -> PolarClient:
+    # A sync outliving the token refreshes it through the provider
+    return PolarClient(
+        ProvidedOAuth2Client(
+            app.state.token_provider,
+            job.polar_user_id,
+            token,
+            **upstream_client_kwargs(app),
+        ),
+        coalescer=app.state.coalescer,
+    )
+
+
+async def handle_webhook_event(app: FastAPI, event: WebhookEvent) -> None:
+    """Fetches the exercise announced by a webhook event into the sync records."""
+    if event.event != "EXERCISE" or event.entity_id is None:
+        return
+
+    store: TokenStore = app.state.store
+    tokens: TokenProvider = app.state.token_provider
+    token_data = await tokens.get(event.polar_user_id)
+
+    async with upstream_client(app, token_data) as oauth_client:
+        exercise = await PolarClient(
+            oauth_client, coalescer=app.state.coalescer
+        ).get_exercise(ExerciseContext(exercise_id=event.entity_id))
+    await store.execute(
+        """
+        INSERT INTO sync_records (polar_user_id, kind, item_id, payload)
+        VALUES (?, 'exercises', ?, ?)
+        ON CONFLICT (polar_user_id, kind, item_id)
+        DO UPDATE SET payload = excluded.payload, synced_at = CURRENT_TIMESTAMP
+        """,
+        (event.polar_user_id, event.entity_id, exercise.model_dump_json()),
+    )
+
 
 @asynccontextmanager
 async def configure(app: FastAPI):
+    transport = build_transport(settings.oauth)
     oauth = OAuth()
     oauth.register(
         name="polar",
@@ -45,17 +142,73 @@ async def configure(app: FastAPI):
         authorize_url=str(settings.oauth.authorization_url),
         access_token_url=str(settings.oauth.access_token_url),
         api_base_url=str(settings.oauth.accesslink_url),
+        # Every upstream call borrows the connections of the application pool
+        client_kwargs={
+            "transport": SharedTransport(transport),
+            "timeout": build_timeout(settings.oauth),
+        },
     )
 
     app.state.oauth = oauth
+    app.state.transport = transport
     app.state.settings = settings
-    app.state.db = sqlite3.connect(
-        settings.server.sqlite_path, autocommit=True, check_same_thread=False
+    # Identical upstream GETs of concurrent requests share one response
+    app.state.coalescer = RequestCoalescer()
+    app.state.store = TokenStore.from_settings(settings.server).open()
+    app.state.token_cache = TTLCache[TokenKey, TokenRecord](
+        maxsize=settings.server.token_cache_size, ttl=settings.server.token_cache_ttl
+    )
+    await apply_migrations(app.state.store)
+    app.state.sweeper = SessionSweeper(
+        app.state.store,
+        interval=settings.server.sweeper_interval,
+        batch_size=settings.server.sweeper_batch_size,
+        session_ttl=settings.server.session_ttl,
+        expired_token_ttl=settings.server.expired_token_ttl,
+    )
+    app.state.sweeper.start()
+    app.state.token_provider = TokenProvider(
+        app.state.store,
+        token_refresher(settings.oauth, transport),
+        margin=settings.server.token_refresh_margin,
+        lease=settings.server.token_refresh_lease,
+    )
+    app.state.user_profiles = UserProfiles(
+        app.state.store,
+        ttl=settings.server.user_profile_ttl,
+        max_stale=settings.server.user_profile_max_stale,
+    )
+    app.state.webhook_queue = WebhookQueue(app.state.store)
+    app.state.webhook_workers = WebhookWorkers(
+        app.state.webhook_queue,
+        partial(handle_webhook_event, app),
+        workers=settings.server.webhook_workers,
+        batch_size=settings.server.webhook_batch_size,
+        poll_interval=settings.server.webhook_poll_interval,
+        lease=settings.server.webhook_lease,
+        backoff=settings.server.webhook_retry_backoff,
+        max_attempts=settings.server.webhook_max_attempts,
     )
-    app.state.db.row_factory = sqlite3.Row
-    await apply_migrations(app.state.db)
+    app.state.webhook_workers.start()
+    app.state.sync_scheduler = SyncScheduler(
+        app.state.store,
+        app.state.token_provider,
+        partial(sync_client, app),
+        interval=settings.server.sync_interval,
+        window=settings.server.sync_window,
+        concurrency=settings.server.sync_concurrency,
+        user_concurrency=settings.server.sync_user_concurrency,
+        expiry_margin=settings.server.sync_expiry_margin,
+    )
+    if settings.server.sync_interval:
+        app.state.sync_scheduler.start()
     yield
-    app.state.db.close()
+    await app.state.user_profiles.stop()
+    await app.state.sync_scheduler.stop()
+    await app.state.webhook_workers.stop()
+    await app.state.sweeper.stop()
+    await transport.aclose()
+    await app.state.store.close()
 
 
 def provision_settings(request: Request) -> ApplicationSettings:
@@ -66,12 +219,78 @@ def provision_oauth_client(request: Request) -> StarletteOAuth2App:
     return cast(OAuth, request.app.state.oauth).create_client("polar")
 
 
-def provision_database(request: Request) -> sqlite3.Connection:
-    return request.app.state.db
+def provision_coalescer(request: Request) -> RequestCoalescer:
+    return request.app.state.coalescer
+
+
+def provision_user_profiles(request: Request) -> UserProfiles:
+    return request.app.state.user_profiles
+
+
+def provision_store(request: Request) -> TokenStore:
+    return request.app.state.store
+
+
+def provision_webhook_queue(request: Request) -> WebhookQueue:
+    return request.app.state.webhook_queue
+
+
+def provision_webhook_workers(request: Request) -> WebhookWorkers:
+    return request.app.state.webhook_workers
+
+
+def provision_token_cache(request: Request) -> TTLCache[TokenKey, TokenRecord]:
+    return request.app.state.token_cache
+
+
+async def provision_token(
+    store: Annotated[TokenStore, Depends(provision_store)],
+    cache: Annotated[TTLCache[TokenKey, TokenRecord], Depends(provision_token_cache)],
+    authorization: Annotated[str, Depends(oauth2_scheme)],
+) -> TokenRecord:
+    """Resolves the bearer token of a request, skipping the store on a cache hit."""
+    parts = authorization.split(" ")
+    if len(parts) != 2:
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail="Invalid authorization header format",
+        )
+
+    token_type, token = parts
+    key = (token_type.lower(), token)
+
+    token_data = cache.get(key)
+    if token_data is None:
+        row = await store.fetchone(
+            """
+            SELECT
+                client_id,
+                user_id,
+                access_token,
+                token_type,
+                unixepoch(expires_at) as expires_at,
+                updated_at,
+                created_at
+            FROM tokens
+            WHERE access_token = ? AND token_type = ?
+            """,
+            (token, token_type.lower()),
+        )
+        if not row:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail="Token not found for user"
+            )
+
+        token_data = dict(row)
+        cache.set(key, token_data, expires_at=token_data["expires_at"])
+
+    # Handlers may mutate their copy without touching the cached one
+    return dict(token_data)
 
 
 healthcheck_router = APIRouter(prefix="/health", tags=["Health"])
 router = APIRouter(prefix="/oauth", tags=["OAuth"])
+webhook_router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
 
 
 @router.get("/authorize", name="oauth_authorize")
@@ -81,16 +300,17 @@ async def login(
         str, Query(description="An athorization session state")
     ],  # @TODO: Change to UUID4
     client_id: Annotated[str, Query(description="An OAuth2 client ID issued by Polar")],
-    conn: Annotated[sqlite3.Connection, Depends(provision_database)],
+    store: Annotated[TokenStore, Depends(provision_store)],
     settings: Annotated[ApplicationSettings, Depends(provision_settings)],
     client: Annotated[StarletteOAuth2App, Depends(provision_oauth_client)],
     scope: Annotated[
         list[str] | None, Query(description="Authentication scopes governed by Polar")
     ] = None,
 ) -> RedirectResponse:
-    conn.execute(
+    await store.execute(
         """
         INSERT INTO tokens (client_id, session_id) VALUES (?, ?)
+        ON CONFLICT (session_id) DO NOTHING
         """,
         (str(client_id), state),
     )
@@ -119,7 +339,8 @@ async def login(
 async def callback(
     request: Request,
     client: Annotated[StarletteOAuth2App, Depends(provision_oauth_client)],
-    conn: Annotated[sqlite3.Connection, Depends(provision_database)],
+    store: Annotated[TokenStore, Depends(provision_store)],
+    cache: Annotated[TTLCache[TokenKey, TokenRecord], Depends(provision_token_cache)],
 ) -> RedirectResponse:
     """
     Handles the OAuth2 callback from Polar
@@ -135,29 +356,27 @@ async def callback(
         )
 
     # Retrieve the temporary user email associated with this state
-    target_client = conn.execute(
+    target_client = await store.fetchone(
         """
-        SELECT client_id FROM tokens WHERE session_id = ?
+        SELECT client_id, access_token, token_type FROM tokens WHERE session_id = ?
         """,
         (state,),
-    ).fetchone()
+    )
 
     if not target_client:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST, detail="Invalid OAuth state"
         )
 
-    token_model = OAuth2TokenModel.model_validate(
-        await client.fetch_access_token(
-            str(request.url_for("oauth_callback")),
-            grant_type="authorization_code",
-            authorization_response=str(request.url),
-        ),
-        by_name=True,
+    token = await client.fetch_access_token(
+        str(request.url_for("oauth_callback")),
+        grant_type="authorization_code",
+        authorization_response=str(request.url),
     )
+    token_model = OAuth2TokenModel.model_validate(token, by_name=True)
 
     # Update the token entry for the specific temporary user email
-    conn.execute(
+    await store.execute(
         """
         UPDATE tokens
         SET
@@ -165,6 +384,7 @@ async def callback(
             access_token = ?,
             token_type = ?,
             expires_at = ?,
+            refresh_token = ?,
             code = ?,
             updated_at = CURRENT_TIMESTAMP
         WHERE session_id = ?
@@ -174,10 +394,18 @@ async def callback(
             token_model.access_token,
             token_model.token_type,
             token_model.expires_at,
+            token.get("refresh_token"),
             code,
             state,
         ),
     )
+    # Neither the replaced nor the issued token may resolve to a stale row
+    for token_type, token in (
+        (target_client["token_type"], target_client["access_token"]),
+        (token_model.token_type, token_model.access_token),
+    ):
+        if token_type and token:
+            cache.pop((token_type.lower(), token))
 
     redirect_url = f"/docs/oauth2-redirect#state={state}&code={code}"
     return RedirectResponse(url=redirect_url)
@@ -186,14 +414,14 @@ async def callback(
 @router.post("/token", name="oauth_issue_token", response_model=TokenModel)
 async def issue_token(
     request: Request,
-    conn: Annotated[sqlite3.Connection, Depends(provision_database)],
+    store: Annotated[TokenStore, Depends(provision_store)],
 ) -> TokenModel:
     """Implements the token endpoint for OAuth2 token exchange."""
 
     form_data = await request.form()
     code = form_data["code"]
 
-    token_data = conn.execute(
+    token_data = await store.fetchone(
         """
         SELECT
             user_id,
@@ -206,7 +434,7 @@ async def issue_token(
         WHERE code = ?
         """,
         (code,),
-    ).fetchone()
+    )
 
     if not token_data:
         raise HTTPException(
@@ -221,81 +449,19 @@ async def issue_token(
 
 @router.get("/token", name="oauth_fetch_token", response_model=TokenModel)
 async def fetch_token(
-    conn: Annotated[sqlite3.Connection, Depends(provision_database)],
-    authorization: Annotated[str, Depends(oauth2_scheme)],
+    token_data: Annotated[TokenRecord, Depends(provision_token)],
 ) -> TokenModel:
-    parts = authorization.split(" ")
-    if len(parts) != 2:
-        raise HTTPException(
-            status_code=HTTPStatus.UNAUTHORIZED,
-            detail="Invalid authorization header format",
-        )
-
-    token_type, token = parts
-
-    token_data = conn.execute(
-        """
-        SELECT
-            user_id,
-            access_token,
-            token_type,
-            expires_at,
-            updated_at,
-            created_at
-        FROM tokens
-        WHERE access_token = ? AND token_type = ?
-        """,
-        (token, token_type.lower()),
-    ).fetchone()
-
-    if not token_data:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail="Token not found for user"
-        )
-
-    return TokenModel.model_validate(
-        {key: token_data[key] for key in token_data.keys()},
-        by_alias=True,
-    )
+    return TokenModel.model_validate(token_data, by_alias=True)
 
 
 @router.post("/user", name="oauth_user_register", response_model=UserModel)
 async def register_user(
-    conn: Annotated[sqlite3.Connection, Depends(provision_database)],
+    store: Annotated[TokenStore, Depends(provision_store)],
     client: Annotated[StarletteOAuth2App, Depends(provision_oauth_client)],
-    authorization: Annotated[str, Depends(oauth2_scheme)],
+    profiles: Annotated[UserProfiles, Depends(provision_user_profiles)],
+    token_data: Annotated[TokenRecord, Depends(provision_token)],
 ):
-    parts = authorization.split(" ")
-    if len(parts) != 2:
-        raise HTTPException(
-            status_code=HTTPStatus.UNAUTHORIZED,
-            detail="Invalid authorization header format",
-        )
-
-    token_type, token = parts
-
-    token_data = conn.execute(
-        """
-        SELECT
-            client_id,
-            user_id,
-            access_token,
-            token_type,
-            unixepoch(expires_at) as expires_at,
-            updated_at,
-            created_at
-        FROM tokens
-        WHERE access_token = ? AND token_type = ?
-        """,
-        (token, token_type.lower()),
-    ).fetchone()
-
-    if not token_data:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail="Token not found for user"
-        )
-
-    found_user = conn.execute(
+    found_user = await store.fetchone(
         """
         SELECT
             id,
@@ -306,7 +472,7 @@ async def register_user(
         WHERE client_id = ? AND member_id = ?
         """,
         (token_data["client_id"], token_data["user_id"]),
-    ).fetchone()
+    )
 
     if found_user is not None:
         raise HTTPException(
@@ -319,103 +485,112 @@ async def register_user(
         headers={
             "Content-Type": "application/json",
             "Accept": "application/json",
-            "Authorization": f"{token_type.capitalize()} {token}",
+            "Authorization": authorization_header(token_data),
         },
-        token=dict(token_data),
+        token=token_data,
         json={"member-id": token_data["user_id"]},
     )
-    registered_user = UserModel.model_validate(
-        response.json(),
+    registered_user = UserModel.model_validate_json(
+        response.content,
         by_alias=True,
     )
+    await profiles.save(user_key(token_data), registered_user)
     return registered_user
 
 
 @router.get("/user", name="register-user")
 async def fetch_user(
-    conn: Annotated[sqlite3.Connection, Depends(provision_database)],
     client: Annotated[StarletteOAuth2App, Depends(provision_oauth_client)],
-    authorization: Annotated[str, Depends(oauth2_scheme)],
+    coalescer: Annotated[RequestCoalescer, Depends(provision_coalescer)],
+    profiles: Annotated[UserProfiles, Depends(provision_user_profiles)],
+    token_data: Annotated[TokenRecord, Depends(provision_token)],
 ) -> UserModel:
-    parts = authorization.split(" ")
-    if len(parts) != 2:
-        raise HTTPException(
-            status_code=HTTPStatus.UNAUTHORIZED,
-            detail="Invalid authorization header format",
+    """Serves the stored profile, AccessLink is called only to refresh it."""
+    url = f"/v3/users/{token_data['user_id']}"
+
+    async def fetch() -> UserModel:
+        response = await coalescer.run(
+            ("GET", url, token_data["token_type"].lower(), token_data["access_token"]),
+            lambda: client.get(
+                url,
+                headers={
+                    "Content-Type": "application/json",
+                    "Accept": "application/json",
+                    "Authorization": authorization_header(token_data),
+                },
+                token=token_data,
+            ),
         )
+        if response.is_error:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_GATEWAY,
+                detail=f"AccessLink failed to fetch the user: {response.status_code}",
+            )
+        return UserModel.model_validate_json(response.content, by_alias=True)
 
-    token_type, token = parts
-
-    token_data = conn.execute(
-        """
-        SELECT
-            client_id,
-            user_id,
-            access_token,
-            token_type,
-            unixepoch(expires_at) as expires_at,
-            updated_at,
-            created_at
-        FROM tokens
-        WHERE access_token = ? AND token_type = ?
-        """,
-        (token, token_type.lower()),
-    ).fetchone()
+    return await profiles.get(user_key(token_data), fetch)
 
-    if not token_data:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail="Token not found for user"
-        )
 
-    response = await client.get(
+@router.delete("/user/")
+async def delete_user(
+    client: Annotated[StarletteOAuth2App, Depends(provision_oauth_client)],
+    profiles: Annotated[UserProfiles, Depends(provision_user_profiles)],
+    token_data: Annotated[TokenRecord, Depends(provision_token)],
+):
+    response = await client.delete(
         f"/v3/users/{token_data['user_id']}",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": f"{token_type.capitalize()} {token}",
-        },
-        token=dict(token_data),
-    )
-
-    registered_user = UserModel.model_validate(
-        response.json(),
-        by_alias=True,
+        headers={"Authorization": authorization_header(token_data)},
+        token=token_data,
     )
+    if response.is_error:
+        # The user is still registered, so is their profile
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_GATEWAY,
+            detail=f"AccessLink failed to delete the user: {response.status_code}",
+        )
 
-    return registered_user
+    await profiles.forget(user_key(token_data))
+    return {"message": "User deleted"}
 
 
-@router.delete("/user/")
-async def delete_user(
-    conn: Annotated[sqlite3.Connection, Depends(provision_database)],
-    client: Annotated[StarletteOAuth2App, Depends(provision_oauth_client)],
-    authorization: Annotated[str, Depends(oauth2_scheme)],
-):
-    parts = authorization.split(" ")
-    if len(parts) != 2:
+@webhook_router.post("/polar", name="polar_webhook")
+async def polar_webhook(
+    request: Request,
+    settings: Annotated[ApplicationSettings, Depends(provision_settings)],
+    queue: Annotated[WebhookQueue, Depends(provision_webhook_queue)],
+    workers: Annotated[WebhookWorkers, Depends(provision_webhook_workers)],
+    signature: Annotated[str | None, Header(alias=SIGNATURE_HEADER)] = None,
+) -> dict:
+    """
+    Accepts a webhook event from Polar. The event is only queued here,
+    the webhook workers fetch the data it announces.
+    """
+    secret = settings.oauth.webhook_secret
+    if secret is None:
         raise HTTPException(
-            status_code=HTTPStatus.UNAUTHORIZED,
-            detail="Invalid authorization header format",
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail="Webhooks are not configured",
         )
 
-    token_type, token = parts
+    body = await request.body()
+    if not verify_signature(body, signature, secret.get_secret_value()):
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED, detail="Invalid webhook signature"
+        )
 
-    token_data = conn.execute(
-        """
-        SELECT
-            client_id,
-            user_id,
-            access_token,
-            token_type,
-            created_at
-           FROM tokens
-           WHERE access_token = ? AND token_type = ?
-           """,
-        (token, token_type.lower()),
-    ).fetchone()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict) or "event" not in payload:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail="Invalid webhook event"
+        )
 
-    await client.delete(f"/users/{token_data['user_id']}")
-    return {"message": "User deleted"}
+    # Polar pings a webhook when it's created
+    if payload["event"] != "PING" and await queue.enqueue(payload):
+        workers.notify()
+    return {"status": "accepted"}
 
 
 @healthcheck_router.get("/check", name="healthcheck")
@@ -423,6 +598,22 @@ async def healthcheck() -> dict:
     return {"status": "ok"}
 
 
+@healthcheck_router.get("/stats", name="healthcheck_stats")
+async def stats(
+    request: Request,
+    cache: Annotated[TTLCache[TokenKey, TokenRecord], Depends(provision_token_cache)],
+) -> dict:
+    return {
+        "token_cache": cache.stats(),
+        "sweeper": cast(SessionSweeper, request.app.state.sweeper).stats(),
+        "webhooks": cast(WebhookWorkers, request.app.state.webhook_workers).stats(),
+        "sync": cast(SyncScheduler, request.app.state.sync_scheduler).stats(),
+        "tokens": cast(TokenProvider, request.app.state.token_provider).stats(),
+        "coalescing": cast(RequestCoalescer, request.app.state.coalescer).stats(),
+        "users": cast(UserProfiles, request.app.state.user_profiles).stats(),
+    }
+
+
 app = FastAPI(
     title="Polar OAuth2 App",
     debug=settings.server.debug,
@@ -437,5 +628,5 @@ app = FastAPI(
         "appName": "Polar OAuth Server",
     },
 )
-for r in (healthcheck_router, router):
+for r in (healthcheck_router, router, webhook_router):
     app.include_router(r)
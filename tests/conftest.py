@@ -85,8 +85,7 @@ async def test_client_id() -> UUID4:
 @pytest.fixture
 async def seeded_state(test_client_id: UUID4, application: FastAPI) -> str:
     state = str(uuid4())
-    conn = application.state.db
-    conn.execute(
+    await application.state.store.execute(
         "INSERT INTO tokens (client_id, session_id) VALUES (?, ?)",
         (test_client_id.hex, state),
     )
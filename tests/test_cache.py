@@ -0,0 +1,40 @@
+from src.core.cache import TTLCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cache_expires_entries_at_their_deadline() -> None:
+    clock = Clock()
+    cache = TTLCache[str, int](maxsize=4, ttl=60, clock=clock)
+    cache.set("short", 1, expires_at=clock.now + 10)
+    cache.set("long", 2, expires_at=clock.now + 3600)
+    cache.set("expired", 3, expires_at=clock.now - 1)
+
+    clock.now += 30
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    assert cache.get("expired") is None
+
+    # The cache TTL caps the deadline of the entry
+    clock.now += 60
+    assert cache.get("long") is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_cache_evicts_the_least_recently_used_entry() -> None:
+    cache = TTLCache[str, int](maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats().size == 2
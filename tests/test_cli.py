@@ -0,0 +1,172 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import respx
+from httpx import Response
+from typer import Typer
+from typer.testing import CliRunner
+
+EXERCISE = {
+    "polar_user": "123",
+    "start_time": "2023-01-01T10:00:00Z",
+    "start_time_utc_offset": 0,
+    "duration": "PT1H",
+    "distance": 5000,
+    "calories": 300,
+    "device": "Polar Vantage V2",
+    "has_route": False,
+    "has_manual_lap": False,
+    "sport": "RUNNING",
+}
+
+
+@pytest.fixture
+def token(tmp_path: Path) -> str:
+    path = tmp_path / "token.json"
+    path.write_text(json.dumps({"access_token": "token", "token_type": "bearer"}))
+    return str(path)
+
+
+@respx.mock
+def test_api_call_resolves_a_route_template(
+    cli: Typer, cli_runner: CliRunner, token: str
+):
+    route = respx.get("/v3/exercises/456", params={"zones": "true"}).mock(
+        return_value=Response(200, json=EXERCISE)
+    )
+
+    result = cli_runner.invoke(
+        cli,
+        [
+            "api",
+            "--token",
+            token,
+            "call",
+            "/v3/exercises/{exercise_id:str}",
+            "--arg",
+            "exercise_id=456",
+            "--param",
+            "zones=true",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert route.called
+    assert json.loads(result.output)["sport"] == "RUNNING"
+
+
+@respx.mock
+def test_api_call_sends_the_given_headers(
+    cli: Typer, cli_runner: CliRunner, token: str
+):
+    route = respx.get("/v3/exercises/456").mock(
+        return_value=Response(200, json=EXERCISE)
+    )
+
+    result = cli_runner.invoke(
+        cli,
+        [
+            "api",
+            "--token",
+            token,
+            "call",
+            "/v3/exercises/456",
+            "--header",
+            "X-Request-Id=abc",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    request = route.calls.last.request
+    assert request.headers["X-Request-Id"] == "abc"
+    # The headers of the route are kept
+    assert request.headers["Accept"] == "application/json"
+
+
+@respx.mock
+def test_api_still_takes_a_token_file_argument(
+    cli: Typer, cli_runner: CliRunner, token: str
+):
+    route = respx.get("/v3/exercises/456").mock(
+        return_value=Response(200, json=EXERCISE)
+    )
+
+    result = cli_runner.invoke(cli, ["api", token, "call", "/v3/exercises/456"])
+
+    assert result.exit_code == 0, result.output
+    assert route.calls.last.request.headers["Authorization"] == "Bearer token"
+
+    ambiguous = cli_runner.invoke(cli, ["api", token, "--user", "1", "call", "/"])
+    assert ambiguous.exit_code != 0
+
+
+@respx.mock
+def test_api_call_runs_a_batch_from_stdin(
+    cli: Typer, cli_runner: CliRunner, token: str
+):
+    respx.get("/v3/exercises/1").mock(return_value=Response(200, json=EXERCISE))
+    respx.get("/v3/exercises/2").mock(return_value=Response(404))
+    calls = [
+        json.dumps({"path": "/v3/exercises/1"}),
+        json.dumps({"path": "/v3/exercises/{exercise_id}", "args": {"exercise_id": 2}}),
+        "",
+        "not a call",
+    ]
+
+    result = cli_runner.invoke(
+        cli,
+        ["api", "--token", token, "call", "--batch", "-", "--concurrency", "2"],
+        input="\n".join(calls),
+    )
+
+    assert result.exit_code == 1
+    lines = sorted(
+        (json.loads(line) for line in result.output.splitlines()),
+        key=lambda line: line["index"],
+    )
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert lines[0]["result"]["sport"] == "RUNNING"
+    assert lines[1]["path"] == "/v3/exercises/2"
+    assert "404" in lines[1]["error"]
+    assert "Invalid call" in lines[2]["error"]
+
+
+@respx.mock
+def test_export_streams_exercises(
+    cli: Typer, cli_runner: CliRunner, token: str, tmp_path: Path
+):
+    exercises = [{**EXERCISE, "id": str(index)} for index in range(3)]
+    respx.get("/v3/exercises").mock(return_value=Response(200, json=exercises))
+    output = tmp_path / "exercises.ndjson"
+
+    result = cli_runner.invoke(
+        cli, ["api", "--token", token, "export", str(output), "--row-group-size", "2"]
+    )
+
+    assert result.exit_code == 0, result.output
+    lines = output.read_text().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["0", "1", "2"]
+
+    again = cli_runner.invoke(cli, ["api", "--token", token, "export", str(output)])
+    assert again.exit_code != 0
+
+
+def test_parquet_export_names_the_missing_extra(
+    cli: Typer,
+    cli_runner: CliRunner,
+    token: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    # A None entry makes the import fail, as if pyarrow wasn't installed
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    result = cli_runner.invoke(
+        cli, ["api", "--token", token, "export", str(tmp_path / "out.parquet")]
+    )
+
+    assert result.exit_code == 2
+    assert "polar-oauth-app[parquet]" in result.output
+    assert not (tmp_path / "out.parquet").exists()
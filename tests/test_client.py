@@ -1,12 +1,121 @@
+import asyncio
+import itertools
+import json
+import struct
+import time
+from collections.abc import AsyncGenerator, Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from functools import partial
+from multiprocessing import get_context
+
+import pytest
 import respx
-from httpx import Response
+from gpxpy.gpx import GPX
+from httpx import HTTPStatusError, Response
+from tcxreader.tcxreader import TCXExercise
 
+from src.clients.base.batch import gather_bounded
+from src.clients.base.caching import ResponseCache, ResponseCacheStats
+from src.clients.base.coalescing import CoalescerStats, RequestCoalescer
+from src.clients.base.streaming import JSONArrayParser
+from src.clients.base.throttling import RetryPolicy, TokenBucket
 from src.clients.polar.client import PolarClient
-from src.clients.polar.contexts import ListExercisesContext
-from src.clients.polar.models import Exercise
+from src.clients.polar.contexts import (
+    ExerciseContext,
+    ExerciseFormatContext,
+    ListExercisesContext,
+)
+from src.clients.polar.fit import FIT_EPOCH, FitDecoder, decode_fit
+from src.clients.polar.models import Exercise, ExerciseQueryParams
+from src.core.store import TokenStore
+
+EXERCISE = {
+    "polar_user": "123",
+    "start_time": "2023-01-01T10:00:00Z",
+    "start_time_utc_offset": 0,
+    "duration": "PT1H",
+    "distance": 5000,
+    "calories": 300,
+    "device": "Polar Vantage V2",
+    "has_route": True,
+    "has_manual_lap": False,
+    "sport": "RUNNING",
+}
+SPORTS = ["RUNNING", "CYCLING", "SWIMMING"]
+GPX_DOCUMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="Polar" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="60.1699" lon="24.9384"><time>2023-01-01T10:00:00Z</time></trkpt>
+    <trkpt lat="60.1700" lon="24.9390"><time>2023-01-01T10:00:01Z</time></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
 
+def encode_fit(heart_rates: list[int], start: int = 1_000_000_000) -> bytes:
+    """Encodes one record per second, every other one with a compressed timestamp."""
+    fields = b"".join(
+        bytes(field)
+        for field in [(0, 4, 0x85), (1, 4, 0x85), (3, 1, 0x02), (5, 4, 0x86)]
+    )
+    # The enhanced speed supersedes the speed
+    fields += bytes([6, 2, 0x84, 73, 4, 0x86])
+    messages = [
+        struct.pack("<BBBHB", 0x40, 0, 0, 20, 7) + bytes([253, 4, 0x86]) + fields,
+        struct.pack("<BBBHB", 0x41, 0, 0, 20, 6) + fields,
+    ]
+    latitude = longitude = int(60 * 2**31 / 180)
+    for second, heart_rate in enumerate(heart_rates):
+        timestamp = start + second
+        values = struct.pack(
+            "<iiBIHI", latitude, longitude, heart_rate, second * 300, 1000, 3000
+        )
+        if second % 2:
+            messages.append(bytes([0x80 | 1 << 5 | timestamp & 0x1F]) + values)
+        else:
+            messages.append(b"\x00" + struct.pack("<I", timestamp) + values)
+    data = b"".join(messages)
+    header = struct.pack("<BBHI4sH", 14, 0x20, 2100, len(data), b".FIT", 0)
+    return header + data + b"\x00\x00"
 
-@respx.mock(assert_all_mocked=False)
+
+FIT_HEART_RATES = [120, 0xFF, *range(121, 160)]
+FIT_DOCUMENT = encode_fit(FIT_HEART_RATES)
+TCX_DOCUMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<TrainingCenterDatabase
+  xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
+  <Activities><Activity Sport="Running">
+    <Id>2023-01-01T10:00:00.000Z</Id>
+    <Lap StartTime="2023-01-01T10:00:00.000Z">
+      <TotalTimeSeconds>1.0</TotalTimeSeconds>
+      <DistanceMeters>5.0</DistanceMeters>
+      <Calories>1</Calories>
+      <Track>
+        <Trackpoint>
+          <Time>2023-01-01T10:00:00.000Z</Time>
+          <Position>
+            <LatitudeDegrees>60.1699</LatitudeDegrees>
+            <LongitudeDegrees>24.9384</LongitudeDegrees>
+          </Position>
+          <HeartRateBpm><Value>120</Value></HeartRateBpm>
+        </Trackpoint>
+        <Trackpoint>
+          <Time>2023-01-01T10:00:01.000Z</Time>
+          <Position>
+            <LatitudeDegrees>60.1700</LatitudeDegrees>
+            <LongitudeDegrees>24.9390</LongitudeDegrees>
+          </Position>
+          <HeartRateBpm><Value>124</Value></HeartRateBpm>
+        </Trackpoint>
+      </Track>
+    </Lap>
+  </Activity></Activities>
+</TrainingCenterDatabase>
+"""
+
+
+@respx.mock
 async def test_list_exercises_statically(test_polar_client: PolarClient):
     """Tests the statically defined `list_exercises` method."""
     mock_response = [
@@ -38,6 +147,482 @@ async def test_list_exercises_statically(test_polar_client: PolarClient):
     assert exercises[0].sport == "RUNNING"
 
 
+@respx.mock
+async def test_get_exercise_substitutes_path_parameters(
+    test_polar_client: PolarClient,
+):
+    """Tests the path parameters of a route are filled from the context."""
+    mock_response = {
+        "polar_user": "123",
+        "start_time": "2023-01-02T12:00:00Z",
+        "start_time_utc_offset": 0,
+        "duration": "PT2H",
+        "distance": 10000,
+        "calories": 600,
+        "device": "Polar Vantage V2",
+        "has_route": False,
+        "has_manual_lap": False,
+        "sport": "CYCLING",
+    }
+    get_exercise_route = respx.get("/v3/exercises/456", params={"zones": "true"}).mock(
+        return_value=Response(200, json=mock_response)
+    )
+
+    exercise = await test_polar_client.get_exercise(
+        ExerciseContext(exercise_id="456", params=ExerciseQueryParams(zones=True))
+    )
+
+    assert get_exercise_route.called
+    assert isinstance(exercise, Exercise)
+    assert exercise.sport == "CYCLING"
+
+
+async def test_get_exercise_requires_a_context(test_polar_client: PolarClient):
+    with pytest.raises(TypeError):
+        await test_polar_client.get_exercise()
+
+
+def test_route_index_resolves_concrete_paths(test_polar_client: PolarClient):
+    match = test_polar_client.resolve("GET", "/v3/exercises/abc/gpx")
+    assert match.template == "/v3/exercises/{exercise_id:str}/{format:str}"
+    assert match.params == {"exercise_id": "abc", "format": "gpx"}
+
+    match = test_polar_client.resolve("PUT", "/v3/users/42/exercise-transactions/7")
+    assert match.params == {
+        "user_id": 42,
+        "transactions": "exercise-transactions",
+        "transaction_id": 7,
+    }
+    assert match.command is test_polar_client.discover(
+        "PUT", "/v3/users/{user_id:int}/{transactions:str}/{transaction_id:int}"
+    )
+
+    with pytest.raises(ValueError):
+        test_polar_client.resolve("POST", "/v3/users/me/exercise-transactions")
+    with pytest.raises(ValueError):
+        test_polar_client.resolve("DELETE", "/v3/exercises/abc")
+
+
+def test_route_index_completes_prefixes():
+    routes = PolarClient.routes
+    assert routes.complete("/v3/exe") == [
+        "/v3/exercises",
+        "/v3/exercises/{exercise_id:str}",
+        "/v3/exercises/{exercise_id:str}/{format:str}",
+    ]
+    assert routes.complete("/v3/exercises/abc/") == ["/v3/exercises/abc/{format:str}"]
+    assert routes.complete("/v3/exercises/ab") == [
+        "/v3/exercises/ab",
+        "/v3/exercises/ab/{format:str}",
+    ]
+
+
+@respx.mock
+async def test_client_calls_concrete_paths(test_polar_client: PolarClient):
+    route = respx.get("/v3/exercises/456", params={"zones": "true"}).mock(
+        return_value=Response(200, json=EXERCISE)
+    )
+
+    exercise = await test_polar_client(
+        "GET", "/v3/exercises/456", params={"zones": True}
+    )
+
+    assert route.called
+    assert exercise == Exercise.model_validate(EXERCISE)
+
+
+@respx.mock
+async def test_client_decodes_encoded_path_segments(test_polar_client: PolarClient):
+    route = respx.get(url__regex=r"/v3/exercises/a%20b%2Fc$").mock(
+        return_value=Response(200, json=EXERCISE)
+    )
+
+    await test_polar_client("GET", "/v3/exercises/a%20b%2Fc")
+
+    assert route.called
+    match = test_polar_client.resolve("GET", "/v3/exercises/a%20b%2Fc")
+    assert match.params == {"exercise_id": "a b/c"}
+
+
+@respx.mock
+async def test_iter_exercises_streams_items(test_polar_client: PolarClient):
+    """Tests exercises are validated one at a time from a streamed body."""
+    body = json.dumps([{**EXERCISE, "sport": sport} for sport in SPORTS]).encode()
+
+    async def chunks():
+        for start in range(0, len(body), 7):
+            yield body[start : start + 7]
+
+    respx.get("/v3/exercises").mock(return_value=Response(200, content=chunks()))
+
+    sports = [
+        exercise.sport
+        async for exercise in test_polar_client.iter_exercises(ListExercisesContext())
+    ]
+
+    assert sports == SPORTS
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        "[]",
+        ' [ 1 , -2.5e3, "a,]", {"b": [true, null]}, [] ] ',
+        r'["q\"]\\", {"k\"": "}{"}, "\u005d"]',
+    ],
+)
+def test_json_array_parser_accepts_any_chunking(document: str):
+    expected = json.loads(document)
+    for size in range(1, len(document) + 1):
+        parser = JSONArrayParser()
+        items = []
+        for start in range(0, len(document), size):
+            items.extend(parser.feed(document[start : start + size]))
+        items.extend(parser.feed("", final=True))
+        assert items == expected, size
+
+
+def test_json_array_parser_decodes_an_element_once():
+    """Tests a large element is scanned chunk by chunk, not re-parsed each time."""
+    element = {"samples": list(range(20_000)), "text": "x" * 20_000}
+    document = json.dumps([element, 1])
+    parser = JSONArrayParser()
+    decoded: list[str] = []
+    decode = parser._decoder.decode
+    parser._decoder.decode = lambda text: decoded.append(text) or decode(text)
+
+    items = []
+    for start in range(0, len(document), 64):
+        items.extend(parser.feed(document[start : start + 64]))
+    items.extend(parser.feed("", final=True))
+
+    assert items == [element, 1]
+    assert len(decoded) == 2
+
+
+@pytest.mark.parametrize(
+    "document", ["", "{}", "[1, 2", "[1 2]", "[1] 2", '["a', "[[1]", "[1x]"]
+)
+def test_json_array_parser_rejects_invalid_documents(document: str):
+    with pytest.raises(ValueError):
+        JSONArrayParser().feed(document, final=True)
+
+
+@respx.mock
+async def test_get_exercises_collects_errors(test_polar_client: PolarClient):
+    """Tests a failed exercise doesn't cancel the rest of the batch."""
+    for index, sport in enumerate(SPORTS):
+        respx.get(f"/v3/exercises/{index}").mock(
+            return_value=Response(200, json={**EXERCISE, "sport": sport})
+        )
+    respx.get("/v3/exercises/missing").mock(return_value=Response(404))
+    contexts = [ExerciseContext(exercise_id=str(i)) for i in range(len(SPORTS))]
+    contexts.insert(1, ExerciseContext(exercise_id="missing"))
+
+    results = [
+        result
+        async for result in test_polar_client.get_exercises(
+            contexts, concurrency=2, ordered=True
+        )
+    ]
+
+    assert [result.context for result in results] == contexts
+    assert [result.ok for result in results] == [True, False, True, True]
+    assert [result.result.sport for result in results if result.ok] == SPORTS
+
+
+@respx.mock
+@pytest.mark.parametrize(
+    "executor_factory",
+    [
+        partial(ThreadPoolExecutor, max_workers=1),
+        partial(ProcessPoolExecutor, max_workers=1, mp_context=get_context("spawn")),
+    ],
+    ids=["threads", "processes"],
+)
+async def test_get_exercise_parses_formats_in_an_executor(
+    test_polar_client: PolarClient, executor_factory: Callable[[], Executor]
+):
+    """Tests exports are parsed off the event loop, in a thread or a process."""
+    respx.get("/v3/exercises/abc/gpx").mock(
+        return_value=Response(
+            200,
+            content=GPX_DOCUMENT,
+            headers={"Content-Type": "application/gpx+xml"},
+        )
+    )
+    respx.get("/v3/exercises/abc/tcx").mock(
+        return_value=Response(
+            200,
+            content=TCX_DOCUMENT,
+            headers={"Content-Type": "application/vnd.garmin.tcx+xml"},
+        )
+    )
+
+    with executor_factory() as executor:
+        client = PolarClient(test_polar_client.transport, parser_executor=executor)
+        gpx, tcx = await asyncio.gather(
+            client.get_exercise(ExerciseFormatContext(exercise_id="abc", format="gpx")),
+            client.get_exercise(ExerciseFormatContext(exercise_id="abc", format="tcx")),
+        )
+
+    assert isinstance(gpx, GPX)
+    assert len(gpx.tracks[0].segments[0].points) == 2
+    assert isinstance(tcx, TCXExercise)
+    assert [point.hr_value for point in tcx.trackpoints] == [120, 124]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, len(FIT_DOCUMENT)])
+def test_fit_decoder_accepts_any_chunking(chunk_size: int):
+    decoder = FitDecoder()
+    records = []
+    view = memoryview(FIT_DOCUMENT)
+    for start in range(0, len(view), chunk_size):
+        records += decoder.feed(view[start : start + chunk_size])
+    records += decoder.feed(b"", final=True)
+
+    assert [record.heart_rate for record in records] == [
+        None if heart_rate == 0xFF else heart_rate for heart_rate in FIT_HEART_RATES
+    ]
+    started = datetime.fromtimestamp(1_000_000_000 + FIT_EPOCH, UTC)
+    assert [record.timestamp for record in records] == [
+        started + timedelta(seconds=second) for second in range(len(records))
+    ]
+    assert records[-1].distance == (len(records) - 1) * 3
+    assert records[0].speed == 3.0
+    assert records[0].latitude == pytest.approx(60)
+
+
+@pytest.mark.parametrize(
+    "document", [b"", b"not a fit file", FIT_DOCUMENT[:-1], FIT_DOCUMENT[:30]]
+)
+def test_fit_decoder_rejects_invalid_documents(document: bytes):
+    with pytest.raises(ValueError):
+        decode_fit(document)
+
+
+@respx.mock
+async def test_fit_exports_are_decoded_in_memory(test_polar_client: PolarClient):
+    """Tests FIT exports are decoded whole or while they stream."""
+
+    async def chunks():
+        for start in range(0, len(FIT_DOCUMENT), 100):
+            yield FIT_DOCUMENT[start : start + 100]
+
+    respx.get("/v3/exercises/abc/fit").mock(
+        side_effect=[
+            Response(
+                200,
+                content=FIT_DOCUMENT,
+                headers={"Content-Type": "application/octet-stream"},
+            ),
+            Response(200, content=chunks()),
+        ]
+    )
+    context = ExerciseContext(exercise_id="abc")
+
+    records = await test_polar_client.get_exercise(
+        ExerciseFormatContext(exercise_id="abc", format="fit")
+    )
+    streamed = [
+        record async for record in test_polar_client.iter_exercise_records(context)
+    ]
+
+    assert len(records) == len(FIT_HEART_RATES)
+    assert streamed == records
+
+
+@pytest.fixture
+async def response_store() -> AsyncGenerator[TokenStore]:
+    async with TokenStore(":memory:") as store:
+        yield store
+
+
+@respx.mock
+async def test_responses_are_served_from_cache(
+    test_polar_client: PolarClient, response_store: TokenStore
+):
+    route = respx.get(url__regex=r"/v3/exercises/\w+$").mock(
+        return_value=Response(200, json=EXERCISE)
+    )
+    cache = ResponseCache(response_store)
+    client = PolarClient(test_polar_client.transport, response_cache=cache)
+
+    for exercise_id in ["abc", "abc", "def"]:
+        exercise = await client.get_exercise(ExerciseContext(exercise_id=exercise_id))
+        assert exercise == Exercise.model_validate(EXERCISE)
+
+    assert route.call_count == 2
+    assert cache.stats() == ResponseCacheStats(hits=1, misses=2, revalidations=0)
+
+
+@respx.mock
+async def test_stale_responses_are_revalidated(
+    test_polar_client: PolarClient, response_store: TokenStore
+):
+    route = respx.get("/v3/exercises/abc").mock(
+        side_effect=[
+            Response(200, json=EXERCISE, headers={"ETag": '"v1"'}),
+            Response(304),
+        ]
+    )
+    cache = ResponseCache(response_store, ttl=0)
+    client = PolarClient(test_polar_client.transport, response_cache=cache)
+
+    first = await client.get_exercise(ExerciseContext(exercise_id="abc"))
+    second = await client.get_exercise(ExerciseContext(exercise_id="abc"))
+
+    assert first == second
+    assert route.calls[1].request.headers["If-None-Match"] == '"v1"'
+    assert cache.stats().revalidations == 1
+
+
+@respx.mock
+async def test_cache_evicts_least_recently_used_responses(
+    test_polar_client: PolarClient, response_store: TokenStore
+):
+    route = respx.get(url__regex=r"/v3/exercises/\w+$").mock(
+        return_value=Response(200, json=EXERCISE)
+    )
+    size = len(Response(200, json=EXERCISE).content)
+    ticks = itertools.count()
+    cache = ResponseCache(
+        response_store, ttl=None, max_size=2 * size, clock=lambda: next(ticks)
+    )
+    client = PolarClient(test_polar_client.transport, response_cache=cache)
+
+    for exercise_id in ["a", "b", "a", "c", "a", "b"]:
+        await client.get_exercise(ExerciseContext(exercise_id=exercise_id))
+
+    # "b" was the least recently used when "c" came in
+    assert [call.request.url.path for call in route.calls] == [
+        "/v3/exercises/a",
+        "/v3/exercises/b",
+        "/v3/exercises/c",
+        "/v3/exercises/b",
+    ]
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+async def test_gather_bounded_limits_concurrency(ordered: bool):
+    in_flight = peak = 0
+
+    async def call(delay: float) -> float:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(delay)
+        in_flight -= 1
+        return delay
+
+    delays = [0.005, 0.001, 0.003, 0.0, 0.002, 0.004] * 3
+    results = [
+        result
+        async for result in gather_bounded(call, delays, concurrency=3, ordered=ordered)
+    ]
+
+    assert peak == 3
+    assert sorted(result.result for result in results) == sorted(delays)
+    if ordered:
+        assert [result.index for result in results] == list(range(len(delays)))
+
+
+@respx.mock
+async def test_throttled_requests_are_retried(test_polar_client: PolarClient):
+    """Tests a 429 is retried after its Retry-After delay."""
+    route = respx.get("/v3/exercises").mock(
+        side_effect=[
+            Response(429, headers={"Retry-After": "0"}),
+            Response(200, json=[EXERCISE]),
+        ]
+    )
+    limiter = TokenBucket(rate=1000)
+    client = PolarClient(test_polar_client.transport, rate_limiter=limiter)
+
+    exercises = await client.list_exercises(ListExercisesContext())
+
+    assert route.call_count == 2
+    assert len(exercises) == 1
+
+
+@respx.mock
+async def test_failing_requests_give_up_after_max_attempts(
+    test_polar_client: PolarClient,
+):
+    route = respx.get("/v3/exercises").mock(return_value=Response(503))
+    client = PolarClient(
+        test_polar_client.transport,
+        retry_policy=RetryPolicy(max_attempts=3, backoff=0),
+    )
+
+    with pytest.raises(HTTPStatusError):
+        await client.list_exercises(ListExercisesContext())
+
+    assert route.call_count == 3
+
+
+@respx.mock
+async def test_identical_requests_in_flight_are_coalesced(
+    test_polar_client: PolarClient,
+):
+    route = respx.get(path__regex=r"^/v3/exercises/\w+$").mock(
+        return_value=Response(200, json=EXERCISE)
+    )
+    client = PolarClient(test_polar_client.transport)
+
+    exercises = await asyncio.gather(
+        *(client.get_exercise(ExerciseContext(exercise_id="456")) for _ in range(5)),
+        client.get_exercise(ExerciseContext(exercise_id="789")),
+    )
+
+    assert route.call_count == 2
+    assert all(exercise == exercises[0] for exercise in exercises)
+    assert client.coalescer.stats() == CoalescerStats(calls=2, coalesced=4, in_flight=0)
+    # Nothing outlives the request
+    await client.get_exercise(ExerciseContext(exercise_id="456"))
+    assert route.call_count == 3
+
+
+async def test_coalesced_call_outlives_a_cancelled_caller():
+    coalescer = RequestCoalescer()
+    release = asyncio.Event()
+
+    async def call() -> str:
+        await release.wait()
+        return "response"
+
+    first = asyncio.create_task(coalescer.run("key", call))
+    second = asyncio.create_task(coalescer.run("key", call))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == "response"
+    assert first.cancelled()
+    assert coalescer.stats() == CoalescerStats(calls=1, coalesced=1, in_flight=0)
+
+
+def test_retry_policy_spares_non_idempotent_requests():
+    policy = RetryPolicy()
+    assert policy.delay("POST", 1, Response(503)) is None
+    assert policy.delay("POST", 1, Response(429, headers={"Retry-After": "2"})) == 2
+    assert policy.delay("GET", 1, Response(404)) is None
+    assert policy.delay("GET", 1, Response(429, headers={"Retry-After": "600"})) is None
+
+
+async def test_token_bucket_paces_callers():
+    bucket = TokenBucket(rate=200, capacity=1)
+    started = time.perf_counter()
+    await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+    assert time.perf_counter() - started >= 4 / 200
+
+    bucket.defer(0.05)
+    started = time.perf_counter()
+    await bucket.acquire()
+    assert time.perf_counter() - started >= 0.04
+
+
 # @respx.mock
 # async def test_get_exercise_dynamically(test_polar_client: PolarClient):
 #     """
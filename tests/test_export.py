@@ -0,0 +1,121 @@
+import csv
+import json
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+
+from src.clients.polar.models import Exercise
+from src.core.export import (
+    CSVWriter,
+    ExportReport,
+    NDJSONWriter,
+    ParquetWriter,
+    export_exercises,
+    sample_columns,
+)
+
+
+def build_exercise(index: int) -> Exercise:
+    return Exercise.model_validate(
+        {
+            "id": f"ex{index}",
+            "polar_user": "123",
+            "start_time": f"2023-01-{index + 1:02d}T10:00:00Z",
+            "start_time_utc_offset": 0,
+            "duration": "PT1H",
+            "distance": 1000 * index,
+            "calories": 300,
+            "device": "Polar Vantage V2",
+            "has_route": False,
+            "has_manual_lap": False,
+            "sport": "RUNNING",
+            "heart_rate": {"average": 120 + index, "maximum": 160},
+            "samples": [
+                {"recording-rate": 1, "sample-type": "0", "data": "100,NULL,102"}
+            ],
+        }
+    )
+
+
+async def listing(count: int) -> AsyncIterator[Exercise]:
+    for index in range(count):
+        yield build_exercise(index)
+
+
+async def test_ndjson_export_resumes_after_the_last_exercise(tmp_path: Path):
+    path = tmp_path / "exercises.ndjson"
+
+    report = await export_exercises(listing(3), NDJSONWriter(path), row_group_size=2)
+    assert report == ExportReport(written=3, row_groups=2)
+
+    # An export interrupted while writing a row
+    with path.open("a") as file:
+        file.write('{"id":"ex3","polar_')
+
+    report = await export_exercises(
+        listing(5), NDJSONWriter(path), row_group_size=2, resume=True
+    )
+    assert report == ExportReport(written=2, skipped=3, row_groups=1)
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [row["id"] for row in rows] == ["ex0", "ex1", "ex2", "ex3", "ex4"]
+    assert rows[4]["heart_rate_average"] == 124
+    assert "samples_heart_rate" not in rows[0]
+
+
+async def test_export_drops_exercises_without_an_id(tmp_path: Path):
+    path = tmp_path / "exercises.ndjson"
+
+    async def unidentified(count: int) -> AsyncIterator[Exercise]:
+        async for exercise in listing(count):
+            if exercise.id in ("ex1", "ex3"):
+                exercise = exercise.model_copy(update={"id": None})
+            yield exercise
+
+    report = await export_exercises(unidentified(4), NDJSONWriter(path))
+    assert report == ExportReport(written=2, dropped=2, row_groups=1)
+
+    # Resumed after the last exercise with an ID, rather than from the start
+    report = await export_exercises(unidentified(6), NDJSONWriter(path), resume=True)
+    assert report == ExportReport(written=2, skipped=3, dropped=1, row_groups=1)
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [row["id"] for row in rows] == ["ex0", "ex2", "ex4", "ex5"]
+
+
+async def test_csv_export_encodes_samples(tmp_path: Path):
+    path = tmp_path / "exercises.csv"
+    columns = ("id", "distance", *sample_columns())
+
+    await export_exercises(
+        listing(2), CSVWriter(path, columns), samples=True, row_group_size=1
+    )
+    writer = CSVWriter(path, columns)
+    assert writer.last_id() == "ex1"
+
+    with path.open(newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["id"] for row in rows] == ["ex0", "ex1"]
+    assert json.loads(rows[1]["samples_heart_rate"]) == [100, None, 102]
+    assert rows[1]["samples_heart_rate_rate"] == "1.0"
+    assert rows[1]["samples_speed"] == ""
+
+
+async def test_parquet_export_writes_row_groups(tmp_path: Path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "exercises.parquet"
+
+    await export_exercises(
+        listing(3), ParquetWriter(path, samples=True), samples=True, row_group_size=2
+    )
+    await export_exercises(
+        listing(4), ParquetWriter(path, samples=True), samples=True, resume=True
+    )
+
+    parts = sorted(path.iterdir())
+    assert len(parts) == 2
+    assert pq.ParquetFile(parts[0]).num_row_groups == 2
+    table = pq.read_table(path)
+    assert table.column("id").to_pylist() == ["ex0", "ex1", "ex2", "ex3"]
+    assert table.column("samples_heart_rate")[0].as_py() == [100, None, 102]
@@ -0,0 +1,82 @@
+import math
+
+import pytest
+
+from src.clients.polar.models import Exercise
+from src.clients.polar.samples import RoutePoint, Sample, SampleSeries, SampleType
+
+EXERCISE = {
+    "polar_user": "123",
+    "start_time": "2023-01-01T10:00:00Z",
+    "start_time_utc_offset": 0,
+    "duration": "PT10S",
+    "distance": 50,
+    "calories": 3,
+    "device": "Polar Vantage V2",
+    "has_route": True,
+    "has_manual_lap": False,
+    "sport": "RUNNING",
+    "heart_rate": {
+        "average": 110,
+        "maximum": 130,
+        "zones": [
+            {
+                "index": 1,
+                "name": "LIGHT",
+                "in_zone": 4,
+                "min_heart_rate": 100,
+                "max_heart_rate": 115,
+            },
+            {
+                "index": 2,
+                "name": "MODERATE",
+                "in_zone": 4,
+                "min_heart_rate": 115,
+                "max_heart_rate": 130,
+            },
+        ],
+    },
+    "samples": [
+        {"recording-rate": 2, "sample-type": "0", "data": "90,100,NULL,120,130"},
+        {"recording-rate": 1, "sample-type": "1", "data": "10.5,11,11.5"},
+    ],
+    "route": [
+        {"latitude": 60.0, "longitude": 24.0, "time": "PT0S", "satellites": 7},
+        {"latitude": 60.001, "longitude": 24.0, "time": "PT1.5S", "altitude": 12},
+    ],
+}
+
+
+def test_exercise_samples_are_columnar():
+    exercise = Exercise.model_validate(EXERCISE)
+
+    heart_rate = exercise.series(SampleType.HEART_RATE)
+    assert heart_rate is not None
+    assert heart_rate.values.typecode == "d"
+    assert len(heart_rate) == 5
+    assert heart_rate[1] == Sample(offset=2, value=100)
+    assert heart_rate[-3] == Sample(offset=4, value=None)
+    assert [sample.offset for sample in heart_rate[3:]] == [0, 2]
+    assert exercise.series(SampleType.CADENCE) is None
+
+    assert exercise.route is not None
+    assert exercise.route[1] == RoutePoint(
+        offset=1.5, latitude=60.001, longitude=24.0, altitude=12
+    )
+    assert exercise.route[0].satellites == 7
+    assert exercise.route.distance() == pytest.approx(111.2, abs=0.1)
+
+    assert Exercise.model_validate(exercise.model_dump()) == exercise
+
+
+def test_sample_aggregates():
+    exercise = Exercise.model_validate(EXERCISE)
+    heart_rate = exercise.series(SampleType.HEART_RATE)
+
+    assert heart_rate.mean() == 110
+    assert list(heart_rate.rolling_mean(4)) == [90, 95, 100, 120, 125]
+    assert exercise.zone_time() == {1: 2, 2: 4}
+
+    gaps = SampleSeries.parse(SampleType.POWER, 1, "NULL,NULL,200")
+    assert math.isnan(gaps.rolling_mean(2)[1])
+    assert gaps.mean() == 200
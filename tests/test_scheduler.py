@@ -0,0 +1,146 @@
+import time
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import pytest
+import respx
+from authlib.integrations.httpx_client import AsyncOAuth2Client
+from httpx import Response
+
+from src.clients.polar.client import PolarClient
+from src.core.migrations import apply_migrations
+from src.core.scheduler import ScheduleReport, SyncJob, SyncScheduler
+from src.core.settings import ApplicationSettings
+from src.core.store import TokenStore
+from src.core.tokens import Token, TokenProvider
+
+
+@pytest.fixture
+async def scheduler_store(tmp_path: Path) -> AsyncGenerator[TokenStore]:
+    async with TokenStore(tmp_path / "scheduler.db") as store:
+        await apply_migrations(store)
+        await store.run(
+            lambda conn: conn.executemany(
+                """
+                INSERT INTO tokens
+                    (client_id, session_id, user_id, access_token, token_type,
+                    expires_at)
+                VALUES ('client', ?, ?, ?, 'bearer', datetime('now', ?))
+                """,
+                [
+                    ("a", 1, "expiring", "+1 minute"),
+                    ("b", 2, "stale", "+1 day"),
+                    ("c", 3, "fresh", "+1 day"),
+                    ("d", 4, "never-synced", "+1 day"),
+                ],
+            )
+        )
+        await store.execute(
+            """
+            INSERT INTO sync_users (polar_user_id, synced_at) VALUES
+                (2, datetime('now', '-2 days')),
+                (3, datetime('now', '-1 hour'))
+            """
+        )
+        yield store
+
+
+def build_scheduler(
+    store: TokenStore,
+    settings: ApplicationSettings,
+    clients: list[str],
+    window: float = 60.0,
+    tokens: TokenProvider | None = None,
+) -> SyncScheduler:
+    def client_factory(job: SyncJob, token: Token) -> PolarClient:
+        clients.append(token["access_token"])
+        return PolarClient(
+            AsyncOAuth2Client(base_url=str(settings.oauth.accesslink_url), token=token)
+        )
+
+    return SyncScheduler(
+        store,
+        tokens or TokenProvider(store, None, margin=300.0, lease=30.0),
+        client_factory,
+        interval=60.0,
+        window=window,
+        concurrency=1,
+        user_concurrency=2,
+        expiry_margin=300.0,
+    )
+
+
+@respx.mock
+async def test_scheduler_syncs_the_stalest_users_first(
+    scheduler_store: TokenStore, settings: ApplicationSettings
+):
+    transactions = respx.post(path__regex=r"^/v3/users/\d+/[a-z-]+$").mock(
+        return_value=Response(204)
+    )
+    clients: list[str] = []
+    scheduler = build_scheduler(scheduler_store, settings, clients)
+
+    report = await scheduler.run()
+
+    assert report == ScheduleReport(users=4, synced=3, deferred=1)
+    assert clients == ["never-synced", "stale", "fresh"]
+    assert transactions.call_count == 9
+    # The deferred user comes first, the synced ones were synced in the same run
+    jobs = await scheduler.jobs()
+    assert jobs[0].polar_user_id == 1
+    assert sorted(job.polar_user_id for job in jobs[1:]) == [2, 3, 4]
+
+
+@respx.mock
+async def test_scheduler_defers_users_beyond_its_window(
+    scheduler_store: TokenStore, settings: ApplicationSettings
+):
+    respx.post(path__regex=r"^/v3/users/4/[a-z-]+$").mock(return_value=Response(204))
+    respx.post(path__regex=r"^/v3/users/2/[a-z-]+$").mock(return_value=Response(403))
+    clients: list[str] = []
+    now = time.time()
+    # The expiring user is admitted first, and deferred by the provider
+    ticks = iter([now, now, now, now + 1, now + 2])
+    scheduler = build_scheduler(scheduler_store, settings, clients, window=2.0)
+    scheduler.clock = lambda: next(ticks)
+
+    report = await scheduler.run()
+
+    assert report == ScheduleReport(users=4, synced=1, failed=1, deferred=2)
+    assert clients == ["never-synced", "stale"]
+    row = await scheduler_store.fetchone(
+        "SELECT last_error FROM sync_users WHERE polar_user_id = 2"
+    )
+    assert "403" in row["last_error"]
+
+
+@respx.mock
+async def test_scheduler_syncs_users_with_a_refreshed_token(
+    scheduler_store: TokenStore, settings: ApplicationSettings
+):
+    await scheduler_store.execute(
+        """
+        INSERT INTO tokens
+            (client_id, session_id, user_id, access_token, token_type,
+            refresh_token, expires_at)
+        VALUES
+            ('client', 'e', 5, 'expired', 'bearer', 'refresh', datetime('now', '-1 hour'))
+        """  # noqa: E501
+    )
+    respx.post(path__regex=r"^/v3/users/\d+/[a-z-]+$").mock(return_value=Response(204))
+    refreshed: list[Token] = []
+
+    async def refresh(token: Token) -> Token:
+        refreshed.append(token)
+        return {"access_token": "refreshed", "token_type": "Bearer", "expires_in": 3600}
+
+    clients: list[str] = []
+    tokens = TokenProvider(scheduler_store, refresh, margin=300.0, lease=30.0)
+    scheduler = build_scheduler(scheduler_store, settings, clients, tokens=tokens)
+
+    report = await scheduler.run()
+
+    # Only the expiring token, which can't be refreshed, is left alone
+    assert report == ScheduleReport(users=5, synced=4, deferred=1)
+    assert clients == ["never-synced", "refreshed", "stale", "fresh"]
+    assert [token["access_token"] for token in refreshed] == ["expired"]
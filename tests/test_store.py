@@ -0,0 +1,137 @@
+import asyncio
+import threading
+from functools import partial
+from pathlib import Path
+
+from src.core.migrations import MIGRATIONS, apply_migrations, migrate
+from src.core.store import TokenStore
+from src.core.sweeper import SessionSweeper, SweepReport
+
+
+async def test_store_runs_queries_off_the_event_loop(tmp_path: Path) -> None:
+    async with TokenStore(tmp_path / "tokens.db", pool_size=2) as store:
+        thread_name = await store.run(lambda _: threading.current_thread().name)
+        assert thread_name.startswith("token-store")
+        assert thread_name != threading.current_thread().name
+
+
+async def test_store_serves_concurrent_queries(tmp_path: Path) -> None:
+    async with TokenStore(tmp_path / "tokens.db", pool_size=4) as store:
+        await store.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+        await asyncio.gather(
+            *(
+                store.execute("INSERT INTO items (id) VALUES (?)", (i,))
+                for i in range(32)
+            )
+        )
+        row = await store.fetchone("SELECT count(*) AS total FROM items")
+        assert row is not None
+        assert row["total"] == 32
+
+
+async def test_memory_store_shares_a_single_connection() -> None:
+    async with TokenStore(":memory:", pool_size=4) as store:
+        assert store.pool_size == 1
+        await store.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+        assert await store.fetchall("SELECT id FROM items") == []
+
+
+async def test_migrations_are_versioned(tmp_path: Path) -> None:
+    async with TokenStore(tmp_path / "tokens.db") as store:
+        assert await apply_migrations(store) == len(MIGRATIONS)
+        # Re-running is a no-op
+        assert await apply_migrations(store) == len(MIGRATIONS)
+        row = await store.fetchone("PRAGMA user_version")
+        assert row is not None
+        assert row[0] == len(MIGRATIONS)
+
+
+async def test_migrations_upgrade_an_unversioned_schema(tmp_path: Path) -> None:
+    async with TokenStore(tmp_path / "tokens.db") as store:
+        await store.run(partial(migrate, target=1))
+        for client_id in ("first", "second"):
+            await store.execute(
+                "INSERT INTO tokens (client_id, session_id) VALUES (?, ?)",
+                (client_id, "state"),
+            )
+
+        await apply_migrations(store)
+
+        rows = await store.fetchall("SELECT client_id FROM tokens")
+        assert [row["client_id"] for row in rows] == ["second"]
+
+
+async def test_token_lookups_use_indexes(tmp_path: Path) -> None:
+    async with TokenStore(tmp_path / "tokens.db") as store:
+        await apply_migrations(store)
+        for query, parameters in (
+            ("SELECT client_id FROM tokens WHERE session_id = ?", ("state",)),
+            ("SELECT user_id FROM tokens WHERE code = ?", ("code",)),
+            (
+                "SELECT user_id FROM tokens WHERE access_token = ? AND token_type = ?",
+                ("token", "bearer"),
+            ),
+            (
+                "SELECT id FROM users WHERE client_id = ? AND member_id = ?",
+                ("client", 1),
+            ),
+        ):
+            plan = await store.fetchall(f"EXPLAIN QUERY PLAN {query}", parameters)
+            assert all("USING" in row["detail"] for row in plan), query
+
+
+async def test_store_applies_pragmas_on_connect(tmp_path: Path) -> None:
+    store = TokenStore(
+        tmp_path / "tokens.db",
+        pool_size=2,
+        pragmas={"journal_mode": "WAL", "synchronous": "NORMAL"},
+        statement_cache_size=16,
+    )
+    async with store:
+        journal_mode = await store.fetchone("PRAGMA journal_mode")
+        synchronous = await store.fetchone("PRAGMA synchronous")
+        assert journal_mode is not None and journal_mode[0] == "wal"
+        # NORMAL
+        assert synchronous is not None and synchronous[0] == 1
+
+
+async def test_sweeper_reclaims_stale_rows_in_batches(tmp_path: Path) -> None:
+    async with TokenStore(tmp_path / "tokens.db") as store:
+        await apply_migrations(store)
+        await store.run(
+            lambda conn: conn.executescript(
+                """
+                INSERT INTO tokens (client_id, session_id, created_at) VALUES
+                    ('client', 'abandoned-1', datetime('now', '-2 hours')),
+                    ('client', 'abandoned-2', datetime('now', '-2 hours')),
+                    ('client', 'abandoned-3', datetime('now', '-2 hours')),
+                    ('client', 'pending', datetime('now'));
+                INSERT INTO tokens (
+                    client_id, session_id, access_token, token_type, expires_at
+                ) VALUES
+                    ('client', 'expired', 'a', 'bearer', datetime('now', '-1 hour')),
+                    ('client', 'active', 'b', 'bearer', datetime('now', '+1 hour'));
+                INSERT INTO tokens (
+                    client_id, session_id, access_token, token_type, refresh_token,
+                    expires_at
+                ) VALUES (
+                    'client', 'refreshable', 'c', 'bearer', 'r',
+                    datetime('now', '-1 hour')
+                );
+                """
+            )
+        )
+        sweeper = SessionSweeper(
+            store, interval=60, batch_size=2, session_ttl=3600, expired_token_ttl=0
+        )
+
+        assert await sweeper.sweep() == SweepReport(sessions=3, tokens=1)
+        assert await sweeper.sweep() == SweepReport()
+
+        rows = await store.fetchall("SELECT session_id FROM tokens ORDER BY id")
+        assert [row["session_id"] for row in rows] == [
+            "pending",
+            "active",
+            "refreshable",
+        ]
+        assert sweeper.stats().reclaimed == 4
@@ -0,0 +1,124 @@
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import pytest
+import respx
+from httpx import Response
+
+from src.clients.base.throttling import RetryPolicy
+from src.clients.polar.client import PolarClient
+from src.core.migrations import apply_migrations
+from src.core.store import TokenStore
+from src.core.sync import SyncEngine, SyncReport
+
+TRANSACTIONS = "/v3/users/42/exercise-transactions"
+
+
+def item_url(transaction_id: int, exercise_id: int) -> str:
+    return (
+        "https://www.polaraccesslink.com"
+        f"{TRANSACTIONS}/{transaction_id}/exercises/{exercise_id}"
+    )
+
+
+@pytest.fixture
+async def sync_store(tmp_path: Path) -> AsyncGenerator[TokenStore]:
+    async with TokenStore(tmp_path / "sync.db") as store:
+        await apply_migrations(store)
+        yield store
+
+
+@pytest.fixture
+def engine(test_polar_client: PolarClient, sync_store: TokenStore) -> SyncEngine:
+    client = PolarClient(
+        test_polar_client.transport, retry_policy=RetryPolicy(backoff=0)
+    )
+    return SyncEngine(sync_store, client, concurrency=2)
+
+
+async def records(store: TokenStore) -> list[str]:
+    rows = await store.fetchall("SELECT item_id FROM sync_records ORDER BY item_id")
+    return [row["item_id"] for row in rows]
+
+
+@respx.mock
+async def test_sync_resumes_an_interrupted_transaction(
+    engine: SyncEngine, sync_store: TokenStore
+):
+    create = respx.post(TRANSACTIONS).mock(
+        side_effect=[
+            Response(201, json={"transaction-id": 7, "resource-uri": ""}),
+            Response(204),
+        ]
+    )
+    respx.get(f"{TRANSACTIONS}/7").mock(
+        return_value=Response(
+            200, json={"exercises": [item_url(7, i) for i in (1, 2, 3)]}
+        )
+    )
+    items = {
+        i: respx.get(f"{TRANSACTIONS}/7/exercises/{i}").mock(
+            return_value=Response(200, json={"id": i})
+        )
+        for i in (1, 3)
+    }
+    items[2] = respx.get(f"{TRANSACTIONS}/7/exercises/2").mock(
+        side_effect=[Response(404), Response(200, json={"id": 2})]
+    )
+    commit = respx.put(f"{TRANSACTIONS}/7").mock(return_value=Response(200))
+
+    interrupted = await engine.sync_kind(42, "exercise-transactions")
+    assert interrupted == SyncReport("exercise-transactions", 7, fetched=2, failed=1)
+    assert not commit.called
+
+    resumed = await engine.sync_kind(42, "exercise-transactions")
+    assert resumed == SyncReport("exercise-transactions", 7, fetched=1, committed=True)
+    assert [item.call_count for item in items.values()] == [1, 1, 2]
+    assert commit.call_count == 1
+    assert create.call_count == 1
+    assert await records(sync_store) == ["1", "2", "3"]
+
+    assert await engine.sync_kind(42, "exercise-transactions") == SyncReport(
+        "exercise-transactions"
+    )
+
+
+@respx.mock
+async def test_sync_skips_items_of_an_expired_transaction(
+    engine: SyncEngine, sync_store: TokenStore
+):
+    respx.post(TRANSACTIONS).mock(
+        side_effect=[
+            Response(201, json={"transaction-id": 7, "resource-uri": ""}),
+            Response(201, json={"transaction-id": 8, "resource-uri": ""}),
+        ]
+    )
+    respx.get(f"{TRANSACTIONS}/7").mock(
+        side_effect=[
+            Response(200, json={"exercises": [item_url(7, 1), item_url(7, 2)]}),
+            Response(404),
+        ]
+    )
+    respx.get(f"{TRANSACTIONS}/8").mock(
+        return_value=Response(200, json={"exercises": [item_url(8, 1), item_url(8, 2)]})
+    )
+    respx.get(f"{TRANSACTIONS}/7/exercises/1").mock(
+        return_value=Response(200, json={"id": 1})
+    )
+    respx.get(f"{TRANSACTIONS}/7/exercises/2").mock(return_value=Response(404))
+    refetched = respx.get(f"{TRANSACTIONS}/8/exercises/1")
+    respx.get(f"{TRANSACTIONS}/8/exercises/2").mock(
+        return_value=Response(200, json={"id": 2})
+    )
+    respx.put(f"{TRANSACTIONS}/8").mock(return_value=Response(200))
+
+    await engine.sync_kind(42, "exercise-transactions")
+    report = await engine.sync_kind(42, "exercise-transactions")
+
+    assert report == SyncReport("exercise-transactions", 8, fetched=1, committed=True)
+    assert not refetched.called
+    assert await records(sync_store) == ["1", "2"]
+    states = await sync_store.fetchall(
+        "SELECT transaction_id, state FROM sync_transactions ORDER BY transaction_id"
+    )
+    assert [tuple(row) for row in states] == [(7, "expired"), (8, "committed")]
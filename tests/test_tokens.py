@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import pytest
+import respx
+from httpx import Response
+
+from src.core.migrations import apply_migrations
+from src.core.store import TokenStore
+from src.core.tokens import ProvidedOAuth2Client, Token, TokenProvider, TokenStats
+
+
+@pytest.fixture
+async def token_store(tmp_path: Path) -> AsyncGenerator[TokenStore]:
+    async with TokenStore(tmp_path / "tokens.db") as store:
+        await apply_migrations(store)
+        await store.execute(
+            """
+            INSERT INTO tokens
+                (client_id, session_id, user_id, access_token, token_type,
+                refresh_token, expires_at)
+            VALUES
+                ('client', 'a', 1, 'expiring', 'bearer', 'refresh', datetime('now', '+1 minute')),
+                ('client', 'b', 2, 'fresh', 'bearer', 'refresh-2', datetime('now', '+1 day')),
+                ('client', 'c', 3, 'expired', 'bearer', NULL, datetime('now', '-1 minute'))
+            """  # noqa: E501
+        )
+        yield store
+
+
+def build_provider(store: TokenStore, refreshed: list[Token]) -> TokenProvider:
+    async def refresh(token: Token) -> Token:
+        refreshed.append(token)
+        await asyncio.sleep(0.01)
+        return {
+            "access_token": f"refreshed-{len(refreshed)}",
+            "token_type": "Bearer",
+            "refresh_token": "rotated",
+            "expires_in": 3600,
+        }
+
+    return TokenProvider(store, refresh, margin=300.0, lease=30.0, poll_interval=0.01)
+
+
+async def test_provider_refreshes_an_expiring_token_once(token_store: TokenStore):
+    refreshed: list[Token] = []
+    tokens = build_provider(token_store, refreshed)
+
+    handed_out = await asyncio.gather(*(tokens.get(1) for _ in range(5)))
+
+    assert len(refreshed) == 1
+    assert refreshed[0]["refresh_token"] == "refresh"
+    assert {token["access_token"] for token in handed_out} == {"refreshed-1"}
+    assert handed_out[0]["refresh_token"] == "rotated"
+    assert handed_out[0]["expires_at"] > time.time() + 3000
+    assert tokens.stats() == TokenStats(refreshed=1, failed=0)
+
+    # Another provider, as in another process, reads the refreshed token
+    assert (await build_provider(token_store, refreshed).get(1))["access_token"] == (
+        "refreshed-1"
+    )
+    assert len(refreshed) == 1
+
+
+async def test_provider_leaves_valid_tokens_alone(token_store: TokenStore):
+    refreshed: list[Token] = []
+    tokens = build_provider(token_store, refreshed)
+
+    assert (await tokens.get(2))["access_token"] == "fresh"
+    with pytest.raises(LookupError):
+        await tokens.get(3)
+    with pytest.raises(LookupError):
+        await tokens.get(4)
+    assert refreshed == []
+
+
+async def test_provider_waits_for_the_refresh_of_another_process(
+    token_store: TokenStore,
+):
+    await token_store.execute(
+        """
+        UPDATE tokens
+        SET expires_at = datetime('now', '-1 minute'), refresh_lease = ?
+        WHERE user_id = 1
+        """,
+        (time.time() + 30.0,),
+    )
+    refreshed: list[Token] = []
+    tokens = build_provider(token_store, refreshed)
+
+    waiting = asyncio.create_task(tokens.get(1))
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+    # The other process writes its token back through the client hook
+    await tokens.save(
+        {"access_token": "elsewhere", "token_type": "bearer", "expires_in": 3600},
+        refresh_token="refresh",
+    )
+
+    assert (await asyncio.wait_for(waiting, 1.0))["access_token"] == "elsewhere"
+    assert refreshed == []
+
+
+@respx.mock
+async def test_provided_client_refreshes_through_the_provider(
+    token_store: TokenStore,
+):
+    # Any other request, e.g. to a token endpoint, fails the test
+    route = respx.get("https://accesslink.test/v3/users/1").mock(
+        return_value=Response(200)
+    )
+    refreshed: list[Token] = []
+    tokens = build_provider(token_store, refreshed)
+    expired = {
+        "access_token": "expiring",
+        "token_type": "bearer",
+        "refresh_token": "refresh",
+        "expires_at": time.time() - 1,
+    }
+
+    async with ProvidedOAuth2Client(
+        tokens, 1, expired, base_url="https://accesslink.test"
+    ) as client:
+        await asyncio.gather(*(client.get("/v3/users/1") for _ in range(3)))
+
+    assert len(refreshed) == 1
+    assert {call.request.headers["Authorization"] for call in route.calls} == {
+        "Bearer refreshed-1"
+    }
@@ -0,0 +1,77 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import pytest
+
+from src.core.migrations import apply_migrations
+from src.core.models import UserModel
+from src.core.store import TokenStore
+from src.core.users import ProfileStats, UserProfiles
+
+USER = {
+    "polar-user-id": 475,
+    "member-id": 12,
+    "registration-date": "2024-01-01T00:00:00",
+    "first-name": "Ada",
+    "last-name": "Lovelace",
+    "birthdate": "1990-12-10T00:00:00",
+    "gender": "FEMALE",
+    "weight": 60.0,
+    "height": 170.0,
+}
+KEY = ("client", 12)
+
+
+@pytest.fixture
+async def profiles(tmp_path: Path) -> AsyncGenerator[UserProfiles]:
+    async with TokenStore(tmp_path / "users.db") as store:
+        await apply_migrations(store)
+        profiles = UserProfiles(store, ttl=60.0, max_stale=600.0, clock=lambda: 0.0)
+        yield profiles
+        await profiles.stop()
+
+
+async def test_profiles_are_served_stale_while_revalidated(profiles: UserProfiles):
+    fetched: list[str] = []
+    release = asyncio.Event()
+
+    async def fetch() -> UserModel:
+        fetched.append("fetch")
+        await release.wait()
+        weight = 60.0 + len(fetched)
+        return UserModel.model_validate({**USER, "weight": weight}, by_alias=True)
+
+    await profiles.save(KEY, UserModel.model_validate(USER, by_alias=True))
+
+    assert (await profiles.get(KEY, fetch)).weight == 60.0
+    assert fetched == []
+
+    profiles.clock = lambda: 120.0
+    stale = await asyncio.gather(*(profiles.get(KEY, fetch) for _ in range(3)))
+    assert {user.weight for user in stale} == {60.0}
+    release.set()
+    await asyncio.gather(*profiles._refreshing.values())
+    assert fetched == ["fetch"]
+    assert (await profiles.get(KEY, fetch)).weight == 61.0
+
+    # Too old to be served, it's refreshed first
+    profiles.clock = lambda: 1000.0
+    assert (await profiles.get(KEY, fetch)).weight == 62.0
+    assert profiles.stats() == ProfileStats(
+        hits=2, stale=3, misses=1, refreshed=2, failed=0
+    )
+
+
+async def test_profiles_are_fetched_once_missing(profiles: UserProfiles):
+    async def fetch() -> UserModel:
+        return UserModel.model_validate(USER, by_alias=True)
+
+    assert (await profiles.get(KEY, fetch)).polar_user_id == 475
+    row = await profiles.store.fetchone(
+        "SELECT polar_user_id FROM users WHERE client_id = ? AND member_id = ?", KEY
+    )
+    assert row["polar_user_id"] == 475
+
+    await profiles.forget(KEY)
+    assert await profiles.store.fetchone("SELECT * FROM users") is None
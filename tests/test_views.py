@@ -1,10 +1,29 @@
+import asyncio
+import hashlib
+import hmac
+import json
 from urllib.parse import parse_qs, urlparse
 
 import pytest
-from httpx import AsyncClient
-from pydantic import UUID4
+from fastapi import FastAPI
+from httpx import AsyncClient, Response
+from pydantic import UUID4, SecretStr
 
+from src.core.models import UserModel
 from src.core.settings import ApplicationSettings
+from src.core.webhooks import SIGNATURE_HEADER
+
+USER = {
+    "polar-user-id": 475,
+    "member-id": 12,
+    "registration-date": "2024-01-01T00:00:00",
+    "first-name": "Ada",
+    "last-name": "Lovelace",
+    "birthdate": "1990-12-10T00:00:00",
+    "gender": "FEMALE",
+    "weight": 60.0,
+    "height": 170.0,
+}
 
 
 async def test_healthcheck(test_client: AsyncClient) -> None:
@@ -70,3 +89,228 @@ async def test_login_callback(
         response.headers["location"]
         == f"/docs/oauth2-redirect#state={seeded_state}&code=test_code"
     )
+
+
+@pytest.mark.respx()
+async def test_fetch_token_is_served_from_cache(
+    respx_mock,
+    seeded_state: str,
+    test_client: AsyncClient,
+    application: FastAPI,
+    settings: ApplicationSettings,
+) -> None:
+    access_token = f"token-{seeded_state}"
+    respx_mock.post(str(settings.oauth.access_token_url)).respond(
+        json={
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "user_id": 123,
+        }
+    )
+    await test_client.get(
+        "/oauth/callback", params={"code": seeded_state, "state": seeded_state}
+    )
+    cache = application.state.token_cache
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    misses = cache.misses
+    first = await test_client.get("/oauth/token", headers=headers)
+    hits = cache.hits
+    second = await test_client.get("/oauth/token", headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert first.json()["user_id"] == 123
+    assert cache.misses == misses + 1
+    assert cache.hits == hits + 1
+
+    stats = (await test_client.get("/health/stats")).json()
+    assert stats["token_cache"]["hits"] == cache.hits
+
+    # A repeated callback rewrites the session and evicts its cached token
+    await test_client.get(
+        "/oauth/callback", params={"code": seeded_state, "state": seeded_state}
+    )
+    assert ("bearer", access_token) not in cache
+
+
+@pytest.mark.respx()
+async def test_concurrent_user_fetches_share_one_upstream_request(
+    respx_mock,
+    seeded_state: str,
+    test_client: AsyncClient,
+    settings: ApplicationSettings,
+) -> None:
+    access_token = f"token-{seeded_state}"
+    respx_mock.post(str(settings.oauth.access_token_url)).respond(
+        json={
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "user_id": 124,
+        }
+    )
+    await test_client.get(
+        "/oauth/callback", params={"code": seeded_state, "state": seeded_state}
+    )
+
+    async def slow_user(request) -> Response:
+        await asyncio.sleep(0.05)
+        return Response(
+            200,
+            json={**USER, "polar-user-id": 124, "member-id": 124},
+        )
+
+    upstream = respx_mock.get(path="/v3/users/124").mock(side_effect=slow_user)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    responses = await asyncio.gather(
+        *(test_client.get("/oauth/user", headers=headers) for _ in range(3))
+    )
+
+    assert [response.status_code for response in responses] == [200] * 3
+    assert {response.json()["first-name"] for response in responses} == {"Ada"}
+    assert upstream.call_count == 1
+
+    # The stored profile is served without calling AccessLink
+    again = await test_client.get("/oauth/user", headers=headers)
+    assert again.json() == responses[0].json()
+    assert upstream.call_count == 1
+
+
+@pytest.mark.respx()
+async def test_user_profile_is_kept_until_deleted_upstream(
+    respx_mock,
+    seeded_state: str,
+    test_client: AsyncClient,
+    application: FastAPI,
+    settings: ApplicationSettings,
+    test_client_id: UUID4,
+) -> None:
+    access_token = f"token-{seeded_state}"
+    respx_mock.post(str(settings.oauth.access_token_url)).respond(
+        json={
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "user_id": 125,
+        }
+    )
+    await test_client.get(
+        "/oauth/callback", params={"code": seeded_state, "state": seeded_state}
+    )
+    key = (test_client_id.hex, 125)
+    await application.state.user_profiles.save(
+        key, UserModel.model_validate({**USER, "member-id": 125}, by_alias=True)
+    )
+    upstream = respx_mock.delete(path="/v3/users/125").mock(
+        side_effect=[Response(500), Response(204)]
+    )
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    failed = await test_client.delete("/oauth/user/", headers=headers)
+    assert failed.status_code == 502
+    assert await application.state.store.fetchone(
+        "SELECT 1 FROM users WHERE client_id = ? AND member_id = ?", key
+    )
+
+    deleted = await test_client.delete("/oauth/user/", headers=headers)
+    assert deleted.status_code == 200
+    assert upstream.call_count == 2
+    assert upstream.calls.last.request.headers["Authorization"] == (
+        f"Bearer {access_token}"
+    )
+    assert not await application.state.store.fetchone(
+        "SELECT 1 FROM users WHERE client_id = ? AND member_id = ?", key
+    )
+
+
+async def test_user_fetch_fails_with_the_upstream_response(
+    respx_mock,
+    seeded_state: str,
+    test_client: AsyncClient,
+    application: FastAPI,
+    settings: ApplicationSettings,
+    test_client_id: UUID4,
+) -> None:
+    access_token = f"token-{seeded_state}"
+    respx_mock.post(str(settings.oauth.access_token_url)).respond(
+        json={
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "user_id": 126,
+        }
+    )
+    await test_client.get(
+        "/oauth/callback", params={"code": seeded_state, "state": seeded_state}
+    )
+    respx_mock.get(path="/v3/users/126").mock(return_value=Response(500))
+
+    response = await test_client.get(
+        "/oauth/user", headers={"Authorization": f"Bearer {access_token}"}
+    )
+
+    assert response.status_code == 502
+    assert response.json()["detail"] == "AccessLink failed to fetch the user: 500"
+    assert not await application.state.store.fetchone(
+        "SELECT 1 FROM users WHERE client_id = ? AND member_id = ?",
+        (test_client_id.hex, 126),
+    )
+
+
+async def test_fetch_token_rejects_unknown_tokens(test_client: AsyncClient) -> None:
+    response = await test_client.get(
+        "/oauth/token", headers={"Authorization": "Bearer unknown"}
+    )
+    assert response.status_code == 404
+
+
+async def test_upstream_clients_share_the_application_transport(
+    application: FastAPI,
+) -> None:
+    client = application.state.oauth.create_client("polar")
+    for _ in range(2):
+        async with client._get_oauth_client() as session:
+            assert session._transport.transport is application.state.transport
+
+
+async def test_webhooks_are_verified_and_deduplicated(
+    application: FastAPI, settings: ApplicationSettings, test_client: AsyncClient
+) -> None:
+    secret = "webhook-secret"
+    application.state.settings = settings.model_copy(
+        update={
+            "oauth": settings.oauth.model_copy(
+                update={"webhook_secret": SecretStr(secret)}
+            )
+        }
+    )
+    body = json.dumps(
+        {
+            "event": "ACTIVITY_SUMMARY",
+            "user_id": 475,
+            "date": "2019-01-01",
+            "timestamp": "2019-01-01T10:00:00Z",
+        }
+    ).encode()
+    signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    try:
+        forged = await test_client.post(
+            "/webhooks/polar", content=body, headers={SIGNATURE_HEADER: "0" * 64}
+        )
+        assert forged.status_code == 401
+
+        for _ in range(2):
+            response = await test_client.post(
+                "/webhooks/polar", content=body, headers={SIGNATURE_HEADER: signature}
+            )
+            assert response.status_code == 200
+    finally:
+        application.state.settings = settings
+
+    rows = await application.state.store.fetchall(
+        "SELECT event FROM webhook_events WHERE polar_user_id = 475"
+    )
+    assert [row["event"] for row in rows] == ["ACTIVITY_SUMMARY"]
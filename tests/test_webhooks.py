@@ -0,0 +1,86 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import pytest
+
+from src.core.migrations import apply_migrations
+from src.core.store import TokenStore
+from src.core.webhooks import WebhookEvent, WebhookQueue, WebhookStats, WebhookWorkers
+
+EXERCISE = {
+    "event": "EXERCISE",
+    "user_id": 475,
+    "entity_id": "aQlC83",
+    "timestamp": "2018-05-15T14:22:24Z",
+    "url": "https://www.polaraccesslink.com/v3/exercises/aQlC83",
+}
+
+
+@pytest.fixture
+async def queue(tmp_path: Path) -> AsyncGenerator[WebhookQueue]:
+    async with TokenStore(tmp_path / "webhooks.db") as store:
+        await apply_migrations(store)
+        yield WebhookQueue(store)
+
+
+def build_workers(queue: WebhookQueue, handler, max_attempts: int) -> WebhookWorkers:
+    return WebhookWorkers(
+        queue,
+        handler,
+        workers=1,
+        batch_size=10,
+        poll_interval=0.01,
+        lease=60.0,
+        backoff=0.0,
+        max_attempts=max_attempts,
+    )
+
+
+async def states(queue: WebhookQueue) -> list[tuple[str, int]]:
+    rows = await queue.store.fetchall(
+        "SELECT state, attempts FROM webhook_events ORDER BY id"
+    )
+    return [tuple(row) for row in rows]
+
+
+async def test_webhook_events_are_retried_until_handled(queue: WebhookQueue):
+    attempts: list[WebhookEvent] = []
+
+    async def handler(event: WebhookEvent) -> None:
+        attempts.append(event)
+        if len(attempts) < 3:
+            raise RuntimeError("AccessLink is down")
+
+    assert await queue.enqueue(EXERCISE)
+    assert not await queue.enqueue(EXERCISE)
+
+    workers = build_workers(queue, handler, max_attempts=5)
+    assert [await workers.drain() for _ in range(4)] == [1, 1, 1, 0]
+    assert [event.attempts for event in attempts] == [1, 2, 3]
+    assert attempts[0].entity_id == "aQlC83"
+    assert workers.stats() == WebhookStats(processed=1, retried=2, failed=0)
+    assert await states(queue) == [("done", 3)]
+
+
+async def test_webhook_events_fail_after_max_attempts(queue: WebhookQueue):
+    async def handler(event: WebhookEvent) -> None:
+        raise LookupError(event.polar_user_id)
+
+    await queue.enqueue(EXERCISE)
+    await queue.enqueue({**EXERCISE, "entity_id": "bRmD94"})
+
+    workers = build_workers(queue, handler, max_attempts=2)
+
+    async def failed() -> None:
+        while workers.stats().failed < 2:
+            await asyncio.sleep(0.01)
+
+    workers.start()
+    try:
+        await asyncio.wait_for(failed(), timeout=5)
+    finally:
+        await workers.stop()
+
+    assert workers.stats() == WebhookStats(processed=0, retried=2, failed=2)
+    assert await states(queue) == [("failed", 2), ("failed", 2)]